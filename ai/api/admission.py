@@ -0,0 +1,146 @@
+"""
+准入控制与背压中间件
+
+- 按路由前缀限制并发：超出并发的请求进入有界等待队列，等待超时或队列已满时快速拒绝
+- 队列已满返回 429，等待超时返回 503，均携带 Retry-After 头
+- 解析 X-Request-Timeout 头（秒）并结合路由默认值设置请求截止时间，传播到 LLM 与工具调用
+
+实现为纯 ASGI 中间件，流式响应在整个输出期间占用并发名额。
+"""
+
+from __future__ import annotations
+
+import asyncio
+import math
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from api.response import ResponseFormat
+from mcp_client.tools.deadline import remaining, reset_deadline, set_deadline
+
+DEADLINE_HEADER = b"x-request-timeout"
+
+
+@dataclass
+class RouteLimit:
+    """单个路由前缀的准入配置"""
+    prefix: str
+    max_concurrency: int
+    max_queue: int
+    max_wait: float          # 排队最长等待（秒）
+    timeout: Optional[float] = None  # 默认请求截止时间（秒）
+
+
+def parse_route_limits(spec: str) -> List[RouteLimit]:
+    """解析准入配置：前缀:并发:队列长度:最长排队秒数[:默认超时秒数]，多条以逗号分隔"""
+    limits = []
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        fields = item.split(":")
+        limits.append(RouteLimit(
+            prefix=fields[0],
+            max_concurrency=int(fields[1]),
+            max_queue=int(fields[2]),
+            max_wait=float(fields[3]),
+            timeout=float(fields[4]) if len(fields) > 4 and fields[4] else None,
+        ))
+    return limits
+
+
+class _RouteGate:
+    """并发闸门：信号量 + 等待计数"""
+
+    def __init__(self, limit: RouteLimit) -> None:
+        self.limit = limit
+        self._semaphore = asyncio.Semaphore(limit.max_concurrency)
+        self.waiting = 0
+
+    async def acquire(self) -> Optional[Tuple[int, str]]:
+        """获取名额；被拒绝时返回 (状态码, 原因)"""
+        if not self._semaphore.locked():
+            await self._semaphore.acquire()
+            return None
+        if self.waiting >= self.limit.max_queue:
+            return 429, "请求过多，排队已满，请稍后重试"
+
+        max_wait = self.limit.max_wait
+        left = remaining()
+        if left is not None:
+            max_wait = min(max_wait, left)
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout=max(0.0, max_wait))
+            return None
+        except asyncio.TimeoutError:
+            return 503, "服务繁忙，排队超时，请稍后重试"
+        finally:
+            self.waiting -= 1
+
+    def release(self) -> None:
+        self._semaphore.release()
+
+
+class AdmissionControlMiddleware:
+    """按路由前缀的准入控制中间件"""
+
+    def __init__(self, app: ASGIApp, limits: List[RouteLimit], default_timeout: Optional[float] = None) -> None:
+        self.app = app
+        self.default_timeout = default_timeout
+        # 最长前缀优先匹配
+        self._gates: List[_RouteGate] = [
+            _RouteGate(limit) for limit in sorted(limits, key=lambda l: len(l.prefix), reverse=True)
+        ]
+
+    def _match(self, path: str) -> Optional[_RouteGate]:
+        for gate in self._gates:
+            if path.startswith(gate.limit.prefix):
+                return gate
+        return None
+
+    @staticmethod
+    def _header_timeout(scope: Scope) -> Optional[float]:
+        for name, value in scope.get("headers", []):
+            if name == DEADLINE_HEADER:
+                try:
+                    timeout = float(value.decode("latin-1"))
+                    return timeout if timeout > 0 else None
+                except ValueError:
+                    return None
+        return None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        gate = self._match(scope["path"])
+        timeout = gate.limit.timeout if gate and gate.limit.timeout else self.default_timeout
+        requested = self._header_timeout(scope)
+        if requested is not None:
+            timeout = min(timeout, requested) if timeout else requested
+
+        token = set_deadline(timeout)
+        try:
+            if gate is None:
+                await self.app(scope, receive, send)
+                return
+
+            rejected = await gate.acquire()
+            if rejected is not None:
+                status_code, message = rejected
+                response = JSONResponse(
+                    content=ResponseFormat.error(message=message, code=str(status_code)),
+                    status_code=status_code,
+                    headers={"Retry-After": str(max(1, math.ceil(gate.limit.max_wait)))},
+                )
+                await response(scope, receive, send)
+                return
+
+            try:
+                await self.app(scope, receive, send)
+            finally:
+                gate.release()
+        finally:
+            reset_deadline(token)
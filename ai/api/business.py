@@ -1,25 +1,54 @@
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 import sys
 import os
+import asyncio
+import json
+import threading
+import time
 from mcp_client.tools.state import MarketResearchState
 from schemas.response_model import ResearchResponse
 import re
 from mcp_client.tools.langgraph import build_graph
+from mcp_client.tools.job_queue import (
+    AnalysisJobQueue,
+    JobQueueFullError,
+    SqliteJobStore,
+    JOB_FAILED,
+    JOB_QUEUED,
+    JOB_SUCCEEDED,
+)
+from mcp_client.tools.single_flight import SingleFlight, normalize_key
+from mcp_client.tools.deadline import DeadlineExceededError, with_deadline
+from mcp_client.tools.metrics import cache_summary, llm_summary, observe_llm
+from config import config
 # 确保可导入到 mcp_client 包
 sys.path.append(os.path.join(os.path.dirname(__file__), ".."))  # 添加 ai/ 到 sys.path
 
 try:
-    from mcp_client.tools.langchain import get_agent
+    from mcp_client.tools.langchain import close_agent, get_agent
     _import_error = None
 except Exception as e:
     # 记录导入错误详情
     get_agent = None  # type: ignore
+    close_agent = None  # type: ignore
     _import_error = str(e)
 
-# 初始化图
-graph = build_graph()
+# 分析图与问答链延迟初始化，由启动预热（api/warmup.py）或首个请求触发
+_graph = None
+_graph_lock = threading.Lock()
+
+
+def get_graph():
+    """获取已编译的分析图（线程安全的单例）"""
+    global _graph
+    if _graph is None:
+        with _graph_lock:
+            if _graph is None:
+                _graph = build_graph()
+    return _graph
 
 class QueryRequest(BaseModel):
     query: str
@@ -27,6 +56,12 @@ business_router = APIRouter()
 
 class ChatRequest(BaseModel):
     question: str
+    session_id: Optional[str] = None  # 会话ID，不传则不携带历史
+
+
+class ChatBatchRequest(BaseModel):
+    questions: List[str]
+    concurrency: Optional[int] = None
 
 
 from api.response import APIResponse
@@ -46,38 +81,158 @@ async def chat(req: ChatRequest) -> Any:
 
     try:
         agent = await get_agent()
-        result: Dict[str, Any] = await agent.chat(req.question)
+        result: Dict[str, Any] = await agent.chat(req.question, session_id=req.session_id)
 
         # 统一响应格式
         payload = {
             "response": result.get("response", ""),
             **{k: v for k, v in result.items() if k not in {"response"}}
         }
-        return APIResponse.success(data=payload)
+        # 命中层级与缓存查询耗时，便于客户端/网关统计
+        headers = {
+            "X-Cache-Tier": result.get("cache") or "miss",
+            "X-Cache-Lookup-Ms": str(result.get("cache_lookup_ms", 0)),
+        }
+        return APIResponse.success(data=payload, headers=headers)
     except HTTPException as e:
         # 转统一格式
         return APIResponse.error(message=str(e.detail) if hasattr(e, "detail") else str(e), code=str(e.status_code), status_code=e.status_code)
+    except DeadlineExceededError:
+        # 交给全局处理器返回 504（main.py），不能转成 500
+        raise
+    except Exception as e:
+        return APIResponse.error(message=str(e), code="500")
+
+
+@business_router.post("/chat/batch")
+async def chat_batch(req: ChatBatchRequest) -> Any:
+    """批量问答接口：并发处理，结果按输入顺序返回"""
+    if get_agent is None:
+        error_msg = f"LangChain智能体未正确加载: {_import_error}" if _import_error else "LangChain智能体未正确加载"
+        return APIResponse.error(message=error_msg, code="500")
+    if len(req.questions) > config.CHAT_BATCH_MAX_SIZE:
+        return APIResponse.validation_error(message=f"单批问题数不能超过 {config.CHAT_BATCH_MAX_SIZE}")
+
+    concurrency = req.concurrency or config.CHAT_BATCH_CONCURRENCY
+    concurrency = max(1, min(concurrency, config.CHAT_BATCH_MAX_CONCURRENCY))
+    try:
+        agent = await get_agent()
+        started = time.perf_counter()
+        results = await agent.batch_chat(req.questions, concurrency=concurrency)
+        return APIResponse.success(data={
+            "results": results,
+            "count": len(results),
+            "unique": len({normalize_key(q) for q in req.questions}),
+            "concurrency": concurrency,
+            "elapsed_ms": round((time.perf_counter() - started) * 1000, 2),
+        })
+    except DeadlineExceededError:
+        raise
+    except Exception as e:
+        return APIResponse.error(message=str(e), code="500")
+
+
+def _sse(event: Dict[str, Any]) -> str:
+    """将事件编码为 Server-Sent Events 格式"""
+    return f"data: {json.dumps(event, ensure_ascii=False)}\n\n"
+
+
+_SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "Connection": "keep-alive",
+    "X-Accel-Buffering": "no",  # 关闭 Nginx 缓冲，保证 token 即时下发
+}
+
+
+@business_router.post("/chat/stream")
+async def chat_stream(req: ChatRequest) -> Any:
+    """流式问答接口：以 SSE 逐 token 推送回答，缓存命中时一次性返回"""
+    if get_agent is None:
+        error_msg = f"LangChain智能体未正确加载: {_import_error}" if _import_error else "LangChain智能体未正确加载"
+        return APIResponse.error(message=error_msg, code="500")
+
+    try:
+        agent = await get_agent()
     except Exception as e:
         return APIResponse.error(message=str(e), code="500")
 
+    async def event_stream():
+        async for event in agent.chat_stream(req.question, session_id=req.session_id):
+            yield _sse(event)
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream", headers=_SSE_HEADERS)
+
 
 # ==============================
 # 缓存管理接口
 # ==============================
 
+def _tier_stats(tier: str, store_stats: Dict[str, Any], llm: Dict[str, Any], llm_only: bool) -> Dict[str, Any]:
+    """合并存储统计与命中指标，并按 LLM 平均耗时/平均 token 数估算命中节省的量
+
+    模型调用缓存（llm_l*）的条目都来自 LLM 回答，估算值即 saved_*；
+    智能体的精确/语义缓存中还有工具调用的回答（天气、地点等，命中并不节省 LLM 调用），
+    只能给出上限，字段名带 _upper_bound
+    """
+    stats = {**store_stats, **cache_summary(tier)}
+    suffix = "" if llm_only else "_upper_bound"
+    stats[f"saved_latency_ms{suffix}"] = round(stats["hits"] * llm["avg_latency_ms"], 2)
+    stats[f"saved_tokens{suffix}"] = int(stats["hits"] * llm["avg_tokens"])
+    return stats
+
+
+@business_router.get("/cache/stats")
+async def cache_stats() -> Any:
+    """各缓存层级的条目数、磁盘/内存占用、命中率、平均查询耗时与估算节省的 LLM 耗时和 token（精确/语义缓存为上限）。"""
+    try:
+        from mcp_client.tools.langchain import get_agent
+        from mcp_client.tools.llm_cache import get_llm_cache
+        agent = await get_agent()
+        llm = llm_summary()
+        tiers: Dict[str, Any] = {}
+        if hasattr(agent, "exact_cache"):
+            tiers["exact"] = _tier_stats("exact", await agent.exact_cache.run_in_executor(agent.exact_cache.stats), llm, False)
+        if hasattr(agent, "semantic_cache"):
+            tiers["semantic"] = _tier_stats("semantic", await agent.semantic_cache.run_in_executor(agent.semantic_cache.stats), llm, False)
+        llm_cache = get_llm_cache()
+        if llm_cache is not None:
+            for tier, store_stats in (await llm_cache.l2.run_in_executor(llm_cache.stats)).items():
+                tiers[tier] = _tier_stats(tier, store_stats, llm, True)
+        return APIResponse.success(data={"tiers": tiers, "llm": llm})
+    except Exception as e:
+        return APIResponse.error(message=str(e), code="500")
+
+
 @business_router.post("/cache/clear")
 async def cache_clear_all() -> Any:
-    """清空精确缓存与语义缓存。"""
+    """清空精确缓存、语义缓存与模型调用的分层缓存。"""
     try:
         from mcp_client.tools.langchain import get_agent
+        from mcp_client.tools.llm_cache import get_llm_cache
         agent = await get_agent()
         # 清空精确缓存
         if hasattr(agent, "exact_cache"):
-            agent.exact_cache.clear()
+            await agent.exact_cache.aclear()
         # 清空语义缓存
         if hasattr(agent, "semantic_cache"):
-            agent.semantic_cache.clear()
-        return APIResponse.success(data={"cleared": ["exact", "semantic"]})
+            await agent.semantic_cache.aclear()
+        # 清空模型调用缓存
+        llm_cache = get_llm_cache()
+        if llm_cache is not None:
+            await llm_cache.aclear()
+        return APIResponse.success(data={"cleared": ["exact", "semantic", "llm"]})
+    except Exception as e:
+        return APIResponse.error(message=str(e), code="500")
+
+
+@business_router.post("/session/{session_id}/clear")
+async def session_clear(session_id: str) -> Any:
+    """清空指定会话的历史问题。"""
+    try:
+        from mcp_client.tools.langchain import get_agent
+        agent = await get_agent()
+        await agent.sessions.aclear(session_id)
+        return APIResponse.success(data={"cleared": [session_id]})
     except Exception as e:
         return APIResponse.error(message=str(e), code="500")
 
@@ -88,7 +243,7 @@ async def cache_clear_exact() -> Any:
         from mcp_client.tools.langchain import get_agent
         agent = await get_agent()
         if hasattr(agent, "exact_cache"):
-            agent.exact_cache.clear()
+            await agent.exact_cache.aclear()
         return APIResponse.success(data={"cleared": ["exact"]})
     except Exception as e:
         return APIResponse.error(message=str(e), code="500")
@@ -100,45 +255,12 @@ async def cache_clear_semantic() -> Any:
         from mcp_client.tools.langchain import get_agent
         agent = await get_agent()
         if hasattr(agent, "semantic_cache"):
-            agent.semantic_cache.clear()
+            await agent.semantic_cache.aclear()
         return APIResponse.success(data={"cleared": ["semantic"]})
     except Exception as e:
         return APIResponse.error(message=str(e), code="500")
 
-@business_router.post("/analyze", response_model=ResearchResponse)
-async def analyze_market(request: QueryRequest):
-    if not request.query.strip():
-        raise HTTPException(status_code=400, detail="查询内容不能为空")
-
-    initial_state: MarketResearchState = {
-        "query": request.query,
-        "research_data": "",
-        "analysis": "",
-        "draft_report": "",
-        "final_report": None,
-        "trends": [],
-        "sources": [],
-        "revision_count": 0,
-        "feedback": ""
-    }
-
-    try:
-        # 执行整个流程
-        async for output in graph.astream(initial_state):
-            pass  # 流式输出可用于日志追踪
-
-        # 获取最终状态
-        final_output = list(output.values())[-1]
-
-        # 使用 LLM 提取5个独立趋势
-        raw_text = final_output.get("draft_report", "")
-        
-        # 调用 LangChain 智能体提取趋势
-        try:
-            from mcp_client.tools.langchain import get_agent
-            agent = await get_agent()
-            
-            trend_extraction_prompt = f"""
+_TREND_EXTRACTION_PROMPT = """
             请基于以下分析报告，提取出5个独立的市场趋势，每个趋势包含：
             1. topic: 趋势主题（简洁明确，不超过20字）
             2. description: 趋势描述（详细说明，不超过80字）
@@ -164,74 +286,269 @@ async def analyze_market(request: QueryRequest):
             
             请确保返回5个不同的趋势，每个趋势都要有独特性和价值。
             """
-            
-            trend_result = await agent.chat(trend_extraction_prompt)
-            trend_response = trend_result.get("response", "")
-            
-            # 尝试解析JSON格式的趋势数据
-            import json
-            try:
-                # 提取JSON部分（去除可能的markdown格式）
-                if "```json" in trend_response:
-                    json_start = trend_response.find("```json") + 7
-                    json_end = trend_response.find("```", json_start)
-                    json_str = trend_response[json_start:json_end].strip()
-                elif "```" in trend_response:
-                    json_start = trend_response.find("```") + 3
-                    json_end = trend_response.find("```", json_start)
-                    json_str = trend_response[json_start:json_end].strip()
-                else:
-                    json_str = trend_response.strip()
-                
-                trends = json.loads(json_str)
-                
-                # 确保不超过5个趋势
-                if len(trends) > 5:
-                    # 如果超过5个，只取前5个
-                    trends = trends[:5]
-                    
-            except json.JSONDecodeError:
-                # 如果JSON解析失败，返回空数组
-                trends = []
-                
-        except Exception as e:
-            # 如果LLM调用失败，返回空数组
-            trends = []
 
-        return ResearchResponse(
-            title=f"{request.query}分析报告",
-            query=request.query,
-            trends=trends,
-            conclusion=raw_text[:500] + "...",
-            sources=final_output.get("sources", [])[:5]
-        )
 
+def _initial_state(query: str) -> MarketResearchState:
+    """构建分析流程的初始状态"""
+    return {
+        "query": query,
+        "research_data": "",
+        "analysis": "",
+        "draft_report": "",
+        "final_report": None,
+        "trends": [],
+        "sources": [],
+        "revision_count": 0,
+        "feedback": ""
+    }
+
+
+async def _run_graph(initial_state: MarketResearchState):
+    """执行分析图，每个节点完成后产出 (节点名, 节点输出, 合并后的状态)"""
+    state: Dict[str, Any] = dict(initial_state)
+    async for output in get_graph().astream(initial_state):
+        for node, update in output.items():
+            state.update(update or {})
+            yield node, update or {}, state
+
+
+def _parse_trends(trend_response: str) -> list:
+    """解析LLM返回的趋势JSON，失败返回空数组"""
+    try:
+        # 提取JSON部分（去除可能的markdown格式）
+        if "```json" in trend_response:
+            json_start = trend_response.find("```json") + 7
+            json_end = trend_response.find("```", json_start)
+            json_str = trend_response[json_start:json_end].strip()
+        elif "```" in trend_response:
+            json_start = trend_response.find("```") + 3
+            json_end = trend_response.find("```", json_start)
+            json_str = trend_response[json_start:json_end].strip()
+        else:
+            json_str = trend_response.strip()
+
+        trends = json.loads(json_str)
+        # 确保不超过5个趋势
+        return trends[:5]
+    except json.JSONDecodeError:
+        return []
+
+
+async def _extract_trends(raw_text: str) -> list:
+    """使用 LLM 从报告中提取5个独立趋势，调用失败返回空数组
+
+    直接调用模型，不经过智能体对话：报告内容会误触意图路由的关键词，且不应写入对话的精确/语义缓存
+    """
+    try:
+        from mcp_client.tools.llm_gateway import get_chat_model
+
+        llm = get_chat_model(temperature=0.1)
+        started = time.perf_counter()
+        result = await with_deadline(llm.ainvoke(_TREND_EXTRACTION_PROMPT.format(raw_text=raw_text)))
+        observe_llm("trend_extraction", started, result)
+        return _parse_trends(getattr(result, "content", "") or "")
+    except DeadlineExceededError:
+        raise
+    except Exception:
+        return []
+
+
+def _build_research_response(query: str, state: Dict[str, Any], trends: list) -> ResearchResponse:
+    raw_text = state.get("draft_report", "")
+    return ResearchResponse(
+        title=f"{query}分析报告",
+        query=query,
+        trends=trends,
+        conclusion=raw_text[:500] + "...",
+        sources=state.get("sources", [])[:5]
+    )
+
+
+async def _run_analysis(query: str) -> ResearchResponse:
+    """执行完整分析流程并提取趋势"""
+    state: Dict[str, Any] = {}
+    async for _, _, state in _run_graph(_initial_state(query)):
+        pass
+
+    trends = await _extract_trends(state.get("draft_report", ""))
+    return _build_research_response(query, state, trends)
+
+
+_analysis_flight = SingleFlight()
+
+
+@business_router.post("/analyze", response_model=ResearchResponse)
+async def analyze_market(request: QueryRequest):
+    if not request.query.strip():
+        raise HTTPException(status_code=400, detail="查询内容不能为空")
+
+    try:
+        # 相同查询的并发分析合并为一次流程执行
+        return await _analysis_flight.do(normalize_key(request.query), lambda: _run_analysis(request.query))
+    except DeadlineExceededError:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"分析失败: {str(e)}")
 
+
+@business_router.post("/analyze/stream")
+async def analyze_market_stream(request: QueryRequest):
+    """流式分析接口：每个 LangGraph 节点完成即推送一条 SSE 进度事件
+
+    事件类型：
+    - node: 节点完成，包含节点名、累计耗时与该节点产出的部分状态
+    - trends: 开始提取趋势
+    - complete: 最终 ResearchResponse
+    - error: 流程失败
+    """
+    if not request.query.strip():
+        raise HTTPException(status_code=400, detail="查询内容不能为空")
+
+    async def event_stream():
+        started = time.perf_counter()
+        try:
+            state: Dict[str, Any] = {}
+            async for node, update, state in _run_graph(_initial_state(request.query)):
+                yield _sse({
+                    "type": "node",
+                    "node": node,
+                    "elapsed": round(time.perf_counter() - started, 3),
+                    "state": update,
+                })
+
+            yield _sse({"type": "trends", "elapsed": round(time.perf_counter() - started, 3)})
+            trends = await _extract_trends(state.get("draft_report", ""))
+            result = _build_research_response(request.query, state, trends)
+            yield _sse({
+                "type": "complete",
+                "elapsed": round(time.perf_counter() - started, 3),
+                "data": result.model_dump(),
+            })
+        except Exception as e:
+            yield _sse({"type": "error", "error": f"分析失败: {str(e)}"})
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream", headers=_SSE_HEADERS)
+
+# ==============================
+# 异步分析任务接口
+# ==============================
+
+async def _analysis_job_runner(query: str, emit) -> Dict[str, Any]:
+    """任务队列执行函数：运行分析图并上报节点进度"""
+    started = time.perf_counter()
+    state: Dict[str, Any] = {}
+    async for node, update, state in _run_graph(_initial_state(query)):
+        emit({
+            "type": "node",
+            "node": node,
+            "elapsed": round(time.perf_counter() - started, 3),
+            "state": update,
+        })
+    emit({"type": "trends", "elapsed": round(time.perf_counter() - started, 3)})
+    trends = await _extract_trends(state.get("draft_report", ""))
+    return _build_research_response(query, state, trends).model_dump()
+
+
+analysis_jobs = AnalysisJobQueue(
+    _analysis_job_runner,
+    SqliteJobStore(
+        os.path.abspath(os.path.join(os.path.dirname(__file__), "../.cache/analysis_jobs.sqlite3")),
+        heartbeat_timeout=config.ANALYZE_JOB_HEARTBEAT_TIMEOUT,
+    ),
+    workers=config.ANALYZE_JOB_WORKERS,
+    max_pending=config.ANALYZE_JOB_QUEUE_SIZE,
+    heartbeat_interval=config.ANALYZE_JOB_HEARTBEAT_INTERVAL,
+)
+
+
+@business_router.post("/jobs/analyze")
+async def submit_analyze_job(request: QueryRequest) -> Any:
+    """提交异步分析任务，立即返回 job_id"""
+    if not request.query.strip():
+        return APIResponse.validation_error(message="查询内容不能为空")
+    try:
+        job_id = await analysis_jobs.submit(request.query)
+    except JobQueueFullError as e:
+        return APIResponse.error(message=str(e), code="429", status_code=429)
+    return APIResponse.created(data={"job_id": job_id, "status": JOB_QUEUED, "pending": analysis_jobs.pending})
+
+
+@business_router.get("/jobs/{job_id}")
+async def get_analyze_job(job_id: str) -> Any:
+    """查询任务状态与最新进度"""
+    job = await analysis_jobs.get(job_id)
+    if job is None:
+        return APIResponse.not_found(message="任务不存在")
+    return APIResponse.success(data=job)
+
+
+@business_router.get("/jobs/{job_id}/result", response_model=ResearchResponse)
+async def get_analyze_job_result(job_id: str):
+    """获取任务最终的 ResearchResponse，未完成时返回 409"""
+    job = await analysis_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="任务不存在")
+    if job["status"] == JOB_FAILED:
+        raise HTTPException(status_code=500, detail=f"分析失败: {job['error']}")
+    if job["status"] != JOB_SUCCEEDED:
+        raise HTTPException(status_code=409, detail=f"任务尚未完成，当前状态: {job['status']}")
+    return ResearchResponse(**job["result"])
+
+
+@business_router.get("/jobs/{job_id}/stream")
+async def stream_analyze_job(job_id: str) -> Any:
+    """以 SSE 订阅任务进度，直到任务结束"""
+    if await analysis_jobs.get(job_id) is None:
+        return APIResponse.not_found(message="任务不存在")
+
+    async def event_stream():
+        async for event in analysis_jobs.events(job_id):
+            yield _sse(event)
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream", headers=_SSE_HEADERS)
+
+
 # 修复第211行后的代码结构问题
 class QuestionRequest(BaseModel):
     question: str
 
-# 修复导入问题 - 在文件顶部添加错误处理
-try:
-    from mcp_client.tools.langgraph import load_qa_chain
-    qa_chain = load_qa_chain()
-except ImportError:
-    # 如果导入失败，提供一个模拟的QA链
-    class MockQAChain:
-        def invoke(self, inputs):
-            return {
-                "result": "RAG功能当前不可用，请检查配置",
-                "source_documents": []
-            }
-    qa_chain = MockQAChain()
+class MockQAChain:
+    """导入失败时的模拟QA链"""
+    def invoke(self, inputs):
+        return {
+            "result": "RAG功能当前不可用，请检查配置",
+            "source_documents": []
+        }
+
+    async def ainvoke(self, inputs):
+        return self.invoke(inputs)
+
+
+_qa_chain = None
+_qa_chain_lock = threading.Lock()
+
+
+def get_qa_chain():
+    """获取问答链，首次调用时初始化RAG系统（线程安全的单例）"""
+    global _qa_chain
+    if _qa_chain is None:
+        with _qa_chain_lock:
+            if _qa_chain is None:
+                try:
+                    from mcp_client.tools.langchain import load_qa_chain
+                    _qa_chain = load_qa_chain()
+                except ImportError:
+                    # 如果导入失败，提供一个模拟的QA链
+                    _qa_chain = MockQAChain()
+    return _qa_chain
 
 @business_router.post("/ask")
-def ask(request: QuestionRequest):
+async def ask(request: QuestionRequest):
     """问答接口"""
     try:
-        result = qa_chain.invoke({"query": request.question})
+        # 首次调用会初始化RAG（阻塞），放到线程中执行
+        qa_chain = await asyncio.to_thread(get_qa_chain)
+        result = await qa_chain.ainvoke({"query": request.question})
         return {
             "answer": result["result"],
             "sources": [
@@ -239,6 +556,8 @@ def ask(request: QuestionRequest):
                 for doc in result.get("source_documents", [])
             ]
         }
+    except DeadlineExceededError:
+        raise
     except Exception as e:
         return {
             "answer": f"处理问题时出错: {str(e)}",
@@ -255,9 +574,9 @@ async def rag_status():
         
         rag_system = get_rag_system()
         
-        # 尝试初始化检查
-        if not rag_system.query_engine:
-            rag_system.initialize()
+        # 尝试初始化检查（query_engine 始终为空，以检索器判断是否已初始化）
+        if not rag_system.retriever:
+            await rag_system.ainitialize()
         
         status = {
             "rag_available": rag_system.index is not None,
@@ -282,11 +601,11 @@ async def rag_search(request: QuestionRequest):
         # 如果检索器未初始化，尝试初始化整个系统
         if not rag_system.retriever:
             print("RAG系统未初始化，尝试初始化...")
-            initialize_success = rag_system.initialize()
+            initialize_success = await rag_system.ainitialize()
             if not initialize_success:
                 return APIResponse.error(message="RAG系统初始化失败", code="500")
         
-        documents = rag_system.retrieve_documents(request.question, top_k=5)
+        documents = await rag_system.aretrieve_documents(request.question, top_k=5)
         
         return APIResponse.success(data={
             "query": request.question,
@@ -306,14 +625,14 @@ async def rag_ask(request: QuestionRequest):
         rag_system = get_rag_system()
         
         # 如果RAG系统未初始化，尝试初始化
-        if not rag_system.query_engine:
+        if not rag_system.retriever:
             print("RAG系统未初始化，尝试初始化...")
-            initialize_success = rag_system.initialize()
+            initialize_success = await rag_system.ainitialize()
             if not initialize_success:
                 return APIResponse.error(message="RAG系统初始化失败", code="500")
         
         # 使用RAG系统回答问题
-        result = rag_system.query(request.question)
+        result = await rag_system.aquery(request.question)
         
         return APIResponse.success(data={
             "answer": result["answer"],
@@ -321,15 +640,18 @@ async def rag_ask(request: QuestionRequest):
             "source_count": len(result["sources"])
         })
         
+    except DeadlineExceededError:
+        raise
     except Exception as e:
         return APIResponse.error(message=str(e), code="500")
 
 # 保持原有的ask接口，但确保使用增强的load_qa_chain
 @business_router.post("/ask")
-def ask(request: QuestionRequest):
+async def ask(request: QuestionRequest):
     """问答接口 - 使用LangChain+LlamaIndex"""
     try:
-        result = qa_chain.invoke({"query": request.question})
+        qa_chain = await asyncio.to_thread(get_qa_chain)
+        result = await qa_chain.ainvoke({"query": request.question})
         return {
             "answer": result["result"],
             "sources": [
@@ -338,6 +660,8 @@ def ask(request: QuestionRequest):
             ],
             "source_count": len(result.get("source_documents", []))
         }
+    except DeadlineExceededError:
+        raise
     except Exception as e:
         return {
             "answer": f"处理问题时出错: {str(e)}",
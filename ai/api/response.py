@@ -171,11 +171,12 @@ class APIResponse:
         data: Any = None,
         message: str = "操作成功",
         code: str = "200",
-        status_code: int = status.HTTP_200_OK
+        status_code: int = status.HTTP_200_OK,
+        headers: Optional[Dict[str, str]] = None
     ) -> JSONResponse:
         """成功响应"""
         content = ResponseFormat.success(data=data, message=message, code=code)
-        return JSONResponse(content=content, status_code=status_code)
+        return JSONResponse(content=content, status_code=status_code, headers=headers)
     
     @staticmethod
     def created(
@@ -212,11 +213,12 @@ class APIResponse:
         message: str = "操作失败",
         code: str = "500",
         data: Any = None,
-        status_code: int = status.HTTP_500_INTERNAL_SERVER_ERROR
+        status_code: int = status.HTTP_500_INTERNAL_SERVER_ERROR,
+        headers: Optional[Dict[str, str]] = None
     ) -> JSONResponse:
         """错误响应"""
         content = ResponseFormat.error(message=message, code=code, data=data)
-        return JSONResponse(content=content, status_code=status_code)
+        return JSONResponse(content=content, status_code=status_code, headers=headers)
     
     @staticmethod
     def unauthorized(
@@ -0,0 +1,113 @@
+"""
+启动耗时分析
+
+python main.py --profile-startup
+
+- 每个阶段在独立子进程中执行（python -X importtime），避免模块缓存相互影响
+- 阶段 main 只导入应用；其余阶段在导入应用后执行对应子系统的初始化
+- 按顶层包汇总各阶段新增导入的自身耗时，并给出初始化（非导入）耗时
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+_AI_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+_MARKER = "__startup_profile_phase__"
+
+# (阶段名, 阶段代码)；除 main 外均在 import main 之后执行
+PHASES: List[Tuple[str, str]] = [
+    ("main", ""),
+    ("graph", "from api.business import get_graph; get_graph()"),
+    ("rag", "from api.business import get_qa_chain; get_qa_chain()"),
+    ("agent", "from mcp_client.tools.langchain import LangChainAgent; LangChainAgent()"),
+]
+
+_PHASE_SCRIPT = """
+import sys, time, json
+sys.stderr.write({marker!r} + "\\n")
+sys.stderr.flush()
+t0 = time.perf_counter()
+import main
+t1 = time.perf_counter()
+sys.stderr.write({marker!r} + "\\n")
+sys.stderr.flush()
+{code}
+t2 = time.perf_counter()
+print({marker!r} + json.dumps({{"import_main": t1 - t0, "phase": t2 - t1}}))
+"""
+
+
+def _parse_importtime(lines: List[str]) -> Dict[str, float]:
+    """解析 -X importtime 输出，按顶层包汇总自身耗时（秒）"""
+    totals: Dict[str, float] = {}
+    for line in lines:
+        if not line.startswith("import time:"):
+            continue
+        # 格式：import time: self [us] | cumulative | imported package
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3 or not parts[0].strip().isdigit():
+            continue
+        package = parts[2].strip().split(".")[0]
+        totals[package] = totals.get(package, 0.0) + int(parts[0]) / 1e6
+    return totals
+
+
+def _run_phase(code: str) -> Tuple[Dict[str, float], Dict[str, float], Dict[str, float]]:
+    """执行单个阶段，返回 (main导入明细, 阶段导入明细, 耗时)"""
+    script = _PHASE_SCRIPT.format(marker=_MARKER, code=code or "pass")
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", script],
+        cwd=_AI_DIR,
+        capture_output=True,
+        text=True,
+    )
+    # 输出被两个标记分为：解释器启动 | import main | 阶段代码
+    stderr = proc.stderr.splitlines()
+    markers = [i for i, line in enumerate(stderr) if line == _MARKER]
+    start, split = (markers + [len(stderr), len(stderr)])[:2]
+    timings: Dict[str, float] = {}
+    for line in proc.stdout.splitlines():
+        if line.startswith(_MARKER):
+            timings = json.loads(line[len(_MARKER):])
+    if proc.returncode != 0 and not timings:
+        tail = "\n".join(stderr[-5:])
+        raise RuntimeError(f"阶段执行失败（退出码 {proc.returncode}）：\n{tail}")
+    return _parse_importtime(stderr[start + 1:split]), _parse_importtime(stderr[split + 1:]), timings
+
+
+def _print_breakdown(title: str, imports: Dict[str, float], top: int) -> None:
+    total = sum(imports.values())
+    print(f"  {title}：导入合计 {total:.3f}s")
+    for package, seconds in sorted(imports.items(), key=lambda kv: kv[1], reverse=True)[:top]:
+        print(f"    {package:<32}{seconds:>9.3f}s")
+
+
+def profile_startup(top: int = 15) -> None:
+    """逐阶段输出导入与初始化耗时"""
+    print("=" * 60)
+    print("启动耗时分析")
+    print("=" * 60)
+    for name, code in PHASES:
+        try:
+            main_imports, phase_imports, timings = _run_phase(code)
+        except Exception as e:
+            print(f"[{name}] 失败: {e}")
+            continue
+
+        if name == "main":
+            print(f"[main] import main 总耗时 {timings.get('import_main', 0.0):.3f}s")
+            _print_breakdown("应用导入", main_imports, top)
+            continue
+
+        phase_total = timings.get("phase", 0.0)
+        phase_import_total = sum(phase_imports.values())
+        print(
+            f"[{name}] 总耗时 {phase_total:.3f}s"
+            f"（导入 {phase_import_total:.3f}s，初始化 {max(0.0, phase_total - phase_import_total):.3f}s）"
+        )
+        _print_breakdown("新增导入", phase_imports, top)
@@ -0,0 +1,85 @@
+"""
+启动预热
+
+- 在 FastAPI lifespan 中后台执行，uvicorn 可立即接受请求（存活探针可用）
+- 分析图、RAG 问答链、LangChain 智能体并行初始化，阻塞型初始化放到线程中执行
+- 全部必需组件完成后就绪探针才返回成功，编排系统据此决定何时导入流量
+"""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict
+
+WARMUP_PENDING = "pending"
+WARMUP_RUNNING = "running"
+WARMUP_READY = "ready"
+WARMUP_FAILED = "failed"
+
+
+class WarmupState:
+    """记录各组件的预热状态"""
+
+    def __init__(self) -> None:
+        self.components: Dict[str, Dict[str, Any]] = {}
+        # 失败不影响就绪的组件（服务可降级运行）
+        self.optional: set = set()
+
+    def register(self, name: str, optional: bool = False) -> None:
+        self.components[name] = {"status": WARMUP_PENDING, "elapsed": None, "error": None}
+        if optional:
+            self.optional.add(name)
+
+    @property
+    def ready(self) -> bool:
+        return bool(self.components) and all(
+            c["status"] == WARMUP_READY or (name in self.optional and c["status"] == WARMUP_FAILED)
+            for name, c in self.components.items()
+        )
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {"ready": self.ready, "components": self.components}
+
+
+warmup_state = WarmupState()
+
+
+async def _run_component(name: str, fn: Callable[[], Awaitable[Any]]) -> None:
+    component = warmup_state.components[name]
+    component["status"] = WARMUP_RUNNING
+    started = time.perf_counter()
+    try:
+        await fn()
+        component["status"] = WARMUP_READY
+    except Exception as e:
+        component["status"] = WARMUP_FAILED
+        component["error"] = str(e)
+        print(f"预热组件 {name} 失败: {e}")
+    finally:
+        component["elapsed"] = round(time.perf_counter() - started, 3)
+
+
+async def run_warmup() -> None:
+    """并行初始化所有组件"""
+    from api import business
+
+    async def init_agent() -> None:
+        if business.get_agent is None:
+            raise RuntimeError(f"LangChain智能体未正确加载: {business._import_error}")
+        await business.get_agent()
+
+    steps: Dict[str, Callable[[], Awaitable[Any]]] = {
+        "graph": lambda: asyncio.to_thread(business.get_graph),
+        "rag": lambda: asyncio.to_thread(business.get_qa_chain),
+        "agent": init_agent,
+    }
+    warmup_state.register("graph")
+    warmup_state.register("rag", optional=True)
+    warmup_state.register("agent")
+    await asyncio.gather(*(_run_component(name, fn) for name, fn in steps.items()))
+
+
+def start_warmup() -> asyncio.Task:
+    """在当前事件循环中后台启动预热"""
+    return asyncio.create_task(run_warmup(), name="startup-warmup")
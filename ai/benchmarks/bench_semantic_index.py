@@ -0,0 +1,128 @@
+"""
+语义缓存索引检索延迟基准
+
+python benchmarks/bench_semantic_index.py --sizes 10000,100000,1000000 --dim 384 --queries 1000
+
+在 10k / 100k / 1M 条缓存规模下对比命中路径（向量检索 + 取答案）的延迟分位与召回：
+- legacy：L2 精确检索 + 按问题文本倒序线性扫描答案表（改造前的实现）
+- flat / ivf / hnsw：归一化向量 + 内积索引，按 id 直接取答案（SemanticIndexStore）
+查询向量为已缓存向量加少量噪声（模拟换一种说法的同一问题），召回即最近邻为其来源条目的比例。
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import statistics
+import sys
+import time
+from typing import List, Sequence, Tuple
+
+import faiss
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from mcp_client.tools.semantic_store import SemanticIndexStore
+
+
+class LegacySemanticIndex:
+    """改造前的实现：L2 精确检索，命中后在 (问题, 答案) 列表中倒序查找答案"""
+
+    def __init__(self) -> None:
+        self._index = None
+        self._qa_store: List[Tuple[str, str]] = []
+        self._questions: List[str] = []
+
+    def add_many(self, items: Sequence[Tuple[str, str, Sequence[float]]]) -> None:
+        vectors = np.array([v for _, _, v in items], dtype=np.float32)
+        if self._index is None:
+            self._index = faiss.IndexFlatL2(vectors.shape[1])
+        self._index.add(vectors)
+        self._qa_store.extend((q, a) for q, a, _ in items)
+        self._questions.extend(q for q, _, _ in items)
+
+    def lookup(self, vector: np.ndarray) -> Tuple[int, str]:
+        _, ids = self._index.search(vector.reshape(1, -1), 3)
+        question = self._questions[ids[0][0]]
+        for i in range(len(self._qa_store) - 1, -1, -1):
+            if self._qa_store[i][0] == question:
+                return i + 1, self._qa_store[i][1]
+        return -1, ""
+
+
+class StoreIndex:
+    def __init__(self, index_type: str, nlist: int) -> None:
+        # 基准中只比较检索，不写快照
+        self.store = SemanticIndexStore(None, snapshot_every=0, index_type=index_type, ivf_nlist=nlist)
+
+    def add_many(self, items: Sequence[Tuple[str, str, Sequence[float]]]) -> None:
+        self.store.add_many(items)
+
+    def lookup(self, vector: np.ndarray) -> Tuple[int, str]:
+        results = self.store.search(vector, k=3)
+        row_id = results[0][0]
+        return row_id, self.store.answer(row_id)
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct))]
+
+
+def run(impl, data: np.ndarray, queries: np.ndarray, sources: np.ndarray, batch: int) -> dict:
+    started = time.perf_counter()
+    for start in range(0, len(data), batch):
+        chunk = data[start:start + batch]
+        impl.add_many([(f"问题-{start + i}", f"答案-{start + i}", v) for i, v in enumerate(chunk)])
+    build_s = time.perf_counter() - started
+
+    latencies: List[float] = []
+    hits = 0
+    for vector, source in zip(queries, sources):
+        started = time.perf_counter()
+        row_id, _ = impl.lookup(vector)
+        latencies.append(time.perf_counter() - started)
+        # 行号从 1 开始
+        hits += row_id == source + 1
+    return {
+        "build_s": build_s,
+        "p50_us": _percentile(latencies, 0.5) * 1e6,
+        "p99_us": _percentile(latencies, 0.99) * 1e6,
+        "mean_us": statistics.mean(latencies) * 1e6,
+        "recall": hits / len(queries),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="语义缓存索引检索延迟基准")
+    parser.add_argument("--sizes", default="10000,100000,1000000", help="缓存条数，逗号分隔")
+    parser.add_argument("--dim", type=int, default=384, help="向量维度（bge-small 为 384）")
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--impls", default="legacy,flat,ivf,hnsw")
+    parser.add_argument("--noise", type=float, default=0.3, help="噪声向量范数（相对单位向量），0.3 约对应余弦相似度 0.96")
+    parser.add_argument("--batch", type=int, default=10000, help="构建时每批写入条数")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"dim={args.dim} queries={args.queries} noise={args.noise}")
+    print(f"{'size':>9} {'impl':<8}{'build s':>10}{'p50':>10}{'p99':>10}{'mean':>10}{'recall':>8}  (us)")
+    for size in (int(s) for s in args.sizes.split(",")):
+        data = rng.standard_normal((size, args.dim), dtype=np.float32)
+        faiss.normalize_L2(data)
+        sources = rng.integers(0, size, args.queries)
+        noise = rng.standard_normal((args.queries, args.dim), dtype=np.float32) * (args.noise / args.dim ** 0.5)
+        queries = data[sources] + noise
+        # nlist 取 4*sqrt(n)，并保证训练样本充足
+        nlist = max(16, min(int(4 * size ** 0.5), size // 39))
+        for name in args.impls.split(","):
+            impl = LegacySemanticIndex() if name == "legacy" else StoreIndex(name, nlist)
+            r = run(impl, data, queries, sources, args.batch)
+            print(
+                f"{size:>9} {name:<8}{r['build_s']:>10.1f}{r['p50_us']:>10.1f}{r['p99_us']:>10.1f}"
+                f"{r['mean_us']:>10.1f}{r['recall']:>8.3f}"
+            )
+            del impl
+
+
+if __name__ == "__main__":
+    main()
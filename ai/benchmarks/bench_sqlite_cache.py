@@ -0,0 +1,146 @@
+"""
+SqliteExactCache 并发吞吐基准
+
+python benchmarks/bench_sqlite_cache.py --threads 8 --ops 20000 --read-ratio 0.9
+
+对比两种实现在相同负载下的 get/put 吞吐与延迟分位：
+- legacy：每次调用新建连接、全局锁串行、回滚日志（改造前的实现）
+- current：WAL + 线程级长连接读 + 后台批量提交写
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from typing import List, Optional
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from mcp_client.tools.sqlite_cache import SqliteExactCache
+
+
+class LegacyExactCache:
+    """改造前的实现：每次调用打开新连接，一把锁串行所有读写"""
+
+    def __init__(self, db_path: str) -> None:
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS qa_cache (id INTEGER PRIMARY KEY AUTOINCREMENT, "
+                "question TEXT UNIQUE, answer TEXT NOT NULL, created_at TEXT NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_qa_question ON qa_cache(question)")
+            conn.commit()
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.db_path, timeout=10, check_same_thread=False)
+
+    def get(self, question: str) -> Optional[str]:
+        with self._lock, self._connect() as conn:
+            row = conn.execute("SELECT answer FROM qa_cache WHERE question = ?", (question,)).fetchone()
+        return row[0] if row else None
+
+    def put(self, question: str, answer: str) -> None:
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO qa_cache(question, answer, created_at) VALUES(?, ?, ?)",
+                (question, answer, datetime.utcnow().isoformat()),
+            )
+            conn.commit()
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct))]
+
+
+def run(cache, threads: int, ops: int, read_ratio: float, keys: int) -> dict:
+    # 预热一半的 key，使读取有命中也有未命中
+    for i in range(0, keys, 2):
+        cache.put(f"问题-{i}", f"答案-{i}" * 20)
+    cache.flush()
+
+    per_thread = ops // threads
+    get_lat: List[List[float]] = [[] for _ in range(threads)]
+    put_lat: List[List[float]] = [[] for _ in range(threads)]
+    barrier = threading.Barrier(threads + 1)
+
+    def worker(idx: int) -> None:
+        rnd = random.Random(idx)
+        barrier.wait()
+        for _ in range(per_thread):
+            key = f"问题-{rnd.randrange(keys)}"
+            started = time.perf_counter()
+            if rnd.random() < read_ratio:
+                cache.get(key)
+                get_lat[idx].append(time.perf_counter() - started)
+            else:
+                cache.put(key, f"新答案-{idx}" * 20)
+                put_lat[idx].append(time.perf_counter() - started)
+
+    workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    for t in workers:
+        t.start()
+    barrier.wait()
+    started = time.perf_counter()
+    for t in workers:
+        t.join()
+    cache.flush()
+    elapsed = time.perf_counter() - started
+
+    gets = [v for lat in get_lat for v in lat]
+    puts = [v for lat in put_lat for v in lat]
+    return {
+        "ops_per_sec": (len(gets) + len(puts)) / elapsed,
+        "get_p50_us": _percentile(gets, 0.5) * 1e6,
+        "get_p99_us": _percentile(gets, 0.99) * 1e6,
+        "put_p50_us": _percentile(puts, 0.5) * 1e6,
+        "put_p99_us": _percentile(puts, 0.99) * 1e6,
+        "get_mean_us": statistics.mean(gets) * 1e6 if gets else 0.0,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="SqliteExactCache 并发吞吐基准")
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--ops", type=int, default=20000, help="总操作数")
+    parser.add_argument("--read-ratio", type=float, default=0.9, help="读操作占比")
+    parser.add_argument("--keys", type=int, default=5000, help="key 空间大小")
+    args = parser.parse_args()
+
+    print(f"threads={args.threads} ops={args.ops} read_ratio={args.read_ratio} keys={args.keys}")
+    print(f"{'impl':<10}{'ops/s':>12}{'get p50':>12}{'get p99':>12}{'put p50':>12}{'put p99':>12}  (us)")
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, factory in (
+            ("legacy", lambda: LegacyExactCache(os.path.join(tmp, "legacy.sqlite3"))),
+            ("current", lambda: SqliteExactCache(os.path.join(tmp, "current.sqlite3"))),
+        ):
+            cache = factory()
+            try:
+                r = run(cache, args.threads, args.ops, args.read_ratio, args.keys)
+            finally:
+                cache.close()
+            print(
+                f"{name:<10}{r['ops_per_sec']:>12.0f}{r['get_p50_us']:>12.1f}{r['get_p99_us']:>12.1f}"
+                f"{r['put_p50_us']:>12.1f}{r['put_p99_us']:>12.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -31,6 +31,89 @@ class Config:
     HOST: str = os.getenv("HOST", "0.0.0.0")
     PORT: int = int(os.getenv("PORT", "7011"))
     
+    # LLM网关配置（所有LLM调用共用连接池与限流额度）
+    LLM_RPM: int = int(os.getenv("LLM_RPM", "300"))  # 每分钟请求数上限，0 表示不限制
+    LLM_TPM: int = int(os.getenv("LLM_TPM", "0"))  # 每分钟token数上限（按请求体估算），0 表示不限制
+    LLM_MAX_CONCURRENCY: int = int(os.getenv("LLM_MAX_CONCURRENCY", "16"))  # 同时在途的LLM请求数
+    LLM_POOL_MAX_CONNECTIONS: int = int(os.getenv("LLM_POOL_MAX_CONNECTIONS", "32"))  # 连接池最大连接数
+    LLM_POOL_MAX_KEEPALIVE: int = int(os.getenv("LLM_POOL_MAX_KEEPALIVE", "16"))  # 保持的空闲长连接数
+    LLM_POOL_KEEPALIVE_EXPIRY: float = float(os.getenv("LLM_POOL_KEEPALIVE_EXPIRY", "60"))  # 空闲连接保持秒数
+    LLM_TIMEOUT: float = float(os.getenv("LLM_TIMEOUT", "120"))  # 单次LLM请求超时（秒）
+    
+    # 精确缓存过期与容量配置
+    EXACT_CACHE_TTL: float = float(os.getenv("EXACT_CACHE_TTL", "604800"))  # 默认过期时间（秒），0 表示永不过期
+    EXACT_CACHE_TTL_BY_INTENT: str = os.getenv("EXACT_CACHE_TTL_BY_INTENT", "weather:1800,location:86400")  # 按意图的过期时间
+    EXACT_CACHE_MAX_ENTRIES: int = int(os.getenv("EXACT_CACHE_MAX_ENTRIES", "100000"))  # 最大条数，0 表示不限制
+    EXACT_CACHE_MAX_MB: int = int(os.getenv("EXACT_CACHE_MAX_MB", "256"))  # 最大占用（MB），0 表示不限制
+    EXACT_CACHE_COMPACT_INTERVAL: float = float(os.getenv("EXACT_CACHE_COMPACT_INTERVAL", "300"))  # 清理/淘汰/VACUUM 间隔（秒）
+    
+    # 语义缓存持久化配置
+    SEMANTIC_CACHE_PERSIST: bool = os.getenv("SEMANTIC_CACHE_PERSIST", "true").lower() == "true"  # 是否持久化到 .cache 目录
+    SEMANTIC_CACHE_SNAPSHOT_EVERY: int = int(os.getenv("SEMANTIC_CACHE_SNAPSHOT_EVERY", "200"))  # 每写入多少条保存一次索引快照，0 表示只在关闭时保存
+    SEMANTIC_CACHE_THRESHOLD: float = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92"))  # 命中所需的最低余弦相似度
+    SEMANTIC_CACHE_INDEX: str = os.getenv("SEMANTIC_CACHE_INDEX", "flat")  # 索引类型：flat（精确）/ ivf / hnsw（近似，适合百万级）
+    SEMANTIC_CACHE_IVF_NLIST: int = int(os.getenv("SEMANTIC_CACHE_IVF_NLIST", "1024"))  # ivf 聚类中心数
+    SEMANTIC_CACHE_IVF_NPROBE: int = int(os.getenv("SEMANTIC_CACHE_IVF_NPROBE", "16"))  # ivf 检索时访问的聚类数
+    SEMANTIC_CACHE_HNSW_EF_SEARCH: int = int(os.getenv("SEMANTIC_CACHE_HNSW_EF_SEARCH", "64"))  # hnsw 检索候选队列长度
+    SEMANTIC_CACHE_TTL: float = float(os.getenv("SEMANTIC_CACHE_TTL", "604800"))  # 默认过期时间（秒），0 表示永不过期
+    SEMANTIC_CACHE_MAX_ENTRIES: int = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "100000"))  # 最大条数，0 表示不限制
+    SEMANTIC_CACHE_MAX_MB: int = int(os.getenv("SEMANTIC_CACHE_MAX_MB", "512"))  # 索引内存预算（MB），0 表示不限制
+    SEMANTIC_CACHE_EVICTION: str = os.getenv("SEMANTIC_CACHE_EVICTION", "lru")  # 淘汰策略：lru / lfu
+    SEMANTIC_CACHE_COMPACT_INTERVAL: float = float(os.getenv("SEMANTIC_CACHE_COMPACT_INTERVAL", "300"))  # 清理/淘汰/压缩间隔（秒）
+    SEMANTIC_CACHE_WRITE_BATCH: int = int(os.getenv("SEMANTIC_CACHE_WRITE_BATCH", "64"))  # 写队列每批最多条数（一次批量嵌入、一个事务）
+    SEMANTIC_CACHE_WRITE_WAIT_MS: float = float(os.getenv("SEMANTIC_CACHE_WRITE_WAIT_MS", "5"))  # 写队列攒批等待时间（毫秒）
+    SEMANTIC_CACHE_WRITE_QUEUE: int = int(os.getenv("SEMANTIC_CACHE_WRITE_QUEUE", "10000"))  # 写队列容量，满时丢弃新写入
+    
+    # LLM分层缓存配置（L1内存LRU / L2 SQLite / L3语义）
+    LLM_CACHE: bool = os.getenv("LLM_CACHE", "true").lower() == "true"
+    LLM_CACHE_L1_SIZE: int = int(os.getenv("LLM_CACHE_L1_SIZE", "1024"))  # L1 内存缓存条数
+    LLM_CACHE_SEMANTIC: bool = os.getenv("LLM_CACHE_SEMANTIC", "true").lower() == "true"  # 是否启用 L3 语义层
+    LLM_CACHE_SEMANTIC_MAX_CHARS: int = int(os.getenv("LLM_CACHE_SEMANTIC_MAX_CHARS", "500"))  # 超过该长度的问题不走语义层
+    
+    # 意图路由配置
+    INTENT_CONFIG: str = os.getenv("INTENT_CONFIG", "")  # 意图/实体词典JSON路径，为空使用内置 intents.json
+    INTENT_CENTROID_THRESHOLD: float = float(os.getenv("INTENT_CENTROID_THRESHOLD", "0"))  # 嵌入质心分类阈值，0 表示关闭
+    
+    # 嵌入模型配置
+    EMBEDDING_MODEL: str = os.getenv("EMBEDDING_MODEL", "BAAI/bge-small-en-v1.5")  # 本地 HuggingFace 嵌入模型（RAG 与语义缓存共用）
+    EMBEDDING_BATCH_SIZE: int = int(os.getenv("EMBEDDING_BATCH_SIZE", "32"))  # 本地模型单批最大条数
+    EMBEDDING_BATCH_WAIT_MS: float = float(os.getenv("EMBEDDING_BATCH_WAIT_MS", "2"))  # 凑批最长等待（毫秒）
+    EMBEDDING_WORKERS: int = int(os.getenv("EMBEDDING_WORKERS", "1"))  # 本地模型推理线程池大小
+    SEMANTIC_CACHE_EMBEDDING: str = os.getenv("SEMANTIC_CACHE_EMBEDDING", "local")  # 语义缓存嵌入提供方：local / openai
+    
+    # 查询向量记忆化
+    EMBEDDING_MEMO_SIZE: int = int(os.getenv("EMBEDDING_MEMO_SIZE", "4096"))  # 缓存的向量条数，0 表示关闭
+    
+    # RAG配置
+    RAG_EXECUTOR_WORKERS: int = int(os.getenv("RAG_EXECUTOR_WORKERS", "4"))  # 检索线程池大小
+    
+    # 会话历史配置
+    SESSION_STORE: str = os.getenv("SESSION_STORE", "memory")  # memory | sqlite（多 worker 共享）
+    SESSION_MAX_TURNS: int = int(os.getenv("SESSION_MAX_TURNS", "10"))  # 每个会话保留的历史问题数
+    SESSION_MAX_SESSIONS: int = int(os.getenv("SESSION_MAX_SESSIONS", "10000"))  # 会话数上限，超出按LRU淘汰
+    
+    # 批量问答配置
+    CHAT_BATCH_CONCURRENCY: int = int(os.getenv("CHAT_BATCH_CONCURRENCY", "8"))  # 默认并发数
+    CHAT_BATCH_MAX_CONCURRENCY: int = int(os.getenv("CHAT_BATCH_MAX_CONCURRENCY", "32"))  # 请求可指定的并发上限
+    CHAT_BATCH_MAX_SIZE: int = int(os.getenv("CHAT_BATCH_MAX_SIZE", "1000"))  # 单批最大问题数
+    
+    # 分析任务队列配置
+    ANALYZE_JOB_WORKERS: int = int(os.getenv("ANALYZE_JOB_WORKERS", "2"))  # 同时执行的分析图数量
+    ANALYZE_JOB_QUEUE_SIZE: int = int(os.getenv("ANALYZE_JOB_QUEUE_SIZE", "100"))  # 等待队列上限
+    ANALYZE_JOB_HEARTBEAT_INTERVAL: float = float(os.getenv("ANALYZE_JOB_HEARTBEAT_INTERVAL", "10"))  # 任务心跳间隔（秒）
+    ANALYZE_JOB_HEARTBEAT_TIMEOUT: float = float(os.getenv("ANALYZE_JOB_HEARTBEAT_TIMEOUT", "60"))  # 超过该秒数无心跳的未完成任务标记为失败
+    
+    # 准入控制配置：前缀:并发:队列长度:最长排队秒数:默认超时秒数，多条以逗号分隔
+    ADMISSION_LIMITS: str = os.getenv(
+        "ADMISSION_LIMITS",
+        "/business/analyze:4:16:10:300,"
+        "/business/rag:8:32:5:60,"
+        "/business/ask:8:32:5:60,"
+        "/business/chat:32:128:5:60,"
+        "/business/chat/batch:2:8:10:600",
+    )
+    REQUEST_TIMEOUT: float = float(os.getenv("REQUEST_TIMEOUT", "120"))  # 未配置路由的默认超时（秒）
+    
     # 调试模式
     DEBUG: bool = os.getenv("DEBUG", "false").lower() == "true"
     
@@ -68,6 +151,45 @@ class Config:
             "mcp_client_url": cls.MCP_CLIENT_URL,
             "host": cls.HOST,
             "port": cls.PORT,
+            "llm_rpm": cls.LLM_RPM,
+            "llm_tpm": cls.LLM_TPM,
+            "llm_max_concurrency": cls.LLM_MAX_CONCURRENCY,
+            "llm_pool_max_connections": cls.LLM_POOL_MAX_CONNECTIONS,
+            "llm_timeout": cls.LLM_TIMEOUT,
+            "exact_cache_ttl": cls.EXACT_CACHE_TTL,
+            "exact_cache_ttl_by_intent": cls.EXACT_CACHE_TTL_BY_INTENT,
+            "exact_cache_max_entries": cls.EXACT_CACHE_MAX_ENTRIES,
+            "exact_cache_max_mb": cls.EXACT_CACHE_MAX_MB,
+            "semantic_cache_persist": cls.SEMANTIC_CACHE_PERSIST,
+            "semantic_cache_snapshot_every": cls.SEMANTIC_CACHE_SNAPSHOT_EVERY,
+            "semantic_cache_threshold": cls.SEMANTIC_CACHE_THRESHOLD,
+            "semantic_cache_index": cls.SEMANTIC_CACHE_INDEX,
+            "semantic_cache_ttl": cls.SEMANTIC_CACHE_TTL,
+            "semantic_cache_max_entries": cls.SEMANTIC_CACHE_MAX_ENTRIES,
+            "semantic_cache_max_mb": cls.SEMANTIC_CACHE_MAX_MB,
+            "semantic_cache_eviction": cls.SEMANTIC_CACHE_EVICTION,
+            "semantic_cache_write_batch": cls.SEMANTIC_CACHE_WRITE_BATCH,
+            "llm_cache": cls.LLM_CACHE,
+            "llm_cache_l1_size": cls.LLM_CACHE_L1_SIZE,
+            "llm_cache_semantic": cls.LLM_CACHE_SEMANTIC,
+            "intent_config": cls.INTENT_CONFIG or None,
+            "intent_centroid_threshold": cls.INTENT_CENTROID_THRESHOLD,
+            "embedding_model": cls.EMBEDDING_MODEL,
+            "embedding_workers": cls.EMBEDDING_WORKERS,
+            "semantic_cache_embedding": cls.SEMANTIC_CACHE_EMBEDDING,
+            "embedding_memo_size": cls.EMBEDDING_MEMO_SIZE,
+            "rag_executor_workers": cls.RAG_EXECUTOR_WORKERS,
+            "session_store": cls.SESSION_STORE,
+            "session_max_turns": cls.SESSION_MAX_TURNS,
+            "session_max_sessions": cls.SESSION_MAX_SESSIONS,
+            "chat_batch_concurrency": cls.CHAT_BATCH_CONCURRENCY,
+            "chat_batch_max_size": cls.CHAT_BATCH_MAX_SIZE,
+            "analyze_job_workers": cls.ANALYZE_JOB_WORKERS,
+            "analyze_job_queue_size": cls.ANALYZE_JOB_QUEUE_SIZE,
+            "analyze_job_heartbeat_interval": cls.ANALYZE_JOB_HEARTBEAT_INTERVAL,
+            "analyze_job_heartbeat_timeout": cls.ANALYZE_JOB_HEARTBEAT_TIMEOUT,
+            "admission_limits": cls.ADMISSION_LIMITS,
+            "request_timeout": cls.REQUEST_TIMEOUT,
             "debug": cls.DEBUG,
         }
 
@@ -1,17 +1,54 @@
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.exceptions import RequestValidationError
-from starlette.responses import JSONResponse
+from starlette.responses import JSONResponse, PlainTextResponse
 from api.routes import router
 from config import config
 from api.response import APIResponse
+from api.admission import AdmissionControlMiddleware, parse_route_limits
+from api.warmup import start_warmup, warmup_state
+from mcp_client.tools.deadline import DeadlineExceededError
+from mcp_client.tools.llm_cache import close_llm_cache
+from mcp_client.tools.llm_gateway import close_gateway
+from mcp_client.tools.metrics import MetricsMiddleware, registry
 
 # 验证配置
 config.validate_config()
 
-app = FastAPI(title="AI Framework", version="1.0.0")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """启动时后台预热各组件，不阻塞 uvicorn 接受请求"""
+    warmup_task = start_warmup()
+    yield
+    if not warmup_task.done():
+        warmup_task.cancel()
+        try:
+            await warmup_task
+        except asyncio.CancelledError:
+            pass
+    # 写完缓存写队列并关闭缓存（智能体的精确/语义缓存、模型调用的分层缓存）
+    from api import business
+    if business.close_agent is not None:
+        await business.close_agent()
+    await asyncio.to_thread(close_llm_cache)
+    # 关闭 LLM 网关的长连接池
+    await close_gateway()
 
-# 添加CORS中间件
+app = FastAPI(title="AI Framework", version="1.0.0", lifespan=lifespan)
+
+# 准入控制：按路由限制并发与排队，并设置请求截止时间
+app.add_middleware(
+    AdmissionControlMiddleware,
+    limits=parse_route_limits(config.ADMISSION_LIMITS),
+    default_timeout=config.REQUEST_TIMEOUT,
+)
+
+# 请求耗时指标（位于准入控制外层，被拒绝的请求同样计入）
+app.add_middleware(MetricsMiddleware)
+
+# 添加CORS中间件（后添加的在外层，拒绝响应同样带CORS头）
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],  # 允许所有来源，生产环境建议指定具体域名
@@ -33,6 +70,12 @@ async def http_exception_handler(request: Request, exc: HTTPException) -> JSONRe
     message = exc.detail if isinstance(exc.detail, str) else "请求处理失败"
     return APIResponse.error(message=message, code=code, status_code=exc.status_code)
 
+# 统一异常处理：请求超过截止时间
+@app.exception_handler(DeadlineExceededError)
+async def deadline_exception_handler(request: Request, exc: DeadlineExceededError) -> JSONResponse:
+    # 超时多为上游排队或慢调用，提示客户端稍后重试
+    return APIResponse.error(message=str(exc), code="504", status_code=504, headers={"Retry-After": "1"})
+
 # 统一异常处理：未捕获异常
 @app.exception_handler(Exception)
 async def unhandled_exception_handler(request: Request, exc: Exception) -> JSONResponse:
@@ -45,11 +88,38 @@ app.include_router(router)
 async def root():
     return APIResponse.success(data={"message": "AI Framework is running"})
 
+@app.get("/livez")
+async def livez():
+    """存活探针：进程可响应即返回成功"""
+    return APIResponse.success(data={"status": "alive"})
+
+@app.get("/readyz")
+async def readyz():
+    """就绪探针：预热完成前返回 503"""
+    snapshot = warmup_state.snapshot()
+    if not snapshot["ready"]:
+        return APIResponse.error(message="服务预热中", code="503", data=snapshot, status_code=503)
+    return APIResponse.success(data=snapshot)
+
 @app.get("/config")
 async def get_config():
     """获取配置信息接口"""
     return APIResponse.success(data=config.get_config_info())
 
+@app.get("/metrics")
+async def metrics():
+    """Prometheus 指标接口"""
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
 if __name__ == "__main__":
-    import uvicorn
-    uvicorn.run(app, host=config.HOST, port=config.PORT)
+    import argparse
+    parser = argparse.ArgumentParser(description="AI Framework")
+    parser.add_argument("--profile-startup", action="store_true", help="输出各模块导入与初始化耗时后退出")
+    args = parser.parse_args()
+
+    if args.profile_startup:
+        from api.startup_profile import profile_startup
+        profile_startup()
+    else:
+        import uvicorn
+        uvicorn.run(app, host=config.HOST, port=config.PORT)
@@ -1,12 +1,12 @@
 import os
 import sys
 from typing import Dict, Any, List
-from openai import AsyncOpenAI
 import json
 
 # 添加项目根目录到路径
 sys.path.append(os.path.join(os.path.dirname(__file__), '../..'))
 from config import config
+from mcp_client.tools.llm_gateway import chat_completion, get_openai_client
 
 
 class GraphRAGTool:
@@ -14,10 +14,8 @@ class GraphRAGTool:
         self.deepseek_api_key = config.DEEPSEEK_API_KEY
         self.deepseek_base_url = config.DEEPSEEK_BASE_URL
         self.deepseek_model = config.DEEPSEEK_MODEL
-        self.client = AsyncOpenAI(
-            api_key=self.deepseek_api_key,
-            base_url=self.deepseek_base_url
-        )
+        # 共用网关连接池与限流额度
+        self.client = get_openai_client()
         
     def get_model(self, use_local: bool = False):
         """获取模型名称，使用DeepSeek模型"""
@@ -53,7 +51,8 @@ class GraphRAGTool:
             请分析图结构中的关系，并提供基于图结构的回答。
             """
             
-            response = await self.client.chat.completions.create(
+            answer = await chat_completion(
+                "graphrag",
                 model=model_name,
                 messages=[
                     {"role": "system", "content": "你是一个图结构分析专家，能够基于图数据回答问题。"},
@@ -63,8 +62,6 @@ class GraphRAGTool:
                 max_tokens=600
             )
             
-            answer = response.choices[0].message.content
-            
             return {
                 "success": True,
                 "query": query,
@@ -99,7 +96,8 @@ class GraphRAGTool:
             }}
             """
             
-            response = await self.client.chat.completions.create(
+            kg_text = await chat_completion(
+                "graphrag_kg",
                 model=model_name,
                 messages=[
                     {"role": "system", "content": "你是一个知识图谱构建专家。"},
@@ -109,8 +107,6 @@ class GraphRAGTool:
                 max_tokens=1000
             )
             
-            kg_text = response.choices[0].message.content
-            
             try:
                 kg_data = json.loads(kg_text)
             except:
@@ -1,17 +1,20 @@
+import asyncio
 import os
 import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 # 添加项目根目录到路径获取配置信息
 sys.path.append(os.path.join(os.path.dirname(__file__), '../..'))
 
-from llama_index.core import VectorStoreIndex, SimpleDirectoryReader, StorageContext, Settings
-from llama_index.vector_stores.chroma import ChromaVectorStore
-from llama_index.embeddings.huggingface import HuggingFaceEmbedding
-from llama_index.core.retrievers import VectorIndexRetriever
-from langchain_deepseek import ChatDeepSeek
-from langchain_core.messages import HumanMessage
-import chromadb
-
+# llama_index / chromadb / transformers 等重依赖在 initialize() 中才导入，避免拖慢启动
 from config import config
+from mcp_client.tools.single_flight import SingleFlight, normalize_key
+from mcp_client.tools.deadline import DeadlineExceededError, check_deadline, with_deadline
+from mcp_client.tools.llm_cache import semantic_message
+from mcp_client.tools.llm_gateway import get_chat_model
+from mcp_client.tools.embedding_provider import embed_local_query, get_local_embed_model
+from mcp_client.tools.metrics import RAG_RETRIEVE_SECONDS, observe_llm
 
 class RAGSystem:
     """RAG检索系统 - 使用LlamaIndex"""
@@ -23,14 +26,32 @@ class RAGSystem:
         self.embed_model = None
         self.vector_store = None
         self.llm = None
-        
+        # 并发重复问题合并
+        self._inflight = SingleFlight()
+        # 检索（含查询向量计算）与初始化使用的专用线程池
+        self._executor = ThreadPoolExecutor(max_workers=config.RAG_EXECUTOR_WORKERS, thread_name_prefix="rag")
+        # 初始化互斥：接口、预热与问答链加载可能并发触发初始化，每次初始化都会删除并重建 Chroma 集合
+        self._init_lock = threading.Lock()
+
     def initialize(self):
-        """初始化RAG系统"""
+        """初始化RAG系统（同一时刻只执行一次；已初始化则直接返回）"""
+        if self.retriever:
+            return True
+        with self._init_lock:
+            # 等锁期间其他调用方可能已完成初始化
+            if self.retriever:
+                return True
+            return self._initialize()
+
+    def _initialize(self):
         try:
-            # 1. 设置Embedding模型
-            self.embed_model = HuggingFaceEmbedding(
-                model_name=getattr(config, 'EMBEDDING_MODEL', 'BAAI/bge-small-en-v1.5')
-            )
+            from llama_index.core import VectorStoreIndex, SimpleDirectoryReader, StorageContext, Settings
+            from llama_index.vector_stores.chroma import ChromaVectorStore
+            from llama_index.core.retrievers import VectorIndexRetriever
+            import chromadb
+
+            # 1. 设置Embedding模型（进程内共享，语义缓存复用同一实例）
+            self.embed_model = get_local_embed_model()
             Settings.embed_model = self.embed_model
             
             # 2. 设置LLM（DeepSeek）
@@ -138,58 +159,131 @@ class RAGSystem:
             traceback.print_exc()
             return False
     
-    def retrieve_documents(self, query: str, top_k: int = 3):
+    def embed_query(self, query: str):
+        """计算查询向量（与语义缓存共用 embedding_memo 的键与编码，同一问题只计算一次）"""
+        return embed_local_query(query)
+
+    def _retrieve_nodes(self, query: str, vector=None):
+        """检索节点（包含查询向量计算，CPU密集）；可传入预先计算的查询向量"""
+        from llama_index.core import QueryBundle
+
+        started = time.perf_counter()
+        if vector is None and self.embed_model is not None:
+            vector = self.embed_query(query)
+        nodes = self.retriever.retrieve(QueryBundle(query_str=query, embedding=vector))
+        RAG_RETRIEVE_SECONDS.observe(time.perf_counter() - started)
+        return nodes
+
+    async def _aretrieve_nodes(self, query: str, vector=None):
+        """在专用线程池中检索，避免向量计算阻塞事件循环"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self._retrieve_nodes, query, vector)
+
+    @staticmethod
+    def _format_documents(nodes, top_k: int):
+        return [
+            {
+                "text": node.text,
+                "score": node.score,
+                "metadata": node.metadata
+            }
+            for node in nodes[:top_k]
+        ]
+
+    def retrieve_documents(self, query: str, top_k: int = 3, vector=None):
         """检索相关文档"""
         if not self.retriever:
             return []
         
         try:
-            nodes = self.retriever.retrieve(query)
-            return [
-                {
-                    "text": node.text,
-                    "score": node.score,
-                    "metadata": node.metadata
-                }
-                for node in nodes[:top_k]
-            ]
+            return self._format_documents(self._retrieve_nodes(query, vector), top_k)
         except Exception as e:
             print(f"文档检索失败: {e}")
             return []
-    
+
+    async def aretrieve_documents(self, query: str, top_k: int = 3, vector=None):
+        """检索相关文档（异步）"""
+        if not self.retriever:
+            return []
+
+        try:
+            return self._format_documents(await self._aretrieve_nodes(query, vector), top_k)
+        except Exception as e:
+            print(f"文档检索失败: {e}")
+            return []
+
+    async def ainitialize(self):
+        """在线程池中初始化RAG系统（加载模型、构建索引均为阻塞操作；与同步初始化共用同一把锁）"""
+        if self.retriever:
+            return True
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self.initialize)
+
+    @staticmethod
+    def _build_prompt(question: str, nodes):
+        """根据检索结果构建提示词与来源列表"""
+        def _node_text(n):
+            return (getattr(getattr(n, "node", None), "get_content", lambda: "")() or
+                    getattr(getattr(n, "node", None), "text", "")).strip()
+
+        context = "\n\n".join([t for t in (_node_text(n) for n in nodes) if t])
+
+        sources = [
+            {
+                "content": _node_text(n),
+                "score": getattr(n, "score", 0.0),
+                "metadata": getattr(getattr(n, "node", None), "metadata", {}) or {}
+            } for n in nodes
+        ]
+
+        prompt = f"基于以下上下文回答问题；没有相关信息请直接说明。\n\n上下文：\n{context}\n\n问题：{question}\n\n回答："
+        return prompt, sources
+
+    def _make_llm(self):
+        # 网关按配置复用同一实例，共用连接池与限流额度；
+        # 检索上下文由问题决定，调用时以原始问题标注用户消息，开启分层缓存的 L3 语义匹配
+        return get_chat_model(temperature=0.1)
+
     def query(self, question: str):
-        """使用RAG系统回答问题"""
+        """使用RAG系统回答问题（同步；相同问题的并发合并只在异步接口 aquery 中进行）"""
         if not self.retriever:
             return {"answer": "RAG系统未初始化", "sources": []}
-        
         try:
-            nodes = self.retriever.retrieve(question)
-            def _node_text(n):
-                return (getattr(getattr(n, "node", None), "get_content", lambda: "")() or
-                        getattr(getattr(n, "node", None), "text", "")).strip()
-
-            context = "\n\n".join([t for t in (_node_text(n) for n in nodes) if t])
-
-            sources = [
-                {
-                    "content": _node_text(n),
-                    "score": getattr(n, "score", 0.0),
-                    "metadata": getattr(getattr(n, "node", None), "metadata", {}) or {}
-                } for n in nodes
-            ]
-
-            prompt = f"基于以下上下文回答问题；没有相关信息请直接说明。\n\n上下文：\n{context}\n\n问题：{question}\n\n回答："
-
-            llm = ChatDeepSeek(
-                model=config.DEEPSEEK_MODEL,
-                api_key=config.DEEPSEEK_API_KEY,
-                base_url=config.DEEPSEEK_BASE_URL,
-                temperature=0.1
-            )
-            resp = llm.invoke([HumanMessage(content=prompt)])
+            prompt, sources = self._build_prompt(question, self._retrieve_nodes(question))
+
+            check_deadline()
+            llm = self._make_llm()
+            started = time.perf_counter()
+            resp = llm.invoke([semantic_message(prompt, question)])
+            observe_llm("rag", started, resp)
+            answer = getattr(resp, "content", str(resp))
+
+            return {"answer": answer, "sources": sources}
+        except DeadlineExceededError:
+            # 截止时间到期向上抛出，由接口层返回 504
+            raise
+        except Exception as e:
+            return {"answer": f"查询失败: {str(e)}", "sources": []}
+
+    async def aquery(self, question: str):
+        """使用RAG系统回答问题（异步；相同问题并发请求只执行一次，检索在线程池执行，生成使用 ainvoke）"""
+        if not self.retriever:
+            return {"answer": "RAG系统未初始化", "sources": []}
+        return await self._inflight.do(normalize_key(question), lambda: self._aquery(question))
+
+    async def _aquery(self, question: str):
+        try:
+            prompt, sources = self._build_prompt(question, await self._aretrieve_nodes(question))
+
+            llm = self._make_llm()
+            started = time.perf_counter()
+            resp = await with_deadline(llm.ainvoke([semantic_message(prompt, question)]))
+            observe_llm("rag", started, resp)
             answer = getattr(resp, "content", str(resp))
 
             return {"answer": answer, "sources": sources}
+        except DeadlineExceededError:
+            raise
         except Exception as e:
             return {"answer": f"查询失败: {str(e)}", "sources": []}
 
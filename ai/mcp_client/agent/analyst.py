@@ -1,12 +1,15 @@
 # agents/analyst.py
 from langchain_core.prompts import ChatPromptTemplate
-from langchain_openai import ChatOpenAI
 import sys
 import os
+import time
 
 # 添加项目根目录到路径获取配置信息
 sys.path.append(os.path.join(os.path.dirname(__file__), '../..'))
 from config import config
+from mcp_client.tools.deadline import with_deadline
+from mcp_client.tools.llm_gateway import get_chat_model
+from mcp_client.tools.metrics import observe_llm
 
 _PROMPT_TEMPLATE = """
 {prompt}
@@ -26,13 +29,10 @@ async def analyst_node(state):
         ))
     ])
 
-    model = ChatOpenAI(
-        model=config.DEEPSEEK_MODEL,
-        api_key=config.DEEPSEEK_API_KEY,
-        base_url=config.DEEPSEEK_BASE_URL,
-        temperature=0.3
-    )
+    model = get_chat_model(temperature=0.3)
     chain = prompt | model
-    result = await chain.ainvoke({})
+    started = time.perf_counter()
+    result = await with_deadline(chain.ainvoke({}))
+    observe_llm("analyst", started, result)
     
     return {"analysis": result.content}
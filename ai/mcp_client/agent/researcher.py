@@ -1,11 +1,12 @@
 # agents/researcher.py
 from ..tools.search_tool import get_search_tool
+from ..tools.deadline import with_deadline
 
 async def researcher_node(state):
     tool = get_search_tool()
-    result = await tool.ainvoke({
+    result = await with_deadline(tool.ainvoke({
         "query": f"中国 {state['query']} 最新动态 发展趋势 数据"
-    })
+    }))
 
     content = "\n\n".join([r["content"] for r in result])
     urls = list(set([r["url"] for r in result]))
@@ -1,12 +1,15 @@
 # agents/reviewer.py
 from langchain_core.prompts import ChatPromptTemplate
-from langchain_openai import ChatOpenAI
 import sys
 import os
+import time
 
 # 添加项目根目录到路径获取配置信息
 sys.path.append(os.path.join(os.path.dirname(__file__), '../..'))
 from config import config
+from mcp_client.tools.deadline import with_deadline
+from mcp_client.tools.llm_gateway import get_chat_model
+from mcp_client.tools.metrics import observe_llm
 
 async def reviewer_node(state):
     prompt_path = os.path.join(os.path.dirname(__file__), "..", "prompts", "reviewer_prompt.txt")
@@ -16,14 +19,11 @@ async def reviewer_node(state):
         ("human", "请审核以下报告：\n\n{draft_report}")
     ])
 
-    model = ChatOpenAI(
-        model=config.DEEPSEEK_MODEL,
-        api_key=config.DEEPSEEK_API_KEY,
-        base_url=config.DEEPSEEK_BASE_URL,
-        temperature=0.1
-    )
+    model = get_chat_model(temperature=0.1)
     chain = prompt | model
-    result = await chain.ainvoke({"draft_report": state["draft_report"]})
+    started = time.perf_counter()
+    result = await with_deadline(chain.ainvoke({"draft_report": state["draft_report"]}))
+    observe_llm("reviewer", started, result)
     feedback = result.content.strip()
 
     return {
@@ -1,12 +1,15 @@
 # agents/writer.py
 from langchain_core.prompts import ChatPromptTemplate
-from langchain_openai import ChatOpenAI
 import sys
 import os
+import time
 
 # 添加项目根目录到路径获取配置信息
 sys.path.append(os.path.join(os.path.dirname(__file__), '../..'))
 from config import config
+from mcp_client.tools.deadline import with_deadline
+from mcp_client.tools.llm_gateway import get_chat_model
+from mcp_client.tools.metrics import observe_llm
 
 async def writer_node(state):
     prompt_path = os.path.join(os.path.dirname(__file__), "..", "prompts", "writer_prompt.txt")
@@ -16,13 +19,11 @@ async def writer_node(state):
         ("human", "请基于以下分析撰写报告：\n\n{analysis}")
     ])
 
-    model = ChatOpenAI(
-        model=config.DEEPSEEK_MODEL,
-        api_key=config.DEEPSEEK_API_KEY,
-        base_url=config.DEEPSEEK_BASE_URL,
-        temperature=0.5
-    )
+    # 撰写的 prompt 只取决于分析结果，缓存会让审核循环每轮拿到同一份草稿
+    model = get_chat_model(temperature=0.5, cache=False)
     chain = prompt | model
-    result = await chain.ainvoke({"analysis": state["analysis"]})
+    started = time.perf_counter()
+    result = await with_deadline(chain.ainvoke({"analysis": state["analysis"]}))
+    observe_llm("writer", started, result)
     
     return {"draft_report": result.content}
@@ -0,0 +1,74 @@
+"""
+请求截止时间（deadline）传播
+
+- 由 HTTP 中间件在请求入口设置，基于 contextvars 自动传递到同一请求内的协程与线程池调用
+- LLM/工具调用通过 with_deadline() 包装，剩余时间不足时立即失败，而不是继续占用资源
+
+使用方式：
+token = set_deadline(30)
+try:
+    result = await with_deadline(llm.ainvoke(messages))
+finally:
+    reset_deadline(token)
+"""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from contextvars import ContextVar, Token
+from typing import Awaitable, Optional, TypeVar
+
+T = TypeVar("T")
+
+# 绝对截止时间（time.monotonic()），None 表示不限制
+_deadline: ContextVar[Optional[float]] = ContextVar("request_deadline", default=None)
+
+
+class DeadlineExceededError(TimeoutError):
+    """请求已超过截止时间"""
+
+
+def set_deadline(timeout: Optional[float]) -> Token:
+    """设置当前上下文的超时时间（秒）；已有更早的截止时间时保留更早者"""
+    deadline = time.monotonic() + timeout if timeout is not None else None
+    current = _deadline.get()
+    if current is not None and (deadline is None or current < deadline):
+        deadline = current
+    return _deadline.set(deadline)
+
+
+def reset_deadline(token: Token) -> None:
+    _deadline.reset(token)
+
+
+def remaining() -> Optional[float]:
+    """剩余可用时间（秒），未设置截止时间返回 None"""
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+
+def check_deadline() -> None:
+    """同步代码中检查截止时间，已超时则抛出 DeadlineExceededError"""
+    left = remaining()
+    if left is not None and left <= 0:
+        raise DeadlineExceededError("请求已超过截止时间")
+
+
+async def with_deadline(awaitable: Awaitable[T]) -> T:
+    """在剩余时间内等待 awaitable，超时抛出 DeadlineExceededError"""
+    left = remaining()
+    if left is None:
+        return await awaitable
+    if left <= 0:
+        # 关闭未执行的协程，避免 "never awaited" 警告
+        close = getattr(awaitable, "close", None)
+        if close:
+            close()
+        raise DeadlineExceededError("请求已超过截止时间")
+    try:
+        return await asyncio.wait_for(awaitable, timeout=left)
+    except asyncio.TimeoutError as e:
+        raise DeadlineExceededError("请求已超过截止时间") from e
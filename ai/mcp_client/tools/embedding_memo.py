@@ -0,0 +1,125 @@
+"""
+查询向量记忆化（LRU）
+
+- 以 (模型标识, 文本哈希) 为键缓存向量，同一请求内语义缓存查询、写入、意图路由、RAG 检索只计算一次
+- 全进程共享一个有界 LRU（EMBEDDING_MEMO_SIZE 条），命中情况计入 cache_requests_total{tier="embedding"}
+- MemoizedEmbeddings 包装 LangChain Embeddings；本地模型的 RAG 检索经 embedding_provider.embed_local_query
+  走同一包装（同一模型标识、同一查询编码），与语义缓存共用条目
+
+使用方式：
+from mcp_client.tools.embedding_memo import embedding_memo
+vector = embedding_memo.get_or_compute("bge-small", query, lambda: model.get_query_embedding(query))
+"""
+
+from __future__ import annotations
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, List, Optional, Tuple
+
+from config import config
+from mcp_client.tools.metrics import observe_cache
+
+try:
+    from langchain_core.embeddings import Embeddings
+except Exception:
+    Embeddings = object  # type: ignore
+
+_Key = Tuple[str, bytes]
+
+
+def _text_key(model_id: str, text: str) -> _Key:
+    return model_id, hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+
+
+class EmbeddingMemo:
+    """线程安全的向量 LRU"""
+
+    def __init__(self, max_size: int = 4096) -> None:
+        self.max_size = max_size
+        self._items: "OrderedDict[_Key, List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, model_id: str, text: str) -> Optional[List[float]]:
+        key = _text_key(model_id, text)
+        with self._lock:
+            vector = self._items.get(key)
+            if vector is not None:
+                self._items.move_to_end(key)
+        return vector
+
+    def put(self, model_id: str, text: str, vector: List[float]) -> None:
+        if self.max_size <= 0:
+            return
+        key = _text_key(model_id, text)
+        with self._lock:
+            self._items[key] = vector
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+    def get_or_compute(self, model_id: str, text: str, compute: Callable[[], List[float]]) -> List[float]:
+        started = time.perf_counter()
+        vector = self.get(model_id, text)
+        observe_cache("embedding", started, vector is not None)
+        if vector is None:
+            vector = list(compute())
+            self.put(model_id, text, vector)
+        return vector
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+
+# 全局共享实例
+embedding_memo = EmbeddingMemo(config.EMBEDDING_MEMO_SIZE)
+
+
+def model_id_of(model: Any) -> str:
+    """用类名 + 模型名区分不同嵌入模型的向量空间
+
+    标识会持久化（语义缓存据此判断向量是否可复用），只取字符串属性：
+    模型对象的 repr 含内存地址，每次启动都不同
+    """
+    for attr in ("model_id", "model_name", "model"):
+        name = getattr(model, attr, None)
+        if isinstance(name, str) and name:
+            return f"{type(model).__name__}:{name}"
+    return type(model).__name__
+
+
+class MemoizedEmbeddings(Embeddings):  # type: ignore[misc]
+    """带记忆化的 LangChain Embeddings 包装器；查询与文档向量分别缓存（部分模型对两者使用不同指令）"""
+
+    def __init__(self, embeddings: Any, memo: Optional[EmbeddingMemo] = None) -> None:
+        self.embeddings = embeddings
+        self.memo = memo if memo is not None else embedding_memo  # 空的 EmbeddingMemo 为假值
+        self.model_id = model_id_of(embeddings)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.memo.get_or_compute(f"{self.model_id}:query", text, lambda: self.embeddings.embed_query(text))
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._embed_batch(f"{self.model_id}:doc", texts)
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """批量计算查询向量（与 embed_query 共用记忆化条目）；
+        未命中的文本经 embed_documents 一次批量计算，仅适用于查询与文档编码相同的模型（local、openai 均是）"""
+        return self._embed_batch(f"{self.model_id}:query", texts)
+
+    def _embed_batch(self, model_id: str, texts: List[str]) -> List[List[float]]:
+        vectors: List[Optional[List[float]]] = [self.memo.get(model_id, t) for t in texts]
+        missing = [i for i, v in enumerate(vectors) if v is None]
+        if missing:
+            # 未命中的文本合并为一次批量请求
+            computed = self.embeddings.embed_documents([texts[i] for i in missing])
+            for i, vector in zip(missing, computed):
+                vectors[i] = list(vector)
+                self.memo.put(model_id, texts[i], vectors[i])
+        return vectors  # type: ignore[return-value]
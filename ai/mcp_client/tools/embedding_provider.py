@@ -0,0 +1,155 @@
+"""
+嵌入模型提供方
+
+- local：本地 HuggingFace 模型（EMBEDDING_MODEL，默认 BAAI/bge-small），进程内只加载一次，RAG 与语义缓存共用
+- openai：OpenAI 兼容的嵌入接口（每次查询一次网络请求）
+- 本地模型的调用经过微批合并：并发的嵌入请求在 EMBEDDING_BATCH_WAIT_MS 内合并为一批（最多 EMBEDDING_BATCH_SIZE 条），
+  在有界线程池（EMBEDDING_WORKERS）中执行，避免多个请求同时跑模型互相争抢 CPU
+
+使用方式：
+from mcp_client.tools.embedding_provider import create_embeddings, embed_local_query, get_local_embed_model
+embeddings = create_embeddings("local")       # LangChain Embeddings，供语义缓存/意图路由使用
+embed_model = get_local_embed_model()         # LlamaIndex 模型实例，供 RAG 使用（同一份权重）
+vector = embed_local_query("北京天气怎么样？")   # 记忆化的查询向量，RAG 与语义缓存共用
+"""
+
+from __future__ import annotations
+
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, List, Optional, Tuple
+
+from config import config
+
+try:
+    from langchain_core.embeddings import Embeddings
+except Exception:
+    Embeddings = object  # type: ignore
+
+EMBEDDING_PROVIDERS = ("local", "openai")
+
+_local_model: Any = None
+_local_embeddings: Optional["LocalEmbeddings"] = None
+_local_lock = threading.Lock()
+
+
+def get_local_embed_model() -> Any:
+    """加载（仅一次）本地 HuggingFace 嵌入模型"""
+    global _local_model
+    if _local_model is None:
+        with _local_lock:
+            if _local_model is None:
+                from llama_index.embeddings.huggingface import HuggingFaceEmbedding
+
+                _local_model = HuggingFaceEmbedding(model_name=config.EMBEDDING_MODEL)
+    return _local_model
+
+
+class MicroBatcher:
+    """把并发的单条请求合并为批量调用，批量调用在有界线程池中执行"""
+
+    def __init__(
+        self,
+        fn: Callable[[List[str]], List[List[float]]],
+        max_batch: int = 32,
+        max_wait: float = 0.002,
+        workers: int = 1,
+        name: str = "embedding",
+    ) -> None:
+        self.fn = fn
+        self.max_batch = max_batch
+        self.max_wait = max_wait  # 收到第一条后最多等待多久凑批（秒）
+        self._queue: "queue.Queue[Tuple[str, Future]]" = queue.Queue()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=name)
+        self._dispatcher = threading.Thread(target=self._dispatch_loop, name=f"{name}-batcher", daemon=True)
+        self._dispatcher.start()
+
+    def submit(self, text: str) -> "Future[List[float]]":
+        future: "Future[List[float]]" = Future()
+        self._queue.put((text, future))
+        return future
+
+    def _dispatch_loop(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=timeout))
+                except queue.Empty:
+                    break
+            self._executor.submit(self._run, batch)
+
+    def _run(self, batch: List[Tuple[str, Future]]) -> None:
+        try:
+            vectors = self.fn([text for text, _ in batch])
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        for (_, future), vector in zip(batch, vectors):
+            future.set_result(list(vector))
+
+
+class LocalEmbeddings(Embeddings):  # type: ignore[misc]
+    """本地模型的 LangChain Embeddings 适配
+
+    查询与文档统一使用模型的查询编码（get_query_embedding，bge 等模型会加检索指令）：
+    缓存比较的是问题与问题，属于对称匹配；与 RAG 检索的查询向量编码一致，两者共用记忆化条目
+    """
+
+    def __init__(self, model: Any, max_batch: int = 32, max_wait: float = 0.002, workers: int = 1) -> None:
+        self.model = model
+        self.model_name = getattr(model, "model_name", "")
+        self._batcher = MicroBatcher(self._encode, max_batch, max_wait, workers)
+
+    def _encode(self, texts: List[str]) -> List[List[float]]:
+        return [self.model.get_query_embedding(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._batcher.submit(text).result()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        futures = [self._batcher.submit(text) for text in texts]
+        return [future.result() for future in futures]
+
+
+def get_local_embeddings() -> LocalEmbeddings:
+    """进程内共享的本地嵌入适配器（与 RAG 共用模型与批处理线程池）"""
+    global _local_embeddings
+    if _local_embeddings is None:
+        model = get_local_embed_model()
+        with _local_lock:
+            if _local_embeddings is None:
+                _local_embeddings = LocalEmbeddings(
+                    model,
+                    max_batch=config.EMBEDDING_BATCH_SIZE,
+                    max_wait=config.EMBEDDING_BATCH_WAIT_MS / 1000,
+                    workers=config.EMBEDDING_WORKERS,
+                )
+    return _local_embeddings
+
+
+def embed_local_query(text: str) -> List[float]:
+    """本地模型的查询向量（经 embedding_memo 记忆化）；RAG 检索与语义缓存使用同一键与同一编码，同一问题只计算一次"""
+    from mcp_client.tools.embedding_memo import MemoizedEmbeddings
+
+    return MemoizedEmbeddings(get_local_embeddings()).embed_query(text)
+
+
+def create_embeddings(provider: str) -> Any:
+    """按提供方名称创建 LangChain Embeddings；依赖缺失或未配置密钥时抛出异常"""
+    if provider == "local":
+        return get_local_embeddings()
+    if provider == "openai":
+        from langchain_openai import OpenAIEmbeddings
+
+        if not config.DEEPSEEK_API_KEY:
+            raise RuntimeError("未配置 DEEPSEEK_API_KEY")
+        return OpenAIEmbeddings(api_key=config.DEEPSEEK_API_KEY)
+    raise ValueError(f"不支持的嵌入提供方: {provider}，可选 {', '.join(EMBEDDING_PROVIDERS)}")
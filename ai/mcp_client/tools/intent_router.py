@@ -0,0 +1,229 @@
+"""
+意图路由
+
+- 意图关键词、实体词典（如城市）由 JSON 配置提供，编译为一个 Aho-Corasick 自动机
+- 对用户消息只扫描一遍，同时得到命中的意图与槽位（如城市），复杂度与词典大小无关
+- 可选第二阶段：关键词未命中时，用嵌入向量与各意图示例句的质心比较，相似度达到阈值即路由
+- 两个阶段都未命中才交给大模型回答
+
+使用方式：
+router = IntentRouter.from_file("intents.json")
+match = router.route("上海明天天气怎么样")
+# IntentMatch(intent="weather", tool="get_weather", slots={"city": "上海"}, stage="keyword", score=1.0)
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import math
+import threading
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from mcp_client.tools.metrics import registry
+
+INTENT_ROUTES = registry.counter(
+    "intent_route_total", "意图路由结果", ("intent", "stage")
+)
+
+# 自动机输出：("intent", 意图名) 或 ("entity", 实体类型)
+_Payload = Tuple[str, str]
+
+
+class AhoCorasick:
+    """多模式串匹配自动机"""
+
+    def __init__(self) -> None:
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[Tuple[int, _Payload]]] = [[]]
+        self._built = False
+
+    def add(self, word: str, payload: _Payload) -> None:
+        if not word:
+            return
+        node = 0
+        for ch in word:
+            nxt = self._goto[node].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[node][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            node = nxt
+        self._out[node].append((len(word), payload))
+        self._built = False
+
+    def build(self) -> None:
+        """按 BFS 计算失配指针，并把后缀节点的输出合并到当前节点"""
+        queue = deque(self._goto[0].values())
+        for node in queue:
+            self._fail[node] = 0
+        while queue:
+            node = queue.popleft()
+            for ch, child in self._goto[node].items():
+                fail = self._fail[node]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[child] = self._goto[fail].get(ch, 0)
+                self._out[child] = self._out[child] + self._out[self._fail[child]]
+                queue.append(child)
+        self._built = True
+
+    def iter_matches(self, text: str) -> Iterator[Tuple[int, int, _Payload]]:
+        """返回所有命中 (起始下标, 结束下标, 输出)"""
+        if not self._built:
+            self.build()
+        node = 0
+        for i, ch in enumerate(text):
+            while node and ch not in self._goto[node]:
+                node = self._fail[node]
+            node = self._goto[node].get(ch, 0)
+            for length, payload in self._out[node]:
+                yield i + 1 - length, i + 1, payload
+
+
+@dataclass
+class IntentMatch:
+    intent: str
+    tool: str
+    slots: Dict[str, str] = field(default_factory=dict)
+    stage: str = "keyword"  # keyword | centroid
+    score: float = 1.0
+
+
+def _cosine(a: List[float], b: List[float]) -> float:
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
+
+
+class IntentRouter:
+    """数据驱动的意图路由器"""
+
+    def __init__(
+        self,
+        spec: Dict[str, Any],
+        embeddings: Any = None,
+        centroid_threshold: float = 0.0,
+    ) -> None:
+        # 配置中的意图顺序即优先级，多个意图同时命中时取靠前者
+        self.intents: Dict[str, Dict[str, Any]] = spec.get("intents", {})
+        self._priority = {name: i for i, name in enumerate(self.intents)}
+        self._matcher = AhoCorasick()
+        for name, intent in self.intents.items():
+            for keyword in intent.get("keywords", []):
+                self._matcher.add(keyword, ("intent", name))
+        for entity, values in spec.get("entities", {}).items():
+            for value in values:
+                self._matcher.add(value, ("entity", entity))
+        self._matcher.build()
+
+        self.embeddings = embeddings
+        self.centroid_threshold = centroid_threshold
+        self._centroids: Optional[Dict[str, List[float]]] = None
+        self._centroid_lock = threading.Lock()
+
+    @classmethod
+    def from_file(cls, path: str, **kwargs: Any) -> "IntentRouter":
+        with open(path, encoding="utf-8") as f:
+            return cls(json.load(f), **kwargs)
+
+    def _scan(self, message: str) -> Tuple[Optional[str], Dict[str, str]]:
+        """单次扫描：返回优先级最高的意图与各实体类型最靠左的命中值"""
+        intent: Optional[str] = None
+        entities: Dict[str, Tuple[int, int, str]] = {}
+        for start, end, (kind, name) in self._matcher.iter_matches(message):
+            if kind == "intent":
+                if intent is None or self._priority[name] < self._priority[intent]:
+                    intent = name
+                continue
+            # 同一位置优先取更长的实体（如“乌鲁木齐”）
+            best = entities.get(name)
+            if best is None or start < best[0] or (start == best[0] and end > best[1]):
+                entities[name] = (start, end, message[start:end])
+        return intent, {name: value for name, (_, _, value) in entities.items()}
+
+    def _fill_slots(self, intent: str, message: str, entities: Dict[str, str]) -> Dict[str, str]:
+        slots: Dict[str, str] = {}
+        for slot, rule in self.intents[intent].get("slots", {}).items():
+            if rule.get("source") == "message":
+                slots[slot] = message
+            elif rule.get("entity") in entities:
+                slots[slot] = entities[rule["entity"]]
+            elif "default" in rule:
+                slots[slot] = rule["default"]
+        return slots
+
+    def _load_centroids(self) -> Dict[str, List[float]]:
+        """首次使用时对各意图示例句求向量质心"""
+        with self._centroid_lock:
+            if self._centroids is None:
+                centroids: Dict[str, List[float]] = {}
+                for name, intent in self.intents.items():
+                    examples = intent.get("examples") or []
+                    if not examples:
+                        continue
+                    vectors = self.embeddings.embed_documents(examples)
+                    centroids[name] = [sum(col) / len(vectors) for col in zip(*vectors)]
+                self._centroids = centroids
+            return self._centroids
+
+    @property
+    def centroid_enabled(self) -> bool:
+        return bool(self.embeddings) and self.centroid_threshold > 0
+
+    def _classify(self, message: str) -> Optional[Tuple[str, float]]:
+        if not self.centroid_enabled:
+            return None
+        try:
+            centroids = self._load_centroids()
+            if not centroids:
+                return None
+            vector = self.embeddings.embed_query(message)
+        except Exception:
+            # 嵌入服务不可用时仅关闭第二阶段，不影响关键词路由
+            self.embeddings = None
+            return None
+        name, score = max(((n, _cosine(vector, c)) for n, c in centroids.items()), key=lambda kv: kv[1])
+        return (name, score) if score >= self.centroid_threshold else None
+
+    def _match(
+        self,
+        message: str,
+        intent: Optional[str],
+        entities: Dict[str, str],
+        classified: Optional[Tuple[str, float]],
+    ) -> Optional[IntentMatch]:
+        stage, score = "keyword", 1.0
+        if intent is None:
+            if classified is None:
+                INTENT_ROUTES.inc(intent="none", stage="miss")
+                return None
+            intent, score = classified
+            stage = "centroid"
+        INTENT_ROUTES.inc(intent=intent, stage=stage)
+        return IntentMatch(
+            intent=intent,
+            tool=self.intents[intent]["tool"],
+            slots=self._fill_slots(intent, message, entities),
+            stage=stage,
+            score=score,
+        )
+
+    def route(self, message: str) -> Optional[IntentMatch]:
+        """返回命中的意图；未命中返回 None（交给大模型）"""
+        intent, entities = self._scan(message)
+        classified = self._classify(message) if intent is None else None
+        return self._match(message, intent, entities, classified)
+
+    async def aroute(self, message: str) -> Optional[IntentMatch]:
+        """异步版本：关键词阶段直接执行，嵌入阶段放到线程中，避免阻塞事件循环"""
+        intent, entities = self._scan(message)
+        classified = None
+        if intent is None and self.centroid_enabled:
+            classified = await asyncio.to_thread(self._classify, message)
+        return self._match(message, intent, entities, classified)
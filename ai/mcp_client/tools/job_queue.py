@@ -0,0 +1,368 @@
+"""
+异步任务队列 - 用于长耗时的市场分析流程
+
+- 提交任务立即返回 job_id，由固定数量的 worker 协程执行分析图，限制同时运行的图数量
+- 任务状态与结果持久化到 SQLite，进程内保留进度事件以支持流式订阅
+- SQLite 读写在存储专用的单线程中执行（保持写入顺序），不阻塞事件循环；进度写入按任务合并，只落盘最新一条
+- 等待队列有上限，队列已满时直接拒绝（由调用方转换为 429）
+- 多个 worker 进程共用一个数据库：每个任务记录所属进程（owner）与心跳时间，运行中的进程定期为自己的未完成任务
+  续心跳；启动时与心跳时只把心跳超时（所属进程已退出）的未完成任务标记为失败，不影响其他存活进程的任务
+
+使用方式：
+queue = AnalysisJobQueue(runner, SqliteJobStore(path), workers=2, max_pending=100)
+job_id = await queue.submit("新能源汽车")
+job = await queue.get(job_id)
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, AsyncGenerator, Awaitable, Callable, Deque, Dict, List, Optional, Set
+
+# 任务状态
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+_TERMINAL_STATES = {JOB_SUCCEEDED, JOB_FAILED}
+
+# runner(query, emit) -> 结果字典；emit 用于上报进度事件
+JobRunner = Callable[[str, Callable[[Dict[str, Any]], None]], Awaitable[Dict[str, Any]]]
+
+
+class JobQueueFullError(Exception):
+    """等待队列已满"""
+
+
+class SqliteJobStore:
+    """任务状态持久化（SQLite）"""
+
+    def __init__(self, db_path: str, heartbeat_timeout: float = 60.0) -> None:
+        self.db_path = db_path
+        self.heartbeat_timeout = heartbeat_timeout  # 未完成任务超过该秒数无心跳，视为所属进程已退出
+        # 进程标识：主机名 + pid + 随机后缀（pid 可能被重启后的进程复用）
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._init_db()
+
+    def _init_db(self) -> None:
+        with self._connect() as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS analysis_jobs (
+                  id TEXT PRIMARY KEY,
+                  query TEXT NOT NULL,
+                  status TEXT NOT NULL,
+                  progress TEXT,
+                  result TEXT,
+                  error TEXT,
+                  created_at TEXT NOT NULL,
+                  updated_at TEXT NOT NULL,
+                  owner TEXT,
+                  heartbeat_at REAL
+                )
+                """
+            )
+            self._migrate(conn)
+            conn.commit()
+        self.fail_stale()
+
+    @staticmethod
+    def _migrate(conn: sqlite3.Connection) -> None:
+        """为旧表补充所属进程与心跳列（旧任务无心跳，按已超时处理）"""
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(analysis_jobs)")}
+        if "owner" not in columns:
+            conn.execute("ALTER TABLE analysis_jobs ADD COLUMN owner TEXT")
+        if "heartbeat_at" not in columns:
+            conn.execute("ALTER TABLE analysis_jobs ADD COLUMN heartbeat_at REAL")
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.db_path, timeout=10, check_same_thread=False)
+
+    def create(self, job_id: str, query: str) -> None:
+        now = datetime.utcnow().isoformat()
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT INTO analysis_jobs(id, query, status, created_at, updated_at, owner, heartbeat_at) "
+                "VALUES(?, ?, ?, ?, ?, ?, ?)",
+                (job_id, query, JOB_QUEUED, now, now, self.owner, time.time()),
+            )
+            conn.commit()
+
+    def heartbeat(self) -> None:
+        """为本进程的未完成任务续心跳"""
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "UPDATE analysis_jobs SET heartbeat_at = ? WHERE owner = ? AND status IN (?, ?)",
+                (time.time(), self.owner, JOB_QUEUED, JOB_RUNNING),
+            )
+            conn.commit()
+
+    def fail_stale(self) -> int:
+        """把心跳超时的未完成任务（所属进程已退出）标记为失败，返回标记的任务数"""
+        with self._lock, self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE analysis_jobs SET status = ?, error = ?, updated_at = ? "
+                "WHERE status IN (?, ?) AND owner IS NOT ? AND (heartbeat_at IS NULL OR heartbeat_at < ?)",
+                (
+                    JOB_FAILED,
+                    "任务所在进程已退出，任务中断",
+                    datetime.utcnow().isoformat(),
+                    JOB_QUEUED,
+                    JOB_RUNNING,
+                    self.owner,
+                    time.time() - self.heartbeat_timeout,
+                ),
+            )
+            conn.commit()
+            return cursor.rowcount
+
+    def update(
+        self,
+        job_id: str,
+        status: Optional[str] = None,
+        progress: Optional[Dict[str, Any]] = None,
+        result: Optional[Dict[str, Any]] = None,
+        error: Optional[str] = None,
+    ) -> None:
+        # 本进程写入任务状态同时续心跳
+        fields: Dict[str, Any] = {"updated_at": datetime.utcnow().isoformat(), "heartbeat_at": time.time()}
+        if status is not None:
+            fields["status"] = status
+        if progress is not None:
+            fields["progress"] = json.dumps(progress, ensure_ascii=False)
+        if result is not None:
+            fields["result"] = json.dumps(result, ensure_ascii=False)
+        if error is not None:
+            fields["error"] = error
+        assignments = ", ".join(f"{k} = ?" for k in fields)
+        with self._lock, self._connect() as conn:
+            conn.execute(f"UPDATE analysis_jobs SET {assignments} WHERE id = ?", (*fields.values(), job_id))
+            conn.commit()
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock, self._connect() as conn:
+            cur = conn.execute(
+                "SELECT id, query, status, progress, result, error, created_at, updated_at "
+                "FROM analysis_jobs WHERE id = ?",
+                (job_id,),
+            )
+            row = cur.fetchone()
+        if not row:
+            return None
+        return {
+            "job_id": row[0],
+            "query": row[1],
+            "status": row[2],
+            "progress": json.loads(row[3]) if row[3] else None,
+            "result": json.loads(row[4]) if row[4] else None,
+            "error": row[5],
+            "created_at": row[6],
+            "updated_at": row[7],
+        }
+
+    # ---- 异步接口 ----
+    def run_in_executor(self, fn, *args):
+        """在存储专用的单线程中执行阻塞调用（按提交顺序执行）"""
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(1, thread_name_prefix="job-store")
+        return asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    async def acreate(self, job_id: str, query: str) -> None:
+        await self.run_in_executor(self.create, job_id, query)
+
+    async def aupdate(self, job_id: str, **fields: Any) -> None:
+        await self.run_in_executor(lambda: self.update(job_id, **fields))
+
+    async def aget(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return await self.run_in_executor(self.get, job_id)
+
+    async def aheartbeat(self) -> None:
+        await self.run_in_executor(self.heartbeat)
+
+    async def afail_stale(self) -> int:
+        return await self.run_in_executor(self.fail_stale)
+
+
+class AnalysisJobQueue:
+    """有界 worker 池执行分析任务"""
+
+    def __init__(
+        self,
+        runner: JobRunner,
+        store: SqliteJobStore,
+        workers: int = 2,
+        max_pending: int = 100,
+        heartbeat_interval: float = 10.0,
+    ) -> None:
+        self.runner = runner
+        self.store = store
+        self.workers = max(1, workers)
+        self.heartbeat_interval = heartbeat_interval
+        self._queue: Optional[asyncio.Queue] = None
+        self._max_pending = max_pending
+        self._tasks: List[asyncio.Task] = []
+        self._heartbeat_task: Optional[asyncio.Task] = None
+        # 进程内进度事件，供流式订阅；任务结束后保留终态事件
+        self._events: Dict[str, List[Dict[str, Any]]] = {}
+        self._conditions: Dict[str, asyncio.Condition] = {}
+        self._finished: Deque[str] = deque()
+        self._retain_finished = 200
+        # 尚未落盘的最新进度：job_id -> 事件
+        self._progress: Dict[str, Dict[str, Any]] = {}
+        self._progress_writers: Set[str] = set()
+
+    def _ensure_started(self) -> None:
+        """在首次提交时于当前事件循环内启动 worker"""
+        if self._queue is None:
+            self._queue = asyncio.Queue(maxsize=self._max_pending)
+        self._tasks = [t for t in self._tasks if not t.done()]
+        for i in range(len(self._tasks), self.workers):
+            # 在空上下文中创建 worker，避免继承提交请求的截止时间等上下文变量
+            task = contextvars.Context().run(asyncio.create_task, self._worker(), name=f"analysis-job-worker-{i}")
+            self._tasks.append(task)
+        if self._heartbeat_task is None or self._heartbeat_task.done():
+            self._heartbeat_task = contextvars.Context().run(
+                asyncio.create_task, self._heartbeat(), name="analysis-job-heartbeat"
+            )
+
+    async def submit(self, query: str) -> str:
+        """提交任务并返回 job_id，队列已满时抛出 JobQueueFullError"""
+        self._ensure_started()
+        assert self._queue is not None
+        if self._queue.full():
+            raise JobQueueFullError("分析任务队列已满，请稍后重试")
+        job_id = uuid.uuid4().hex
+        await self.store.acreate(job_id, query)
+        if self._queue.full():
+            # 写入期间队列被其他请求占满
+            await self.store.aupdate(job_id, status=JOB_FAILED, error="分析任务队列已满")
+            raise JobQueueFullError("分析任务队列已满，请稍后重试")
+        self._events[job_id] = []
+        self._conditions[job_id] = asyncio.Condition()
+        self._queue.put_nowait((job_id, query))
+        return job_id
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return await self.store.aget(job_id)
+
+    @property
+    def pending(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def _notify(self, job_id: str) -> None:
+        condition = self._conditions.get(job_id)
+        if condition is None:
+            return
+        async with condition:
+            condition.notify_all()
+
+    async def _publish(self, job_id: str, event: Dict[str, Any]) -> None:
+        events = self._events.get(job_id)
+        if events is None:
+            return
+        events.append(event)
+        await self._notify(job_id)
+        if event.get("status") in _TERMINAL_STATES:
+            self._finished.append(job_id)
+            # 仅保留最近结束任务的事件流，更早的只能通过持久化状态查询
+            while len(self._finished) > self._retain_finished:
+                stale = self._finished.popleft()
+                self._events.pop(stale, None)
+                self._conditions.pop(stale, None)
+
+    async def _heartbeat(self) -> None:
+        """定期为本进程的任务续心跳，并回收其他已退出进程遗留的任务"""
+        while True:
+            await asyncio.sleep(self.heartbeat_interval)
+            try:
+                await self.store.aheartbeat()
+                await self.store.afail_stale()
+            except sqlite3.Error as e:
+                print(f"任务心跳写入失败: {e}")
+
+    async def _worker(self) -> None:
+        assert self._queue is not None
+        while True:
+            job_id, query = await self._queue.get()
+            try:
+                await self._run_job(job_id, query)
+            finally:
+                self._queue.task_done()
+
+    def _save_progress(self, job_id: str, event: Dict[str, Any]) -> None:
+        """记录最新进度；上一次写入完成前到达的进度合并，只写入最新一条"""
+        self._progress[job_id] = event
+        if job_id not in self._progress_writers:
+            self._progress_writers.add(job_id)
+            asyncio.get_running_loop().create_task(self._write_progress(job_id))
+
+    async def _write_progress(self, job_id: str) -> None:
+        try:
+            await self._flush_progress(job_id)
+        finally:
+            self._progress_writers.discard(job_id)
+
+    async def _flush_progress(self, job_id: str) -> None:
+        while job_id in self._progress:
+            event = self._progress.pop(job_id)
+            try:
+                await self.store.aupdate(job_id, progress=event)
+            except sqlite3.Error as e:
+                print(f"任务进度写入失败: {e}")
+
+    async def _run_job(self, job_id: str, query: str) -> None:
+        await self.store.aupdate(job_id, status=JOB_RUNNING)
+        await self._publish(job_id, {"type": "status", "status": JOB_RUNNING})
+
+        def emit(event: Dict[str, Any]) -> None:
+            # 进度仅持久化最新一条，完整事件流保存在内存中
+            self._save_progress(job_id, event)
+            events = self._events.get(job_id)
+            if events is not None:
+                events.append(event)
+                asyncio.get_running_loop().create_task(self._notify(job_id))
+
+        try:
+            result = await self.runner(query, emit)
+            await self._flush_progress(job_id)
+            await self.store.aupdate(job_id, status=JOB_SUCCEEDED, result=result)
+            await self._publish(job_id, {"type": "complete", "status": JOB_SUCCEEDED, "data": result})
+        except Exception as e:
+            await self._flush_progress(job_id)
+            await self.store.aupdate(job_id, status=JOB_FAILED, error=str(e))
+            await self._publish(job_id, {"type": "error", "status": JOB_FAILED, "error": str(e)})
+
+    async def events(self, job_id: str) -> AsyncGenerator[Dict[str, Any], None]:
+        """订阅任务事件流；任务不在本进程内时仅返回当前持久化状态"""
+        events = self._events.get(job_id)
+        condition = self._conditions.get(job_id)
+        if events is None or condition is None:
+            job = await self.store.aget(job_id)
+            if job is not None:
+                yield {"type": "status", "status": job["status"], "data": job["result"], "error": job["error"]}
+            return
+
+        index = 0
+        while True:
+            async with condition:
+                await condition.wait_for(lambda: len(events) > index)
+            while index < len(events):
+                event = events[index]
+                index += 1
+                yield event
+                if event.get("status") in _TERMINAL_STATES:
+                    return
@@ -4,24 +4,26 @@ LangChain智能体工具类
 封装所有AI逻辑，供FastAPI调用
 """
 
+import asyncio
 import os
 import sys
-from typing import Dict, List, Any, Optional
-from langchain.agents import AgentExecutor, create_tool_calling_agent
-from langchain_core.prompts import ChatPromptTemplate
+import time
+from typing import Dict, List, Any, Optional, Tuple, AsyncGenerator
 from langchain_core.messages import HumanMessage, SystemMessage
-from langchain_core.tools import BaseTool, tool
-from langchain_deepseek import ChatDeepSeek
-from langchain.globals import set_llm_cache #用于设置全局的LLM缓存机制。
-from langchain.cache import InMemoryCache, SQLiteCache #将缓存数据存储在内存中，而不是磁盘上
-import aiohttp
-import json
+from langchain_core.tools import tool
 
 # 添加项目根目录到路径获取配置信息
 sys.path.append(os.path.join(os.path.dirname(__file__), '../..'))
 from config import config
-from mcp_client.tools.semantic_cache import VectorStoreBackedSimilarityCache, SemanticLangChainCache
-from mcp_client.tools.sqlite_cache import SqliteExactCache
+from mcp_client.tools.semantic_cache import create_semantic_cache
+from mcp_client.tools.sqlite_cache import create_exact_cache
+from mcp_client.tools.single_flight import SingleFlight, normalize_key
+from mcp_client.tools.session_store import create_session_store
+from mcp_client.tools.intent_router import IntentRouter
+from mcp_client.tools.deadline import DeadlineExceededError, check_deadline, with_deadline
+from mcp_client.tools.llm_cache import semantic_message
+from mcp_client.tools.llm_gateway import get_chat_model
+from mcp_client.tools.metrics import observe_llm
 
 @tool
 def get_weather(city: str) -> str:
@@ -45,26 +47,30 @@ class LangChainAgent:
     """LangChain智能体封装类"""
     
     def __init__(self):
-        
-        set_llm_cache(SQLiteCache())
-        set_llm_cache(SemanticLangChainCache())
+        # 对话模型不使用全局分层缓存，问答结果只写入下面的精确缓存与语义缓存
         self.llm = self._setup_llm()
         self.agent_executor = None
         self.tools = self._setup_tools()
-        self.chat_history = []  # 仅保存用户历史问题（避免模型引用历史答案导致串题）
         # 精确缓存改为 SQLite
         cache_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../.cache"))
-        self.exact_cache = SqliteExactCache(os.path.join(cache_dir, "qa_cache.sqlite3"))
+        # 按会话保存用户历史问题（仅问题，避免模型引用历史答案导致串题）
+        self.sessions = create_session_store(cache_dir)
+        self.exact_cache = create_exact_cache(os.path.join(cache_dir, "qa_cache.sqlite3"))
         # 语义缓存
-        self.semantic_cache = VectorStoreBackedSimilarityCache()
+        self.semantic_cache = create_semantic_cache(os.path.join(cache_dir, "semantic_cache"))
+        # 意图路由：关键词/实体词典编译为自动机，可选嵌入质心作为第二阶段
+        self.router = IntentRouter.from_file(
+            config.INTENT_CONFIG or os.path.join(os.path.dirname(__file__), "intents.json"),
+            embeddings=self.semantic_cache.embeddings if config.INTENT_CENTROID_THRESHOLD > 0 else None,
+            centroid_threshold=config.INTENT_CENTROID_THRESHOLD,
+        )
+        self._tools_by_name = {t.name: t for t in self.tools}
+        # 并发重复问题合并
+        self._inflight = SingleFlight()
     
     def _setup_llm(self):
-        """设置大模型"""
-        return ChatDeepSeek(
-            model="deepseek-chat",
-            temperature=0.1,
-            api_key=config.DEEPSEEK_API_KEY
-        )
+        """设置大模型（对话结果由智能体自己的精确/语义缓存管理，不再经过全局分层缓存重复缓存）"""
+        return get_chat_model(temperature=0.1, cache=False)
     
     def _setup_tools(self) -> List:
         """设置工具集"""
@@ -74,7 +80,23 @@ class LangChainAgent:
         ]
     
     async def initialize(self):
-        """初始化智能体"""
+        """初始化智能体
+
+        chat() 使用关键词路由 + 直接调用大模型，不依赖 AgentExecutor；
+        AgentExecutor 改为在 get_agent_executor() 首次调用时再构建，缩短启动时间。
+        """
+
+    def get_agent_executor(self):
+        """获取工具调用型智能体执行器（首次调用时构建）"""
+        if self.agent_executor is None:
+            self.agent_executor = self._build_agent_executor()
+        return self.agent_executor
+
+    def _build_agent_executor(self):
+        """构建 AgentExecutor"""
+        from langchain.agents import AgentExecutor, create_tool_calling_agent
+        from langchain_core.prompts import ChatPromptTemplate
+
         # 创建提示词
         prompt = ChatPromptTemplate.from_messages([
             SystemMessage(content="""你是一个智能助手，可以调用工具帮助用户。
@@ -100,7 +122,7 @@ class LangChainAgent:
             prompt=prompt
         )
         
-        self.agent_executor = AgentExecutor(
+        return AgentExecutor(
             agent=agent,
             tools=self.tools,
             verbose=True,
@@ -110,185 +132,243 @@ class LangChainAgent:
             early_stopping_method="generate" #当满足停止条件时，智能体会生成最终回复
         )
     
-    async def chat(self, message: str) -> Dict[str, Any]:
-        """处理用户消息"""
+    async def _lookup_cache(self, message: str) -> Tuple[Optional[str], Optional[str]]:
+        """依次查询精确缓存与语义缓存，返回 (命中层级, 答案)；IO 在缓存各自的线程池中执行"""
+        # 1) 先命中精确缓存（SQLite）
+        exact = await self.exact_cache.aget(message)
+        if exact is not None:
+            return "exact", exact
+        # 2) 再命中语义缓存
+        if self.semantic_cache:
+            sem_hit = await self.semantic_cache.aget(message)
+            if sem_hit is not None:
+                return "semantic", sem_hit
+        return None, None
+
+    async def _route_tools(self, message: str) -> Tuple[Optional[str], Optional[str]]:
+        """按意图路由调用工具，返回 (意图, 工具结果)；未命中返回 (None, None)"""
+        match = await self.router.aroute(message)
+        if match is None:
+            return None, None
+        tool = self._tools_by_name.get(match.tool)
+        if tool is None:
+            return None, None
+        return match.intent, tool.invoke(match.slots)
+
+    def _build_messages(self, message: str, history: List[str]) -> List[Any]:
+        """构建包含（仅人类）历史问题的上下文，避免把历史答案塞回去导致串题"""
+        messages = []
+        messages.append(SystemMessage(content=(
+            "你是一个智能助手，可以帮用户查询天气和地点信息，也能回答各种问题。"
+            "请严格遵循：只回答当前这次用户消息的问题，不要复述或合并历史问题的答案。"
+            "可以参考历史问题做推理，但最终输出仅包含本次问题的答案。"
+        )))
+        # 仅附加最近的人类问题（不附加历史回答）
+        for human_msg in history:
+            messages.append(HumanMessage(content=f"历史问题(供参考，勿复述)：{human_msg}"))
+        # 当前用户消息
+        messages.append(HumanMessage(content=message))
+        return messages
+
+    def _remember(self, message: str, answer: str, intent: Optional[str] = None) -> None:
+        """写入精确缓存与语义缓存；按意图设置过期时间（如天气），无意图时各自使用默认过期时间
+
+        两者都只入队立即返回（精确缓存由写线程批量提交，语义缓存由写线程批量嵌入并写入），不占用回答耗时
+        """
+        self.exact_cache.put(message, answer, intent=intent)
+        self.semantic_cache.put(message, answer, ttl=self.exact_cache.ttl_for(intent) if intent else None)
+
+    async def _answer(self, message: str, history: List[str]) -> Dict[str, Any]:
+        """未命中缓存时的处理：工具调用或大模型回答"""
+        intent, tool_result = await self._route_tools(message)
+        if tool_result is not None:
+            self._remember(message, tool_result, intent)
+            return {"success": True, "response": tool_result, "error": None}
+
+        # 其他问题直接使用DeepSeek大模型回答
         try:
-            # 1) 先命中精确缓存（SQLite）
-            exact = self.exact_cache.get(message)
-            if exact is not None:
-                return {"success": True, "response": exact, "error": None}
-
-            # 2) 再命中语义缓存
-            if self.semantic_cache:
-                sem_hit = self.semantic_cache.get(message)
-                if sem_hit is not None:
-                    return {"success": True, "response": sem_hit, "error": None}
-
-            # 简单的关键词匹配来调用工具
-            if "天气" in message and "北京" in message:
-                weather_result = get_weather.invoke({"city": "北京"})
-                # 保存历史问题与缓存
-                self.chat_history.append(message)
-                self.exact_cache.put(message, weather_result)
-                result_payload = {
-                    "success": True,
-                    "response": weather_result,
-                    "error": None
-                }
-                # 写入语义缓存
-                self.semantic_cache.put(message, weather_result)
-                return result_payload
-            elif "天气" in message:
-                # 提取城市名称
-                city = "北京"  # 默认城市
-                for c in ["北京", "上海", "广州", "深圳", "杭州", "南京", "武汉", "成都"]:
-                    if c in message:
-                        city = c
-                        break
-                weather_result = get_weather.invoke({"city": city})
-                # 保存历史问题与缓存
-                self.chat_history.append(message)
-                self.exact_cache.put(message, weather_result)
-                result_payload = {
-                    "success": True,
-                    "response": weather_result,
-                    "error": None
-                }
-                self.semantic_cache.put(message, weather_result)
-                return result_payload
-            elif "地点" in message or "位置" in message or "搜索" in message:
-                location_result = search_location.invoke({"query": message})
-                # 保存历史问题与缓存
-                self.chat_history.append(message)
-                self.exact_cache.put(message, location_result)
-                result_payload = {
-                    "success": True,
-                    "response": location_result,
-                    "error": None
-                }
-                self.semantic_cache.put(message, location_result)
-                return result_payload
-            else:
-                # 其他问题直接使用DeepSeek大模型回答
-                try:
-                    # 构建包含（仅人类）历史问题的上下文，避免把历史答案塞回去导致串题
-                    messages = []
-                    messages.append(SystemMessage(content=(
-                        "你是一个智能助手，可以帮用户查询天气和地点信息，也能回答各种问题。"
-                        "请严格遵循：只回答当前这次用户消息的问题，不要复述或合并历史问题的答案。"
-                        "可以参考历史问题做推理，但最终输出仅包含本次问题的答案。"
-                    )))
-                    # 仅附加最近的人类问题（不附加历史回答）
-                    for human_msg in self.chat_history[-10:]:
-                        messages.append(HumanMessage(content=f"历史问题(供参考，勿复述)：{human_msg}"))
-                    # 当前用户消息
-                    messages.append(HumanMessage(content=message))
-                    
-                    response = await self.llm.ainvoke(messages)
-                    
-                    # 保存历史问题与缓存
-                    self.chat_history.append(message)
-                    self.exact_cache.put(message, response.content)
-                    
-                    result_payload = {
-                        "success": True,
-                        "response": response.content,
-                        "error": None
-                    }
-                    self.semantic_cache.put(message, response.content)
-                    return result_payload
-                except Exception as e:
-                    return {
-                        "success": False,
-                        "response": None,
-                        "error": f"DeepSeek模型调用失败: {str(e)}"
-                    }
+            started = time.perf_counter()
+            response = await with_deadline(self.llm.ainvoke(self._build_messages(message, history)))
+            observe_llm("chat", started, response)
+            # 参考了会话历史的回答依赖上下文，不写入按问题文本共享的缓存；空回答也不缓存
+            if not history and response.content.strip():
+                self._remember(message, response.content)
+            return {"success": True, "response": response.content, "error": None}
+        except DeadlineExceededError:
+            # 截止时间到期向上抛出，由接口层返回 504，而不是作为普通失败结果
+            raise
+        except Exception as e:
+            return {
+                "success": False,
+                "response": None,
+                "error": f"DeepSeek模型调用失败: {str(e)}"
+            }
+
+    async def chat(self, message: str, session_id: Optional[str] = None) -> Dict[str, Any]:
+        """处理用户消息；传入 session_id 时参考该会话的历史问题，否则不带历史
+
+        结果附带 cache（命中层级，未命中为 None）与 cache_lookup_ms（缓存查询耗时）
+        """
+        try:
+            started = time.perf_counter()
+            tier, cached = await self._lookup_cache(message)
+            lookup_ms = round((time.perf_counter() - started) * 1000, 2)
+            if cached is not None:
+                return {"success": True, "response": cached, "error": None, "cache": tier, "cache_lookup_ms": lookup_ms}
+
+            # 相同问题并发未命中时只调用一次大模型，其余请求共享结果；
+            # 带历史的回答只在同一会话内合并，避免把一个会话的历史问题带进另一个会话的回答
+            history = await self.sessions.aget(session_id)
+            key = normalize_key(message)
+            if history:
+                key = f"{session_id}\x00{key}"
+            result = await self._inflight.do(key, lambda: self._answer(message, history))
+            if result.get("success"):
+                await self.sessions.aappend(session_id, message)
+            return {**result, "cache": None, "cache_lookup_ms": lookup_ms}
+        except DeadlineExceededError:
+            raise
         except Exception as e:
             return {
                 "success": False,
                 "response": None,
                 "error": str(e)
             }
-    
-    async def batch_chat(self, messages: List[str]) -> List[Dict[str, Any]]:
-        """批量处理消息"""
-        results = []
+
+    async def chat_stream(self, message: str, session_id: Optional[str] = None) -> AsyncGenerator[Dict[str, Any], None]:
+        """流式处理用户消息
+
+        - 缓存命中或工具调用：直接产出一条 complete 事件
+        - 大模型回答：边生成边产出 chunk 事件，结束后写入缓存并产出 complete 事件
+        """
+        try:
+            tier, cached = await self._lookup_cache(message)
+            if cached is not None:
+                yield {"type": "complete", "content": cached, "cache": tier}
+                return
+
+            intent, tool_result = await self._route_tools(message)
+            if tool_result is not None:
+                self._remember(message, tool_result, intent)
+                await self.sessions.aappend(session_id, message)
+                yield {"type": "complete", "content": tool_result, "cache": None}
+                return
+
+            parts: List[str] = []
+            started = time.perf_counter()
+            last_chunk = None
+            history = await self.sessions.aget(session_id)
+            async for chunk in self.llm.astream(self._build_messages(message, history)):
+                check_deadline()
+                last_chunk = chunk
+                token = chunk.content
+                if token:
+                    parts.append(token)
+                    yield {"type": "chunk", "content": token}
+            # 流式输出时 token 用量（若有）附带在最后一个分片上
+            observe_llm("chat_stream", started, last_chunk)
+
+            answer = "".join(parts)
+            # 完整答案生成后再写缓存，避免缓存半截回答；参考了会话历史的回答与空回答不写入共享缓存
+            if not history and answer.strip():
+                self._remember(message, answer)
+            await self.sessions.aappend(session_id, message)
+            yield {"type": "complete", "content": answer, "cache": None}
+        except Exception as e:
+            yield {"type": "error", "error": f"DeepSeek模型调用失败: {str(e)}"}
+
+    def close(self) -> None:
+        """写完缓存队列中的条目并关闭缓存（进程退出前调用）"""
+        self.semantic_cache.close()
+        self.exact_cache.close()
+        self.sessions.close()
+
+    async def batch_chat(self, messages: List[str], concurrency: Optional[int] = None) -> List[Dict[str, Any]]:
+        """并发批量处理消息
+
+        - 批内相同问题（规范化后）只处理一次
+        - 缓存命中直接返回，不占用并发名额
+        - 结果按输入顺序返回，每条附带 cache（命中层级）与 latency_ms（耗时）
+        """
+        semaphore = asyncio.Semaphore(max(1, concurrency or config.CHAT_BATCH_CONCURRENCY))
+
+        async def run_one(message: str) -> Dict[str, Any]:
+            started = time.perf_counter()
+            try:
+                tier, cached = await self._lookup_cache(message)
+                if cached is not None:
+                    result = {"success": True, "response": cached, "error": None}
+                else:
+                    async with semaphore:
+                        result = dict(await self._inflight.do(normalize_key(message), lambda: self._answer(message, [])))
+            except Exception as e:
+                tier, result = None, {"success": False, "response": None, "error": str(e)}
+            result["cache"] = tier
+            result["latency_ms"] = round((time.perf_counter() - started) * 1000, 2)
+            return result
+
+        # 批内去重：相同问题共享同一个任务
+        tasks: Dict[str, asyncio.Task] = {}
         for message in messages:
-            result = await self.chat(message)
-            results.append(result)
-        return results
+            key = normalize_key(message)
+            if key not in tasks:
+                tasks[key] = asyncio.ensure_future(run_one(message))
+        await asyncio.gather(*tasks.values())
+        return [dict(tasks[normalize_key(message)].result()) for message in messages]
 
 # 全局智能体实例
 _agent_instance: Optional[LangChainAgent] = None
 
+_agent_lock = asyncio.Lock()
+
 async def get_agent() -> LangChainAgent:
     """获取智能体实例（单例）"""
     global _agent_instance
     if _agent_instance is None:
-        _agent_instance = LangChainAgent()
-        await _agent_instance.initialize()
+        async with _agent_lock:
+            if _agent_instance is None:
+                # 构造过程包含 SQLite 与向量库初始化，放到线程中避免阻塞事件循环
+                agent = await asyncio.to_thread(LangChainAgent)
+                await agent.initialize()
+                _agent_instance = agent
     return _agent_instance
 
+async def close_agent() -> None:
+    """关闭智能体持有的缓存，等待尚未落盘的写入完成"""
+    if _agent_instance is not None:
+        await asyncio.to_thread(_agent_instance.close)
+
 ### rag结合 
 # langchain_retriever.py
 
 from langchain_core.documents import Document  # 修复过时的导入
-from langchain_community.vectorstores import Chroma  # 修复过时的导入
-from llama_index.core.query_engine import RetrieverQueryEngine
-from llama_index.core.retrievers import VectorIndexRetriever
-from typing import List
-from langchain_openai import ChatOpenAI
-from langchain_core.prompts import PromptTemplate
-from langchain.chains import RetrievalQA
-
-# 导入RAG系统
-try:
-    from mcp_client.RAG.rag import get_rag_system, initialize_rag
-    RAG_AVAILABLE = True
-except ImportError as e:
-    RAG_AVAILABLE = False
-    print(f"RAG系统不可用: {e}")
+# llama_index / chromadb 等重依赖在首次使用RAG时才导入，避免拖慢启动
 
-def load_qa_chain():
-    """加载问答链 - 结合LlamaIndex检索和LangChain生成"""
-    if not RAG_AVAILABLE:
-        # 如果RAG不可用，返回模拟链
-        class MockQAChain:
-            def invoke(self, inputs):
-                return {
-                    "result": "RAG功能不可用，请检查配置",
-                    "source_documents": []
-                }
-        return MockQAChain()
-    
-    try:
-        # 初始化RAG系统
-        if not initialize_rag():
-            raise Exception("RAG系统初始化失败")
-        
-        rag_system = get_rag_system()
-        
-        class RAGQAChain:
-            def __init__(self, rag_system):
-                self.rag_system = rag_system
-                self.llm = ChatDeepSeek(
-                    model=config.DEEPSEEK_MODEL,
-                    temperature=0.1,
-                    api_key=config.DEEPSEEK_API_KEY,
-                    base_url=config.DEEPSEEK_BASE_URL
-                )
-            
-            def invoke(self, inputs):
-                try:
-                    query = inputs.get("query", "")
-                    
-                    # 1. 使用LlamaIndex检索相关文档
-                    retrieved_docs = self.rag_system.retrieve_documents(query)
-                    
-                    # 2. 构建提示词
-                    context = "\n\n".join([doc["text"] for doc in retrieved_docs])
-                    
-                    prompt = f"""基于以下上下文信息回答用户问题。
+
+class _MockQAChain:
+    """RAG不可用时的模拟问答链"""
+
+    def __init__(self, message: str):
+        self.message = message
+
+    def invoke(self, inputs):
+        return {"result": self.message, "source_documents": []}
+
+    async def ainvoke(self, inputs):
+        return self.invoke(inputs)
+
+
+class RAGQAChain:
+    """结合LlamaIndex检索与DeepSeek生成的问答链"""
+
+    def __init__(self, rag_system):
+        self.rag_system = rag_system
+        self.llm = get_chat_model(temperature=0.1)
+
+    @staticmethod
+    def _build_prompt(query: str, retrieved_docs) -> str:
+        context = "\n\n".join([doc["text"] for doc in retrieved_docs])
+        return f"""基于以下上下文信息回答用户问题。
 
 上下文信息：
 {context}
@@ -298,46 +378,76 @@ def load_qa_chain():
 请基于上下文信息回答问题。如果上下文中没有相关信息，请说明无法找到答案。
 
 回答："""
-                    
-                    # 3. 使用DeepSeek生成回答
-                    response = self.llm.invoke(prompt)
-                    answer = response.content if hasattr(response, 'content') else str(response)
-                    
-                    # 4. 格式化输出
-                    from langchain_core.documents import Document
-                    source_docs = []
-                    for doc in retrieved_docs:
-                        source_docs.append(Document(
-                            page_content=doc["text"],
-                            metadata=doc["metadata"]
-                        ))
-                    
-                    return {
-                        "result": answer,
-                        "source_documents": source_docs
-                    }
-                    
-                except Exception as e:
-                    return {
-                        "result": f"处理失败: {str(e)}",
-                        "source_documents": []
-                    }
-        
-        return RAGQAChain(rag_system)
-        
+
+    @staticmethod
+    def _format_output(answer: str, retrieved_docs) -> Dict[str, Any]:
+        source_docs = [
+            Document(page_content=doc["text"], metadata=doc["metadata"])
+            for doc in retrieved_docs
+        ]
+        return {"result": answer, "source_documents": source_docs}
+
+    def invoke(self, inputs):
+        try:
+            query = inputs.get("query", "")
+            # 1. 使用LlamaIndex检索相关文档
+            retrieved_docs = self.rag_system.retrieve_documents(query)
+            # 2. 使用DeepSeek生成回答
+            check_deadline()
+            started = time.perf_counter()
+            response = self.llm.invoke([semantic_message(self._build_prompt(query, retrieved_docs), query)])
+            observe_llm("rag_qa_chain", started, response)
+            answer = response.content if hasattr(response, 'content') else str(response)
+            # 3. 格式化输出
+            return self._format_output(answer, retrieved_docs)
+        except DeadlineExceededError:
+            raise
+        except Exception as e:
+            return {"result": f"处理失败: {str(e)}", "source_documents": []}
+
+    async def ainvoke(self, inputs):
+        """异步版本：检索在RAG线程池执行，生成使用 ainvoke"""
+        try:
+            query = inputs.get("query", "")
+            retrieved_docs = await self.rag_system.aretrieve_documents(query)
+            started = time.perf_counter()
+            response = await with_deadline(
+                self.llm.ainvoke([semantic_message(self._build_prompt(query, retrieved_docs), query)])
+            )
+            observe_llm("rag_qa_chain", started, response)
+            answer = response.content if hasattr(response, 'content') else str(response)
+            return self._format_output(answer, retrieved_docs)
+        except DeadlineExceededError:
+            raise
+        except Exception as e:
+            return {"result": f"处理失败: {str(e)}", "source_documents": []}
+
+
+def load_qa_chain():
+    """加载问答链 - 结合LlamaIndex检索和LangChain生成"""
+    # 导入RAG系统
+    try:
+        from mcp_client.RAG.rag import get_rag_system, initialize_rag
+    except ImportError as e:
+        print(f"RAG系统不可用: {e}")
+        # 如果RAG不可用，返回模拟链
+        return _MockQAChain("RAG功能不可用，请检查配置")
+
+    try:
+        # 初始化RAG系统
+        if not initialize_rag():
+            raise Exception("RAG系统初始化失败")
+        return RAGQAChain(get_rag_system())
     except Exception as e:
         # 如果出现任何错误，返回模拟chain
-        class MockQAChain:
-            def invoke(self, inputs):
-                return {
-                    "result": f"RAG功能配置错误: {str(e)}",
-                    "source_documents": []
-                }
-        return MockQAChain()
+        return _MockQAChain(f"RAG功能配置错误: {str(e)}")
 
 
 class LlamaIndexRetriever:
     def __init__(self, index):
+        from llama_index.core.query_engine import RetrieverQueryEngine
+        from llama_index.core.retrievers import VectorIndexRetriever
+
         self.index = index
         self.retriever = VectorIndexRetriever(index=index, similarity_top_k=3)
         self.query_engine = RetrieverQueryEngine(retriever=self.retriever)
@@ -1,12 +1,14 @@
 # langgraph/langgraph.py
-from langgraph.graph import StateGraph, END
 from .state import MarketResearchState
-from ..agent.researcher import researcher_node
-from ..agent.analyst import analyst_node
-from ..agent.writer import writer_node
-from ..agent.reviewer import reviewer_node
 
 def build_graph():
+    # langgraph 与各节点依赖（langchain_openai 等）在构建时才导入，避免拖慢启动
+    from langgraph.graph import StateGraph, END
+    from ..agent.researcher import researcher_node
+    from ..agent.analyst import analyst_node
+    from ..agent.writer import writer_node
+    from ..agent.reviewer import reviewer_node
+
     builder = StateGraph(MarketResearchState)
 
     # 添加节点
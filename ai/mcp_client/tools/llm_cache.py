@@ -0,0 +1,280 @@
+"""
+分层 LLM 缓存（LangChain BaseCache）
+
+- L1：进程内 LRU，命中无需任何 IO
+- L2：SqliteExactCache，按 (prompt, 模型参数) 的哈希精确匹配，跨进程、重启后仍有效
+- L3：语义缓存，按调用方标注的原始用户问题的相似度命中；需要调用方显式开启：用 semantic_message(prompt, question)
+  构造用户消息，问题写入消息的 additional_kwargs（不会发送给模型）。未标注的 prompt（模板渲染后的智能体节点、
+  GraphRAG、带历史的对话、OpenAI SDK 调用）只走 L1/L2：渲染后的模板与上下文会主导向量，相似不代表可复用
+- 下层命中时回填上层；写入时三层同时写入
+- 缓存键包含模型参数（llm_string），不同模型/温度互不串用
+- 各层命中情况计入 cache_requests_total{tier="llm_l1|llm_l2|llm_l3"}
+- alookup/aupdate：L1 在事件循环中直接查询，L2/L3 使用各层自己的线程池，不占用默认执行器
+
+由 llm_gateway 通过 set_llm_cache 全局安装一次，经网关创建的 LangChain 模型默认共用 L1/L2
+（get_chat_model(cache=False) 的调用方不使用：智能体对话已有自己的精确/语义缓存，撰写节点在审核循环中需要重新生成）；
+直接使用 OpenAI SDK 的调用方通过 lookup_text / update_text 复用同一份缓存（不参与 L3）。
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+from langchain_core.caches import RETURN_VAL_TYPE, BaseCache
+from langchain_core.load import dumps, loads
+from langchain_core.messages import HumanMessage
+from langchain_core.outputs import Generation
+
+from mcp_client.tools.metrics import observe_cache
+from mcp_client.tools.semantic_cache import VectorStoreBackedSimilarityCache, create_semantic_cache
+from mcp_client.tools.sqlite_cache import SqliteExactCache, create_exact_cache
+
+
+# 用户消息 additional_kwargs 中标注 L3 匹配文本的键
+SEMANTIC_TEXT_KEY = "semantic_cache_text"
+
+
+def semantic_message(content: str, question: str) -> HumanMessage:
+    """构造参与 L3 语义缓存的用户消息：content 为发送给模型的完整 prompt，question 为用于语义匹配的原始问题"""
+    return HumanMessage(content=content, additional_kwargs={SEMANTIC_TEXT_KEY: question})
+
+
+def _cache_key(prompt: str, llm_string: str) -> str:
+    return hashlib.sha256(f"{llm_string}\x00{prompt}".encode("utf-8")).hexdigest()
+
+
+def _llm_key(llm_string: str) -> str:
+    return hashlib.sha256(llm_string.encode("utf-8")).hexdigest()[:16]
+
+
+def _message_role(message: Dict[str, Any]) -> str:
+    """LangChain 序列化消息的类名（HumanMessage 等）或 OpenAI 消息的 role，统一为 human/ai/system/其他"""
+    role = message.get("role")
+    if role is None:
+        ids = message.get("id")
+        role = ids[-1] if isinstance(ids, list) and ids else message.get("kwargs", {}).get("type", "")
+    return {
+        "user": "human",
+        "HumanMessage": "human",
+        "assistant": "ai",
+        "AIMessage": "ai",
+        "SystemMessage": "system",
+    }.get(role, role)
+
+
+def _semantic_prompt_text(prompt: str) -> Optional[str]:
+    """取出 L3 语义匹配文本：唯一一条用户消息上由 semantic_message 标注的原始问题
+
+    未标注（调用方未开启 L3）、带历史（多条用户消息或包含模型回复）的 prompt 返回 None
+    """
+    try:
+        messages = json.loads(prompt)
+    except (ValueError, TypeError):
+        return None
+    if not isinstance(messages, list):
+        return None
+    texts: List[Any] = []
+    for message in messages:
+        if not isinstance(message, dict):
+            return None
+        role = _message_role(message)
+        if role == "ai":
+            return None
+        if role == "human":
+            # LangChain 序列化消息为 {"kwargs": {"content": ..., "additional_kwargs": {...}}}
+            texts.append(message.get("kwargs", {}).get("additional_kwargs", {}).get(SEMANTIC_TEXT_KEY))
+    if len(texts) != 1 or not isinstance(texts[0], str):
+        return None
+    return texts[0]
+
+
+class TieredLLMCache(BaseCache):
+    """L1 内存 LRU + L2 SQLite 精确缓存 + L3 语义缓存"""
+
+    def __init__(
+        self,
+        l2: SqliteExactCache,
+        l1_size: int = 1024,
+        l3: Optional[VectorStoreBackedSimilarityCache] = None,
+        semantic_max_chars: int = 500,
+    ) -> None:
+        self.l1_size = l1_size
+        self._l1: "OrderedDict[str, List[Any]]" = OrderedDict()
+        self._l1_lock = threading.Lock()
+        self.l2 = l2
+        self.semantic_max_chars = semantic_max_chars
+        self.l3 = l3
+
+    # ---- L1 ----
+    def _l1_get(self, key: str) -> Optional[List[Any]]:
+        started = time.perf_counter()
+        with self._l1_lock:
+            value = self._l1.get(key)
+            if value is not None:
+                self._l1.move_to_end(key)
+        observe_cache("llm_l1", started, value is not None)
+        return value
+
+    def _l1_put(self, key: str, value: List[Any]) -> None:
+        if self.l1_size <= 0:
+            return
+        with self._l1_lock:
+            self._l1[key] = value
+            self._l1.move_to_end(key)
+            while len(self._l1) > self.l1_size:
+                self._l1.popitem(last=False)
+
+    # ---- L3 ----
+    def _semantic_text(self, prompt: str) -> Optional[str]:
+        if not self.l3 or not self.l3.enabled:
+            return None
+        text = _semantic_prompt_text(prompt)
+        return text if text is not None and len(text) <= self.semantic_max_chars else None
+
+    def _l3_get(self, prompt: str, llm_string: str) -> Optional[List[Any]]:
+        text = self._semantic_text(prompt)
+        if text is None:
+            return None
+        payload = self.l3.get(text)
+        if payload is None:
+            return None
+        try:
+            entry = json.loads(payload)
+        except ValueError:
+            return None
+        # 语义相近但模型参数不同，不能复用
+        if entry.get("llm") != _llm_key(llm_string):
+            return None
+        return [loads(g) for g in entry["generations"]]
+
+    # ---- BaseCache ----
+    def lookup(self, prompt: str, llm_string: str) -> Optional[RETURN_VAL_TYPE]:
+        key = _cache_key(prompt, llm_string)
+        value = self._l1_get(key)
+        if value is not None:
+            return value
+        return self._lookup_lower(prompt, llm_string, key)
+
+    def _lookup_lower(self, prompt: str, llm_string: str, key: str) -> Optional[RETURN_VAL_TYPE]:
+        """依次查询 L2、L3，命中后回填 L1"""
+        value = None
+        try:
+            payload = self.l2.get(key)
+            if payload is not None:
+                value = [loads(g) for g in json.loads(payload)]
+        except Exception:
+            # 反序列化失败（例如 LangChain 版本变化）视为未命中
+            value = None
+        if value is None:
+            try:
+                value = self._l3_get(prompt, llm_string)
+            except Exception:
+                value = None
+        if value is not None:
+            self._l1_put(key, value)
+        return value
+
+    def update(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE) -> None:
+        if not return_val:
+            return
+        key = _cache_key(prompt, llm_string)
+        self._l1_put(key, list(return_val))
+        try:
+            generations = [dumps(g) for g in return_val]
+        except Exception:
+            return
+        self.l2.put(key, json.dumps(generations))
+        text = self._semantic_text(prompt)
+        if text is not None:
+            self.l3.put(text, json.dumps({"llm": _llm_key(llm_string), "generations": generations}))
+
+    def clear(self, **kwargs: Any) -> None:
+        with self._l1_lock:
+            self._l1.clear()
+        self.l2.clear()
+        if self.l3:
+            self.l3.clear()
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """各层的条目数与占用（L1 仅统计条目数）"""
+        with self._l1_lock:
+            l1_entries = len(self._l1)
+        tiers: Dict[str, Dict[str, Any]] = {"llm_l1": {"entries": l1_entries}, "llm_l2": self.l2.stats()}
+        if self.l3:
+            tiers["llm_l3"] = self.l3.stats()
+        return tiers
+
+    def close(self) -> None:
+        """写完 L2/L3 的写队列并关闭"""
+        if self.l3:
+            self.l3.close()
+        self.l2.close()
+
+    async def alookup(self, prompt: str, llm_string: str) -> Optional[RETURN_VAL_TYPE]:
+        key = _cache_key(prompt, llm_string)
+        value = self._l1_get(key)
+        if value is not None:
+            return value
+        return await self.l2.run_in_executor(self._lookup_lower, prompt, llm_string, key)
+
+    async def aupdate(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE) -> None:
+        await self.l2.run_in_executor(self.update, prompt, llm_string, return_val)
+
+    async def aclear(self, **kwargs: Any) -> None:
+        await self.l2.run_in_executor(self.clear)
+
+    # ---- 非 LangChain 调用方（OpenAI SDK） ----
+    def lookup_text(self, prompt: str, llm_string: str) -> Optional[str]:
+        value = self.lookup(prompt, llm_string)
+        return value[0].text if value else None
+
+    def update_text(self, prompt: str, llm_string: str, text: Optional[str]) -> None:
+        if text:
+            self.update(prompt, llm_string, [Generation(text=text)])
+
+
+_llm_cache: Optional[TieredLLMCache] = None
+_llm_cache_lock = threading.Lock()
+
+
+def install_llm_cache() -> Optional[TieredLLMCache]:
+    """创建分层缓存并通过 set_llm_cache 全局安装（只执行一次）；LLM_CACHE=false 时不安装"""
+    global _llm_cache
+    from config import config
+
+    if not config.LLM_CACHE:
+        return None
+    if _llm_cache is None:
+        with _llm_cache_lock:
+            if _llm_cache is None:
+                from langchain_core.globals import set_llm_cache
+
+                cache_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../.cache"))
+                cache = TieredLLMCache(
+                    create_exact_cache(os.path.join(cache_dir, "llm_cache.sqlite3"), tier="llm_l2"),
+                    l1_size=config.LLM_CACHE_L1_SIZE,
+                    l3=(
+                        create_semantic_cache(os.path.join(cache_dir, "llm_semantic_cache"), tier="llm_l3")
+                        if config.LLM_CACHE_SEMANTIC
+                        else None
+                    ),
+                    semantic_max_chars=config.LLM_CACHE_SEMANTIC_MAX_CHARS,
+                )
+                set_llm_cache(cache)
+                _llm_cache = cache
+    return _llm_cache
+
+
+def get_llm_cache() -> Optional[TieredLLMCache]:
+    return _llm_cache
+
+
+def close_llm_cache() -> None:
+    if _llm_cache is not None:
+        _llm_cache.close()
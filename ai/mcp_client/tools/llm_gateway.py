@@ -0,0 +1,402 @@
+"""
+LLM 调用网关
+
+- 所有 LLM 调用共用长连接池（每个 base_url 一个 httpx 同步/异步客户端），避免每次调用重新握手
+- 全局令牌桶限制每分钟请求数（RPM）与 token 数（TPM），并限制同时在途的请求数
+- 超出限额的请求在本地排队等待，而不是打到服务端触发 429；收到 429 时按 Retry-After 暂停所有调用方
+- 排队等待受请求截止时间约束，剩余时间不足时直接抛出 DeadlineExceededError
+
+限流在 httpx 传输层实现，LangChain 模型与 OpenAI SDK 客户端共用同一套额度。
+
+使用方式：
+from mcp_client.tools.llm_gateway import get_chat_model, get_openai_client
+llm = get_chat_model(temperature=0.3)
+client = get_openai_client()
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import threading
+import time
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, Optional, Tuple
+
+import httpx
+
+from config import config
+from mcp_client.tools.deadline import DeadlineExceededError, remaining
+from mcp_client.tools.llm_cache import get_llm_cache, install_llm_cache
+from mcp_client.tools.metrics import observe_llm, registry
+
+# 请求体字节数到 token 数的粗略换算（中文 UTF-8 约 3 字节/字）
+_BYTES_PER_TOKEN = 3
+# 并发名额已满时异步调用方的轮询间隔（秒）
+_SLOT_POLL_MIN = 0.005
+_SLOT_POLL_MAX = 0.1
+
+LLM_GATEWAY_WAIT_SECONDS = registry.histogram(
+    "llm_gateway_wait_duration_seconds", "LLM网关排队等待耗时（秒）",
+    buckets=(0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0),
+)
+LLM_GATEWAY_THROTTLED = registry.counter(
+    "llm_gateway_throttled_total", "LLM网关限流次数", ("reason",)
+)
+
+
+class TokenBucket:
+    """预约式令牌桶：额度不足时预支并返回需要等待的秒数，调用方按预约顺序依次放行"""
+
+    def __init__(self, per_minute: float) -> None:
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, amount: float) -> float:
+        if self.capacity <= 0:
+            return 0.0
+        # 单次请求超过桶容量时按满桶计算，避免永远无法放行
+        amount = min(amount, self.capacity)
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= amount
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    def refund(self, amount: float) -> None:
+        """归还未使用的预约（例如等待期间已超过截止时间）"""
+        if self.capacity <= 0:
+            return
+        with self._lock:
+            self._tokens = min(self.capacity, self._tokens + min(amount, self.capacity))
+
+
+class RateLimiter:
+    """RPM/TPM 令牌桶 + 并发上限，同步与异步调用方共享同一份额度"""
+
+    def __init__(self, rpm: int, tpm: int, max_concurrency: int) -> None:
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.max_concurrency = max(1, max_concurrency)
+        self.inflight = 0
+        self.waiting = 0
+        self._paused_until = 0.0
+        self._cond = threading.Condition()
+
+    def _reserve(self, tokens: int) -> float:
+        wait = max(
+            self.requests.reserve(1),
+            self.tokens.reserve(tokens),
+            self._paused_until - time.monotonic(),
+        )
+        if wait > 0:
+            LLM_GATEWAY_THROTTLED.inc(reason="rate")
+            left = remaining()
+            if left is not None and wait > left:
+                self.requests.refund(1)
+                self.tokens.refund(tokens)
+                raise DeadlineExceededError("LLM调用排队超过请求截止时间")
+        return wait
+
+    def _try_take_slot(self) -> bool:
+        with self._cond:
+            if self.inflight < self.max_concurrency:
+                self.inflight += 1
+                return True
+            return False
+
+    def acquire(self, tokens: int) -> None:
+        started = time.perf_counter()
+        wait = self._reserve(tokens)
+        if wait > 0:
+            time.sleep(wait)
+        with self._cond:
+            if self.inflight >= self.max_concurrency:
+                LLM_GATEWAY_THROTTLED.inc(reason="concurrency")
+            self.waiting += 1
+            try:
+                while self.inflight >= self.max_concurrency:
+                    left = remaining()
+                    if left is not None and left <= 0:
+                        raise DeadlineExceededError("LLM调用排队超过请求截止时间")
+                    self._cond.wait(timeout=left)
+                self.inflight += 1
+            finally:
+                self.waiting -= 1
+        LLM_GATEWAY_WAIT_SECONDS.observe(time.perf_counter() - started)
+
+    async def aacquire(self, tokens: int) -> None:
+        started = time.perf_counter()
+        wait = self._reserve(tokens)
+        if wait > 0:
+            await asyncio.sleep(wait)
+        if not self._try_take_slot():
+            LLM_GATEWAY_THROTTLED.inc(reason="concurrency")
+            # 名额由同步线程与事件循环共享，异步侧以退避轮询方式等待，不阻塞事件循环
+            delay = _SLOT_POLL_MIN
+            with self._cond:
+                self.waiting += 1
+            try:
+                while not self._try_take_slot():
+                    left = remaining()
+                    if left is not None and left <= 0:
+                        raise DeadlineExceededError("LLM调用排队超过请求截止时间")
+                    await asyncio.sleep(delay if left is None else min(delay, left))
+                    delay = min(delay * 2, _SLOT_POLL_MAX)
+            finally:
+                with self._cond:
+                    self.waiting -= 1
+        LLM_GATEWAY_WAIT_SECONDS.observe(time.perf_counter() - started)
+
+    def release(self) -> None:
+        with self._cond:
+            self.inflight -= 1
+            self._cond.notify()
+
+    def pause(self, seconds: float) -> None:
+        """服务端返回 429 时暂停放行新请求"""
+        LLM_GATEWAY_THROTTLED.inc(reason="server_429")
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+
+def _estimate_tokens(request: httpx.Request) -> int:
+    try:
+        return int(request.headers.get("content-length", "0")) // _BYTES_PER_TOKEN
+    except ValueError:
+        return 0
+
+
+def _retry_after(response: httpx.Response) -> float:
+    try:
+        return max(1.0, float(response.headers.get("retry-after", "1")))
+    except ValueError:
+        return 1.0
+
+
+class _ReleasingStream(httpx.SyncByteStream):
+    """响应体读完或关闭时归还并发名额（流式响应在整个输出期间占用名额）"""
+
+    def __init__(self, stream: Any, release: Callable[[], None]) -> None:
+        self._stream = stream
+        self._release = release
+        self._released = False
+
+    def __iter__(self) -> Iterator[bytes]:
+        yield from self._stream
+
+    def close(self) -> None:
+        try:
+            self._stream.close()
+        finally:
+            if not self._released:
+                self._released = True
+                self._release()
+
+
+class _ReleasingAsyncStream(httpx.AsyncByteStream):
+    def __init__(self, stream: Any, release: Callable[[], None]) -> None:
+        self._stream = stream
+        self._release = release
+        self._released = False
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        async for chunk in self._stream:
+            yield chunk
+
+    async def aclose(self) -> None:
+        try:
+            await self._stream.aclose()
+        finally:
+            if not self._released:
+                self._released = True
+                self._release()
+
+
+class _GatewayTransport(httpx.BaseTransport):
+    def __init__(self, limiter: RateLimiter, limits: httpx.Limits) -> None:
+        self._limiter = limiter
+        self._transport = httpx.HTTPTransport(limits=limits)
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        self._limiter.acquire(_estimate_tokens(request))
+        try:
+            response = self._transport.handle_request(request)
+        except BaseException:
+            self._limiter.release()
+            raise
+        if response.status_code == 429:
+            self._limiter.pause(_retry_after(response))
+        return httpx.Response(
+            status_code=response.status_code,
+            headers=response.headers,
+            stream=_ReleasingStream(response.stream, self._limiter.release),
+            extensions=response.extensions,
+        )
+
+    def close(self) -> None:
+        self._transport.close()
+
+
+class _GatewayAsyncTransport(httpx.AsyncBaseTransport):
+    def __init__(self, limiter: RateLimiter, limits: httpx.Limits) -> None:
+        self._limiter = limiter
+        self._transport = httpx.AsyncHTTPTransport(limits=limits)
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        await self._limiter.aacquire(_estimate_tokens(request))
+        try:
+            response = await self._transport.handle_async_request(request)
+        except BaseException:
+            self._limiter.release()
+            raise
+        if response.status_code == 429:
+            self._limiter.pause(_retry_after(response))
+        return httpx.Response(
+            status_code=response.status_code,
+            headers=response.headers,
+            stream=_ReleasingAsyncStream(response.stream, self._limiter.release),
+            extensions=response.extensions,
+        )
+
+    async def aclose(self) -> None:
+        await self._transport.aclose()
+
+
+class LLMGateway:
+    """持有长连接池与共享限流器，按模型配置复用 LLM 客户端"""
+
+    def __init__(self) -> None:
+        self.limiter = RateLimiter(config.LLM_RPM, config.LLM_TPM, config.LLM_MAX_CONCURRENCY)
+        self._limits = httpx.Limits(
+            max_connections=config.LLM_POOL_MAX_CONNECTIONS,
+            max_keepalive_connections=config.LLM_POOL_MAX_KEEPALIVE,
+            keepalive_expiry=config.LLM_POOL_KEEPALIVE_EXPIRY,
+        )
+        self._timeout = httpx.Timeout(config.LLM_TIMEOUT, connect=10.0)
+        self._clients: Dict[str, Tuple[httpx.Client, httpx.AsyncClient]] = {}
+        self._models: Dict[Tuple[str, str, float], Any] = {}
+        self._openai_clients: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def http_clients(self, base_url: Optional[str] = None) -> Tuple[httpx.Client, httpx.AsyncClient]:
+        """返回指定 base_url 共用的 (同步, 异步) httpx 客户端"""
+        base_url = base_url or config.DEEPSEEK_BASE_URL
+        with self._lock:
+            clients = self._clients.get(base_url)
+            if clients is None:
+                clients = (
+                    httpx.Client(transport=_GatewayTransport(self.limiter, self._limits), timeout=self._timeout),
+                    httpx.AsyncClient(transport=_GatewayAsyncTransport(self.limiter, self._limits), timeout=self._timeout),
+                )
+                self._clients[base_url] = clients
+            return clients
+
+    def chat_model(
+        self, temperature: float = 0.1, model: Optional[str] = None, base_url: Optional[str] = None, cache: bool = True
+    ) -> Any:
+        """返回共用连接池的 ChatDeepSeek；相同配置复用同一实例；cache=False 时不使用全局分层缓存"""
+        model = model or config.DEEPSEEK_MODEL
+        base_url = base_url or config.DEEPSEEK_BASE_URL
+        key = (model, base_url, float(temperature), cache)
+        with self._lock:
+            llm = self._models.get(key)
+        if llm is not None:
+            return llm
+
+        from langchain_deepseek import ChatDeepSeek
+
+        http_client, http_async_client = self.http_clients(base_url)
+        llm = ChatDeepSeek(
+            model=model,
+            temperature=temperature,
+            api_key=config.DEEPSEEK_API_KEY,
+            base_url=base_url,
+            http_client=http_client,
+            http_async_client=http_async_client,
+            # None 表示使用全局缓存
+            cache=None if cache else False,
+        )
+        with self._lock:
+            return self._models.setdefault(key, llm)
+
+    def openai_client(self, base_url: Optional[str] = None) -> Any:
+        """返回共用连接池的 AsyncOpenAI 客户端"""
+        base_url = base_url or config.DEEPSEEK_BASE_URL
+        with self._lock:
+            client = self._openai_clients.get(base_url)
+        if client is not None:
+            return client
+
+        from openai import AsyncOpenAI
+
+        _, http_async_client = self.http_clients(base_url)
+        client = AsyncOpenAI(api_key=config.DEEPSEEK_API_KEY, base_url=base_url, http_client=http_async_client)
+        with self._lock:
+            return self._openai_clients.setdefault(base_url, client)
+
+    async def chat_completion(self, component: str, **kwargs: Any) -> Optional[str]:
+        """OpenAI SDK 调用（共用连接池、限流与分层缓存），返回首条回复文本"""
+        cache = get_llm_cache()
+        prompt = json.dumps(kwargs.get("messages", []), ensure_ascii=False, sort_keys=True)
+        llm_string = json.dumps({k: v for k, v in kwargs.items() if k != "messages"}, sort_keys=True)
+        if cache is not None:
+            cached = await asyncio.to_thread(cache.lookup_text, prompt, llm_string)
+            if cached is not None:
+                return cached
+
+        started = time.perf_counter()
+        response = await self.openai_client().chat.completions.create(**kwargs)
+        observe_llm(component, started, response)
+        text = response.choices[0].message.content
+        if cache is not None:
+            await asyncio.to_thread(cache.update_text, prompt, llm_string, text)
+        return text
+
+    async def aclose(self) -> None:
+        """关闭所有连接池（应用退出时调用）"""
+        with self._lock:
+            clients = list(self._clients.values())
+            self._clients.clear()
+            self._models.clear()
+            self._openai_clients.clear()
+        for client, async_client in clients:
+            client.close()
+            await async_client.aclose()
+
+
+_gateway: Optional[LLMGateway] = None
+_gateway_lock = threading.Lock()
+
+
+def get_gateway() -> LLMGateway:
+    global _gateway
+    if _gateway is None:
+        with _gateway_lock:
+            if _gateway is None:
+                # 所有经网关创建的模型共用全局分层缓存
+                install_llm_cache()
+                gateway = LLMGateway()
+                registry.gauge("llm_gateway_inflight", "LLM网关在途请求数", lambda: gateway.limiter.inflight)
+                registry.gauge("llm_gateway_waiting", "LLM网关等待并发名额的请求数", lambda: gateway.limiter.waiting)
+                _gateway = gateway
+    return _gateway
+
+
+def get_chat_model(temperature: float = 0.1, model: Optional[str] = None, cache: bool = True) -> Any:
+    return get_gateway().chat_model(temperature=temperature, model=model, cache=cache)
+
+
+def get_openai_client() -> Any:
+    return get_gateway().openai_client()
+
+
+async def chat_completion(component: str, **kwargs: Any) -> Optional[str]:
+    return await get_gateway().chat_completion(component, **kwargs)
+
+
+async def close_gateway() -> None:
+    if _gateway is not None:
+        await _gateway.aclose()
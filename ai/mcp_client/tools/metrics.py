@@ -0,0 +1,312 @@
+"""
+进程内指标注册表（Prometheus 文本格式）
+
+- 支持 Counter / Histogram / Gauge，按标签区分序列
+- 热路径不加锁：每个线程写自己的分片（threading.local），仅在首次使用和导出时汇总
+- 导出格式兼容 Prometheus text exposition 0.0.4
+
+使用方式：
+from mcp_client.tools.metrics import LLM_CALL_SECONDS, observe_llm
+started = time.perf_counter()
+response = await llm.ainvoke(messages)
+observe_llm("chat", started, response)
+"""
+
+from __future__ import annotations
+
+import bisect
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+LabelKey = Tuple[str, ...]
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class _Metric:
+    """指标基类：维护线程分片"""
+
+    kind = "untyped"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()) -> None:
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._local = threading.local()
+        self._shards: List[Dict[LabelKey, Any]] = []
+        self._shards_lock = threading.Lock()
+
+    def _shard(self) -> Dict[LabelKey, Any]:
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = {}
+            self._local.shard = shard
+            # 仅在线程首次写入时加锁登记分片
+            with self._shards_lock:
+                self._shards.append(shard)
+        return shard
+
+    def _key(self, labels: Dict[str, Any]) -> LabelKey:
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    def _snapshot_shards(self) -> List[Dict[LabelKey, Any]]:
+        with self._shards_lock:
+            return [dict(s) for s in self._shards]
+
+    def render(self) -> Iterable[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1.0, **labels: Any) -> None:
+        shard = self._shard()
+        key = self._key(labels)
+        shard[key] = shard.get(key, 0.0) + amount
+
+    def values(self) -> Dict[LabelKey, float]:
+        totals: Dict[LabelKey, float] = {}
+        for shard in self._snapshot_shards():
+            for key, value in shard.items():
+                totals[key] = totals.get(key, 0.0) + value
+        return totals
+
+    def render(self) -> Iterable[str]:
+        for key, value in sorted(self.values().items()):
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {value}"
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help_text: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> None:
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels: Any) -> None:
+        shard = self._shard()
+        key = self._key(labels)
+        series = shard.get(key)
+        if series is None:
+            # [各桶计数..., +Inf 计数, 总和]
+            series = [0] * (len(self.buckets) + 1) + [0.0]
+            shard[key] = series
+        series[bisect.bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def values(self) -> Dict[LabelKey, List[float]]:
+        totals: Dict[LabelKey, List[float]] = {}
+        for shard in self._snapshot_shards():
+            for key, series in shard.items():
+                merged = totals.setdefault(key, [0] * len(series))
+                for i, v in enumerate(list(series)):
+                    merged[i] += v
+        return totals
+
+    def summary(self, **labels: Any) -> Tuple[int, float]:
+        """返回指定标签序列的 (次数, 总和)"""
+        series = self.values().get(self._key(labels))
+        if not series:
+            return 0, 0.0
+        return int(sum(series[:-1])), float(series[-1])
+
+    def render(self) -> Iterable[str]:
+        for key, series in sorted(self.values().items()):
+            cumulative = 0
+            bounds = [str(b) for b in self.buckets] + ["+Inf"]
+            for bound, count in zip(bounds, series):
+                cumulative += count
+                labels = _format_labels(self.labelnames, key, 'le="%s"' % bound)
+                yield f"{self.name}_bucket{labels} {cumulative}"
+            labels = _format_labels(self.labelnames, key)
+            yield f"{self.name}_sum{labels} {series[-1]}"
+            yield f"{self.name}_count{labels} {cumulative}"
+
+
+class Gauge(_Metric):
+    """导出时通过回调取值的仪表盘指标"""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, help_text: str, fn: Callable[[], float]) -> None:
+        super().__init__(name, help_text)
+        self.fn = fn
+
+    def render(self) -> Iterable[str]:
+        try:
+            yield f"{self.name} {float(self.fn())}"
+        except Exception:
+            return
+
+
+class MetricsRegistry:
+    def __init__(self) -> None:
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name: str, help_text: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, help_text, labelnames))  # type: ignore[return-value]
+
+    def histogram(
+        self,
+        name: str,
+        help_text: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        return self._register(Histogram(name, help_text, labelnames, buckets))  # type: ignore[return-value]
+
+    def gauge(self, name: str, help_text: str, fn: Callable[[], float]) -> Gauge:
+        """注册回调型仪表盘指标；同名重复注册时以最新回调为准"""
+        gauge = Gauge(name, help_text, fn)
+        with self._lock:
+            self._metrics[name] = gauge
+        return gauge
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines: List[str] = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+# 全局注册表
+registry = MetricsRegistry()
+
+HTTP_REQUEST_SECONDS = registry.histogram(
+    "http_request_duration_seconds", "HTTP请求耗时（秒）", ("route", "method", "status")
+)
+LLM_CALL_SECONDS = registry.histogram(
+    "llm_call_duration_seconds", "LLM调用耗时（秒）", ("component",)
+)
+LLM_TOKENS = registry.counter(
+    "llm_tokens_total", "LLM消耗的token数", ("component", "kind")
+)
+CACHE_REQUESTS = registry.counter(
+    "cache_requests_total", "缓存查询次数", ("tier", "result")
+)
+CACHE_LOOKUP_SECONDS = registry.histogram(
+    "cache_lookup_duration_seconds", "缓存查询耗时（秒）", ("tier",),
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0),
+)
+RAG_RETRIEVE_SECONDS = registry.histogram(
+    "rag_retrieve_duration_seconds", "RAG检索耗时（秒）"
+)
+
+
+def _token_usage(response: Any) -> Tuple[Optional[int], Optional[int]]:
+    """从 LangChain 消息或 OpenAI 响应中提取 (输入token, 输出token)"""
+    usage = getattr(response, "usage_metadata", None)
+    if usage:
+        return usage.get("input_tokens"), usage.get("output_tokens")
+    metadata = getattr(response, "response_metadata", None) or {}
+    token_usage = metadata.get("token_usage") if isinstance(metadata, dict) else None
+    if token_usage:
+        return token_usage.get("prompt_tokens"), token_usage.get("completion_tokens")
+    usage = getattr(response, "usage", None)
+    if usage is not None:
+        return getattr(usage, "prompt_tokens", None), getattr(usage, "completion_tokens", None)
+    return None, None
+
+
+def observe_llm(component: str, started: float, response: Any = None) -> None:
+    """记录一次 LLM 调用的耗时与 token 数；started 为 time.perf_counter() 起始值"""
+    LLM_CALL_SECONDS.observe(time.perf_counter() - started, component=component)
+    prompt_tokens, completion_tokens = _token_usage(response)
+    if prompt_tokens:
+        LLM_TOKENS.inc(prompt_tokens, component=component, kind="prompt")
+    if completion_tokens:
+        LLM_TOKENS.inc(completion_tokens, component=component, kind="completion")
+
+
+def observe_cache(tier: str, started: float, hit: bool) -> None:
+    """记录一次缓存查询的结果与耗时"""
+    CACHE_LOOKUP_SECONDS.observe(time.perf_counter() - started, tier=tier)
+    CACHE_REQUESTS.inc(tier=tier, result="hit" if hit else "miss")
+
+
+def cache_summary(tier: str) -> Dict[str, Any]:
+    """某一缓存层级的累计命中/未命中次数、命中率与平均查询耗时"""
+    requests = CACHE_REQUESTS.values()
+    hits = int(requests.get((tier, "hit"), 0))
+    misses = int(requests.get((tier, "miss"), 0))
+    count, total = CACHE_LOOKUP_SECONDS.summary(tier=tier)
+    return {
+        "hits": hits,
+        "misses": misses,
+        "hit_ratio": round(hits / (hits + misses), 4) if hits + misses else 0.0,
+        "avg_lookup_ms": round(total / count * 1000, 3) if count else 0.0,
+    }
+
+
+def llm_summary() -> Dict[str, Any]:
+    """所有 LLM 调用的次数、平均耗时与平均 token 数（用于估算缓存节省量）"""
+    calls, seconds = 0, 0.0
+    for series in LLM_CALL_SECONDS.values().values():
+        calls += int(sum(series[:-1]))
+        seconds += float(series[-1])
+    tokens = sum(LLM_TOKENS.values().values())
+    return {
+        "calls": calls,
+        "avg_latency_ms": round(seconds / calls * 1000, 2) if calls else 0.0,
+        "avg_tokens": round(tokens / calls, 1) if calls else 0.0,
+    }
+
+
+class MetricsMiddleware:
+    """纯 ASGI 中间件：按路由模板记录请求耗时"""
+
+    def __init__(self, app: Any) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Dict[str, Any], receive: Any, send: Any) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = {"code": 500}
+
+        async def send_wrapper(message: Dict[str, Any]) -> None:
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            # 使用路由模板而非原始路径，避免 path 参数导致序列数膨胀
+            route = scope.get("route")
+            HTTP_REQUEST_SECONDS.observe(
+                time.perf_counter() - started,
+                route=getattr(route, "path", "unmatched"),
+                method=scope.get("method", ""),
+                status=status["code"],
+            )
@@ -1,12 +1,12 @@
 import sys
 import os
 from typing import Dict, Any, List
-from openai import AsyncOpenAI
 import json
 
 # 添加项目根目录到路径
 sys.path.append(os.path.join(os.path.dirname(__file__), '../..'))
 from config import config
+from mcp_client.tools.llm_gateway import chat_completion, get_openai_client
 
 class DeepSeekAgentsTool:
     def __init__(self):
@@ -16,10 +16,7 @@ class DeepSeekAgentsTool:
         
         # 使用DeepSeek客户端
         if self.deepseek_api_key:
-            self.client = AsyncOpenAI(
-                api_key=self.deepseek_api_key,
-                base_url=self.deepseek_base_url
-            )
+            self.client = get_openai_client()
         else:
             self.client = None
         
@@ -55,7 +52,8 @@ class DeepSeekAgentsTool:
             """
             
             # 调用模型
-            response = await self.client.chat.completions.create(
+            result_text = await chat_completion(
+                "openai_agents",
                 model=model_name,
                 messages=[
                     {"role": "system", "content": "你是一个专业的任务执行助手。"},
@@ -65,8 +63,6 @@ class DeepSeekAgentsTool:
                 max_tokens=1000
             )
             
-            result_text = response.choices[0].message.content
-            
             # 尝试解析JSON结果
             try:
                 result_json = json.loads(result_text)
@@ -98,7 +94,8 @@ class DeepSeekAgentsTool:
             请返回工作流的执行计划。
             """
             
-            response = await self.client.chat.completions.create(
+            workflow_plan = await chat_completion(
+                "openai_agents_workflow",
                 model=model_name,
                 messages=[
                     {"role": "system", "content": "你是一个工作流设计专家。"},
@@ -110,7 +107,7 @@ class DeepSeekAgentsTool:
             
             return {
                 "success": True,
-                "workflow_plan": response.choices[0].message.content,
+                "workflow_plan": workflow_plan,
                 "model_type": "deepseek"
             }
         except Exception as e:
@@ -3,28 +3,34 @@
 
 设计目标：
 - 为问答对构建向量化缓存，支持语义近似命中（而非完全匹配）
-- 默认使用 OpenAI Embeddings，如未配置则自动降级为禁用（不报错）
-- 内存级别的 FAISS 向量库，适合单机开发/调试
+- 嵌入模型可插拔（embedding_provider）：local 复用 RAG 已加载的本地模型（微批合并、有界线程池，无网络请求），
+  openai 使用 OpenAI 兼容接口；模型不可用时自动降级为禁用（不报错）
+- 问答对与向量持久化到磁盘（SemanticIndexStore：SQLite 追加写入 + FAISS 索引定期快照），重启后缓存仍然有效
+- 未指定 persist_path 时仅保存在内存中
+- 向量归一化后用内积索引检索，得分即余弦相似度；大缓存可选 IVF / HNSW 近似索引（store_options）
+- 容量有界：条目带 TTL，超出条数/索引内存预算时按 LRU 或 LFU 淘汰并从索引中移除，定期压缩（store_options）
+- 写入后置（write-behind）：put/aput 只入队立即返回，后台写线程攒批后一次批量嵌入、一个事务写入 SQLite 并追加到索引；
+  新写入最多延迟一个批次即可被检索到；队列满时丢弃写入（计入 dropped_writes），flush/close 等待队列写完
+- 提供 aget/aclear：嵌入请求与向量检索在专用线程池中执行，不阻塞事件循环
+- 查询向量经 embedding_memo 记忆化，get 与 put 同一问题只请求一次嵌入；也可直接传入预先计算的向量
 
 使用方式：
 from mcp_client.tools.semantic_cache import VectorStoreBackedSimilarityCache
-cache = VectorStoreBackedSimilarityCache()
+cache = create_semantic_cache(".cache/semantic_cache")
 answer = cache.get("北京天气怎么样？")
 cache.put("北京天气怎么样？", "晴，25℃，湿度60%")
 """
 
-from typing import Optional, List, Tuple
-import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional, List, Tuple
+import asyncio
+import queue
+import threading
+import time
 
-try:
-    # 向量库与嵌入模型
-    from langchain_openai import OpenAIEmbeddings
-    from langchain_community.vectorstores import FAISS
-    from langchain_core.documents import Document
-except Exception:  # 兜底：避免导入失败影响主流程
-    OpenAIEmbeddings = None  # type: ignore
-    FAISS = None  # type: ignore
-    Document = None  # type: ignore
+from mcp_client.tools.embedding_memo import MemoizedEmbeddings
+from mcp_client.tools.embedding_provider import create_embeddings
+from mcp_client.tools.metrics import observe_cache
 
 try:
     # LangChain 缓存接口与返回类型
@@ -35,89 +41,284 @@ except Exception:
     RETURN_VAL_TYPE = list  # type: ignore
     Generation = None  # type: ignore
 
+# 写队列中的操作
+_OP_PUT = "put"
+_OP_CLEAR = "clear"
+_OP_FLUSH = "flush"
+_OP_STOP = "stop"
+
 
 class VectorStoreBackedSimilarityCache:
     """基于向量检索的语义缓存。
 
-    - 当 OPENAI_API_KEY 不存在或依赖导入失败时，缓存将自动禁用（透明降级）。
+    - 当嵌入模型不可用（依赖缺失、未配置密钥）时，缓存将自动禁用（透明降级）。
     - 命中逻辑：使用查询向量检索最近邻，设置相似度阈值（余弦相似度）判定是否命中。
     """
 
     def __init__(
         self,
-        score_threshold: float = 0.86,
+        score_threshold: float = 0.92,
         k: int = 3,
+        tier: str = "semantic",
+        executor_workers: int = 4,
+        persist_path: Optional[str] = None,
+        snapshot_every: int = 200,
+        store_options: Optional[Dict[str, Any]] = None,
+        embedding_provider: str = "openai",
+        write_batch_size: int = 64,
+        write_wait: float = 0.005,
+        write_queue_size: int = 10000,
     ) -> None:
         self.k = k
+        self.tier = tier  # 指标中的缓存层级标签
+        self.executor_workers = executor_workers
+        self._executor: Optional[ThreadPoolExecutor] = None
         self.score_threshold = score_threshold
+        self.write_batch_size = write_batch_size
+        self.write_wait = write_wait  # 攒批等待时间（秒）
+        self.dropped = 0  # 队列满被丢弃的写入数
+        self._queue: "queue.Queue[Tuple[Any, ...]]" = queue.Queue(maxsize=write_queue_size)
+        self._writer: Optional[threading.Thread] = None
+        self._writer_lock = threading.Lock()
 
         self.enabled: bool = False
         self._embeddings = None
-        self._vectorstore = None
+        # 索引与问答对存储；嵌入请求在存储的锁外执行
+        self._store = None
 
         try:
-            api_key = os.getenv("DEEPSEEK_API_KEY")
-            if OpenAIEmbeddings is None or FAISS is None or Document is None:
-                return
-            if not api_key:
-                return
+            # 向量库与嵌入模型（faiss 较重，构造缓存时才导入；导入失败视为不可用）
+            from mcp_client.tools.semantic_store import SemanticIndexStore
 
-            self._embeddings = OpenAIEmbeddings(api_key=api_key)
-            # 使用空集合初始化
-            self._vectorstore = FAISS.from_texts([], self._embeddings)
-            # 额外维护答案表（因为只索引问题）
-            self._qa_store: List[Tuple[str, str]] = []
+            self._embeddings = MemoizedEmbeddings(create_embeddings(embedding_provider))
+            self._store = SemanticIndexStore(
+                persist_path,
+                model_id=self._embeddings.model_id,
+                snapshot_every=snapshot_every,
+                **(store_options or {}),
+            )
             self.enabled = True
+            # 写线程同时负责定期维护，只读的缓存也需要
+            self._ensure_writer()
         except Exception:
             # 任意异常都视为不可用
             self.enabled = False
             self._embeddings = None
-            self._vectorstore = None
+            self._store = None
+
+    @property
+    def embeddings(self):
+        """嵌入模型（未启用时为 None），可供意图路由等复用"""
+        return self._embeddings
 
-    def get(self, query: str) -> Optional[str]:
+    def embed(self, query: str) -> Optional[List[float]]:
+        """计算（或从记忆化缓存取得）查询向量；未启用时返回 None"""
+        if not self.enabled:
+            return None
+        return self._embeddings.embed_query(query)
+
+    def get(self, query: str, vector: Optional[List[float]] = None) -> Optional[str]:
         """按语义相似命中缓存，返回命中的答案或 None。"""
-        if not self.enabled or not self._vectorstore:
+        if not self.enabled:
             return None
+        started = time.perf_counter()
+        answer = self._lookup(query, vector)
+        observe_cache(self.tier, started, answer is not None)
+        return answer
+
+    def _lookup(self, query: str, vector: Optional[List[float]] = None) -> Optional[str]:
         try:
-            # FAISS.similarity_search_with_score 返回 (Document, score)
-            results = self._vectorstore.similarity_search_with_score(query, k=self.k)
+            if vector is None:
+                vector = self._embeddings.embed_query(query)
+            # search 返回 (id, 余弦相似度)，按相似度从高到低
+            results = self._store.search(vector, k=self.k)
             if not results:
                 return None
-            # FAISS score 是 L2 距离，越小越相似；这里转成相似度阈值判断
-            # 简单启发：将距离映射为相似度 sim = 1 / (1 + dist)，并与阈值比较
-            best_doc, best_dist = results[0]
-            similarity = 1.0 / (1.0 + float(best_dist))
+            best_id, similarity = results[0]
             if similarity >= self.score_threshold:
-                # 在 QA 表中找到对应答案
-                for q, a in reversed(self._qa_store):
-                    if q == best_doc.page_content:
-                        return a
+                return self._store.answer(best_id)
             return None
         except Exception:
             return None
 
-    def put(self, query: str, answer: str) -> None:
-        """写入一条问答对到缓存。"""
-        if not self.enabled or not self._vectorstore:
+    def put(
+        self, query: str, answer: str, vector: Optional[List[float]] = None, ttl: Optional[float] = None
+    ) -> None:
+        """把一条问答对加入写队列后立即返回；ttl 未指定时使用默认过期时间。"""
+        if not self.enabled:
             return
+        self._ensure_writer()
         try:
-            # 先追加向量库，再记录答案
-            self._vectorstore.add_texts([query])
-            self._qa_store.append((query, answer))
-        except Exception:
-            # 忽略写入异常，避免影响主流程
-            return
+            self._queue.put_nowait((_OP_PUT, query, answer, vector, ttl))
+        except queue.Full:
+            # 缓存写入可以丢弃，不阻塞主流程
+            self.dropped += 1
 
     def clear(self) -> None:
-        """清空语义缓存。"""
+        """清空语义缓存（尚未写入的队列条目一并丢弃）。"""
+        if not self.enabled:
+            return
+        self._ensure_writer()
+        done = threading.Event()
+        self._queue.put((_OP_CLEAR, done))
+        done.wait()
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """等待已入队的写入全部完成"""
+        if self._writer is None:
+            return True
+        done = threading.Event()
+        self._queue.put((_OP_FLUSH, done))
+        return done.wait(timeout)
+
+    def stats(self) -> Dict[str, Any]:
+        """条目数、索引内存、磁盘占用、累计过期/淘汰数与写队列状态"""
+        if not self.enabled:
+            return {"enabled": False}
+        return {
+            "enabled": True,
+            **self._store.stats(),
+            "pending_writes": self._queue.qsize(),
+            "dropped_writes": self.dropped,
+        }
+
+    def close(self) -> None:
+        """写完队列中的条目，写入最终快照并关闭存储"""
         if not self.enabled:
             return
+        with self._writer_lock:
+            writer, self._writer = self._writer, None
+        if writer is not None:
+            self._queue.put((_OP_STOP,))
+            writer.join()
+        self._store.close()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    # ---- 后台写线程 ----
+    def _ensure_writer(self) -> None:
+        if self._writer is not None:
+            return
+        with self._writer_lock:
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._write_loop, name=f"{self.tier}-cache-writer", daemon=True)
+                self._writer.start()
+
+    def _write_loop(self) -> None:
+        while True:
+            # 空闲时也按存储的维护间隔醒来，维护（过期清理/淘汰/压缩/快照）只在写线程中执行，不占用查询
+            try:
+                batch = [self._queue.get(timeout=min(self._store.maintain_due(), 60.0))]
+            except queue.Empty:
+                batch = []
+            # 攒批：在 write_wait 内尽量多取，直到 write_batch_size
+            deadline = time.monotonic() + self.write_wait
+            while batch and len(batch) < self.write_batch_size:
+                timeout = deadline - time.monotonic()
+                try:
+                    batch.append(self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if batch and not self._apply(batch):
+                return
+            try:
+                self._store.maybe_maintain()
+            except Exception as e:
+                print(f"语义缓存维护失败: {e}")
+
+    def _apply(self, batch: List[Tuple[Any, ...]]) -> bool:
+        """按入队顺序执行一批操作；返回 False 表示收到停止信号"""
+        items: List[Tuple[str, str, Optional[List[float]], Optional[float]]] = []
+        waiters: List[threading.Event] = []
+        running = True
         try:
-            # 通过重建空索引实现清空
-            self._vectorstore = FAISS.from_texts([], self._embeddings) if self._embeddings else None
-            self._qa_store = []
-        except Exception:
+            for op in batch:
+                if op[0] == _OP_PUT:
+                    items.append(op[1:])
+                elif op[0] == _OP_CLEAR:
+                    # 清空之前入队的写入不再需要执行
+                    items.clear()
+                    self._store.clear()
+                    waiters.append(op[1])
+                elif op[0] == _OP_FLUSH:
+                    waiters.append(op[1])
+                elif op[0] == _OP_STOP:
+                    running = False
+            self._write_many(items)
+        except Exception as e:
+            # 忽略写入异常，避免影响主流程
+            print(f"语义缓存写入失败: {e}")
+        finally:
+            for event in waiters:
+                event.set()
+        return running
+
+    def _write_many(self, items: List[Tuple[str, str, Optional[List[float]], Optional[float]]]) -> None:
+        """缺少向量的条目一次批量嵌入，再按 TTL 分组批量写入存储"""
+        if not items:
+            return
+        vectors = [vector for _, _, vector, _ in items]
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        if missing:
+            computed = self._embeddings.embed_queries([items[i][0] for i in missing])
+            for i, vector in zip(missing, computed):
+                vectors[i] = vector
+        groups: Dict[Optional[float], List[Tuple[str, str, List[float]]]] = {}
+        for (query, answer, _, ttl), vector in zip(items, vectors):
+            groups.setdefault(ttl, []).append((query, answer, vector))
+        for ttl, group in groups.items():
+            self._store.add_many(group, ttl=ttl)
+
+    # ---- 异步接口 ----
+    def run_in_executor(self, fn, *args):
+        """在缓存专用线程池中执行阻塞调用"""
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(self.executor_workers, thread_name_prefix=f"{self.tier}-cache")
+        return asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    async def aget(self, query: str, vector: Optional[List[float]] = None) -> Optional[str]:
+        if not self.enabled:
+            return None
+        return await self.run_in_executor(self.get, query, vector)
+
+    async def aput(
+        self, query: str, answer: str, vector: Optional[List[float]] = None, ttl: Optional[float] = None
+    ) -> None:
+        # put 只入队，不做 IO，可直接在事件循环中调用
+        self.put(query, answer, vector, ttl)
+
+    async def aclear(self) -> None:
+        if not self.enabled:
             return
+        await self.run_in_executor(self.clear)
+
+
+def create_semantic_cache(persist_path: str, tier: str = "semantic") -> VectorStoreBackedSimilarityCache:
+    """根据配置创建语义缓存（SEMANTIC_CACHE_PERSIST=false 时仅保存在内存中）"""
+    from config import config
+
+    return VectorStoreBackedSimilarityCache(
+        score_threshold=config.SEMANTIC_CACHE_THRESHOLD,
+        tier=tier,
+        persist_path=persist_path if config.SEMANTIC_CACHE_PERSIST else None,
+        snapshot_every=config.SEMANTIC_CACHE_SNAPSHOT_EVERY,
+        embedding_provider=config.SEMANTIC_CACHE_EMBEDDING,
+        write_batch_size=config.SEMANTIC_CACHE_WRITE_BATCH,
+        write_wait=config.SEMANTIC_CACHE_WRITE_WAIT_MS / 1000,
+        write_queue_size=config.SEMANTIC_CACHE_WRITE_QUEUE,
+        store_options={
+            "index_type": config.SEMANTIC_CACHE_INDEX,
+            "ivf_nlist": config.SEMANTIC_CACHE_IVF_NLIST,
+            "ivf_nprobe": config.SEMANTIC_CACHE_IVF_NPROBE,
+            "hnsw_ef_search": config.SEMANTIC_CACHE_HNSW_EF_SEARCH,
+            "default_ttl": config.SEMANTIC_CACHE_TTL,
+            "max_entries": config.SEMANTIC_CACHE_MAX_ENTRIES,
+            "max_bytes": config.SEMANTIC_CACHE_MAX_MB * 1024 * 1024,
+            "eviction": config.SEMANTIC_CACHE_EVICTION,
+            "compact_interval": config.SEMANTIC_CACHE_COMPACT_INTERVAL,
+        },
+    )
 
 
 class SemanticLangChainCache(BaseCache):
@@ -0,0 +1,584 @@
+"""
+语义缓存的持久化存储
+
+- 问答对与向量追加写入 SQLite（WAL 模式，每次写入即落盘），进程崩溃也不会丢失已写入的条目
+- 向量写入前做 L2 归一化，索引使用内积度量，检索得分即余弦相似度（越大越相似）
+- 索引类型：flat（精确检索，默认）、ivf（倒排，条数达到训练阈值前先用 flat）、hnsw（图索引）
+- 向量 id 即 SQLite 行号：FAISS 直接返回 id（保存在索引内的 int64 数组中），命中后按主键取答案，
+  检索与取答案都不随缓存条数线性增长，也无需在内存中保存答案
+- 定期（每 snapshot_every 次写入，以及 close 时）把索引快照写入 .faiss 文件（先写临时文件再原子替换）
+- 启动时加载快照，按 id 与 SQLite 对齐（补删已删除的行、补入快照中缺失的行，如其他进程写入的行），
+  再回放快照之后的新行；快照缺失、损坏或索引类型变化时从 SQLite 全量重建
+- 嵌入模型变化（向量空间不同）时自动清空旧数据
+- 答案读取使用 SQLite 内存映射（mmap_size），大缓存启动时无需把答案载入内存
+- 过期与容量：每条记录带过期时间，过期即视为未命中；命中只在内存中记录访问时间与次数，维护时批量落盘；
+  定期维护（compact_interval）删除过期记录，超出条数或索引内存预算时按 LRU（最久未访问）或 LFU（命中最少）淘汰，
+  并从 FAISS 索引中按 id 移除（hnsw 不支持物理删除，先在检索时过滤，删除比例过高时重建索引），空闲页过多时 VACUUM；
+  维护由所有者的后台线程调用 maybe_maintain 触发（语义缓存的写线程），search/answer 不会执行维护
+
+使用方式：
+store = SemanticIndexStore(".cache/semantic_cache", model_id="OpenAIEmbeddings:text-embedding-ada-002")
+row_id = store.add("北京天气怎么样？", "晴，25℃", vector, ttl=1800)
+for row_id, score in store.search(vector, k=3):
+    answer = store.answer(row_id)
+"""
+
+from __future__ import annotations
+
+import os
+import sqlite3
+import struct
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Set, Tuple
+
+import faiss
+import numpy as np
+
+INDEX_TYPES = ("flat", "ivf", "hnsw")
+EVICTION_POLICIES = ("lru", "lfu")
+
+# 快照文件头：索引实际类型 + 快照包含的最大行号
+_SNAPSHOT_HEADER = struct.Struct("<8sq")
+
+# FAISS 建议每个聚类中心至少 39 个训练样本
+_IVF_MIN_POINTS_PER_CENTROID = 39
+
+# hnsw 中已删除（仅被过滤）的向量占比超过该值时重建索引
+_HNSW_REBUILD_RATIO = 0.2
+
+# 空闲页占比超过该值时执行 VACUUM
+_VACUUM_FREE_RATIO = 0.25
+
+_EVICTION_ORDER = {"lru": "last_access", "lfu": "hits, last_access"}
+
+
+def _as_matrix(vectors: Sequence[Sequence[float]]) -> np.ndarray:
+    """转为 float32 矩阵并按行 L2 归一化（归一化后内积即余弦相似度）"""
+    matrix = np.array(vectors, dtype=np.float32, ndmin=2)
+    faiss.normalize_L2(matrix)
+    return matrix
+
+
+class SemanticIndexStore:
+    """SQLite 追加日志 + FAISS 索引快照；path 为 None 时仅在内存中保存"""
+
+    def __init__(
+        self,
+        path: Optional[str],
+        model_id: str = "",
+        snapshot_every: int = 200,
+        mmap_size: int = 64 * 1024 * 1024,
+        index_type: str = "flat",
+        ivf_nlist: int = 1024,
+        ivf_nprobe: int = 16,
+        hnsw_m: int = 32,
+        hnsw_ef_search: int = 64,
+        default_ttl: Optional[float] = None,
+        max_entries: int = 0,
+        max_bytes: int = 0,
+        eviction: str = "lru",
+        compact_interval: float = 300.0,
+    ) -> None:
+        if index_type not in INDEX_TYPES:
+            raise ValueError(f"不支持的索引类型: {index_type}，可选 {', '.join(INDEX_TYPES)}")
+        if eviction not in EVICTION_POLICIES:
+            raise ValueError(f"不支持的淘汰策略: {eviction}，可选 {', '.join(EVICTION_POLICIES)}")
+        self.path = path
+        self.model_id = model_id
+        self.snapshot_every = snapshot_every  # 0 表示只在 close 时写快照
+        self.index_type = index_type
+        self.ivf_nlist = ivf_nlist
+        self.ivf_nprobe = ivf_nprobe  # 检索时访问的倒排列表数，越大召回越高
+        self.hnsw_m = hnsw_m
+        self.hnsw_ef_search = hnsw_ef_search  # 检索时的候选队列长度，越大召回越高
+        self.default_ttl = default_ttl  # None 或 0 表示永不过期
+        self.max_entries = max_entries  # 0 表示不限制
+        self.max_bytes = max_bytes  # 索引内存预算，0 表示不限制
+        self.eviction = eviction
+        self.compact_interval = compact_interval  # 过期清理/淘汰/压缩间隔（秒）
+        self.index_path = f"{path}.faiss" if path else None
+        self.expired = 0
+        self.evicted = 0
+        self._index = None  # 维度在首个向量到达（或加载快照）时确定
+        self._kind = ""  # 当前索引的实际类型（ivf 训练前为 flat）
+        self._last_id = 0  # 已加入索引的最大行号
+        self._dirty = 0  # 上次快照后的变更数
+        # hnsw 已删除但仍在图中的 id，检索时通过 IDSelector 过滤
+        self._deleted: Set[int] = set()
+        self._search_params: Any = None
+        self._selector_refs: Tuple[Any, ...] = ()
+        # 命中记录：id -> [最近访问时间, 新增命中次数]，维护时批量落盘
+        self._touched: Dict[int, List[float]] = {}
+        self._last_maintain = time.time()
+        # 后台重建（ivf 训练 / hnsw 压缩）期间删除的 id，替换索引前补删
+        self._rebuilding = False
+        self._removed_during_rebuild: List[int] = []
+        # FAISS 索引不支持并发读写；SQLite 写入与索引变更在同一把锁内完成，保证快照与行号一致
+        self._lock = threading.RLock()
+        self._snapshot_lock = threading.Lock()
+        self._maintain_lock = threading.Lock()
+
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(f"{path}.sqlite3" if path else ":memory:", check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(f"PRAGMA mmap_size={int(mmap_size)}")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS semantic_qa (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                question TEXT NOT NULL,
+                answer TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                created_at REAL NOT NULL,
+                expires_at REAL,
+                last_access REAL NOT NULL DEFAULT 0,
+                hits INTEGER NOT NULL DEFAULT 0
+            )
+            """
+        )
+        self._migrate()
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_semantic_expires ON semantic_qa(expires_at)")
+        self._conn.execute(f"CREATE INDEX IF NOT EXISTS idx_semantic_{eviction} ON semantic_qa({_EVICTION_ORDER[eviction]})")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS semantic_meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        self._conn.commit()
+        self._check_model()
+        self._load()
+
+    # ---- 启动 ----
+    def _migrate(self) -> None:
+        """为旧表补充过期与访问统计列"""
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(semantic_qa)")}
+        if "expires_at" not in columns:
+            self._conn.execute("ALTER TABLE semantic_qa ADD COLUMN expires_at REAL")
+        if "last_access" not in columns:
+            self._conn.execute("ALTER TABLE semantic_qa ADD COLUMN last_access REAL NOT NULL DEFAULT 0")
+            self._conn.execute("UPDATE semantic_qa SET last_access = created_at")
+        if "hits" not in columns:
+            self._conn.execute("ALTER TABLE semantic_qa ADD COLUMN hits INTEGER NOT NULL DEFAULT 0")
+
+    def _check_model(self) -> None:
+        row = self._conn.execute("SELECT value FROM semantic_meta WHERE key = 'model'").fetchone()
+        if row and row[0] != self.model_id:
+            # 向量来自其他嵌入模型，不能与新向量比较
+            self._conn.execute("DELETE FROM semantic_qa")
+            self._remove_snapshot()
+        self._conn.execute("INSERT OR REPLACE INTO semantic_meta(key, value) VALUES('model', ?)", (self.model_id,))
+        self._conn.commit()
+
+    def _read_snapshot(self) -> bool:
+        try:
+            with open(self.index_path, "rb") as f:
+                data = f.read()
+            kind, last_id = _SNAPSHOT_HEADER.unpack_from(data)
+            kind = kind.rstrip(b"\x00").decode("ascii")
+            # ivf 训练前以 flat 保存，可以继续使用；其他类型变化需要重建
+            if kind != self.index_type and not (kind == "flat" and self.index_type == "ivf"):
+                return False
+            index = faiss.deserialize_index(np.frombuffer(data, dtype=np.uint8, offset=_SNAPSHOT_HEADER.size))
+        except Exception:
+            return False
+        self._index, self._kind, self._last_id = index, kind, last_id
+        self._apply_search_params()
+        self._reconcile_snapshot()
+        return True
+
+    def _reconcile_snapshot(self) -> None:
+        """按 id 对齐快照与 SQLite（行号不大于快照 last_id 的部分）
+
+        - 快照之后被删除（过期/淘汰）的行仍在索引中：从索引补删
+        - 快照中缺失的行：多个进程写同一缓存时，快照由最后保存的进程写入，只含该进程自己写入的行，
+          其他进程写入的较小行号不会被 id > last_id 的回放覆盖，需要从 SQLite 补入
+        """
+        index_ids = self._index_ids()
+        stored_ids = np.fromiter(
+            (row[0] for row in self._conn.execute("SELECT id FROM semantic_qa WHERE id <= ?", (self._last_id,))),
+            dtype=np.int64,
+        )
+        extra = np.setdiff1d(index_ids, stored_ids).tolist()
+        self._remove_from_index(extra)
+        missing = np.setdiff1d(stored_ids, index_ids).tolist()
+        for ids, vectors in self._iter_rows_by_id(missing):
+            self._index.add_with_ids(vectors, ids)
+        self._dirty += len(extra) + len(missing)
+
+    def _index_ids(self) -> np.ndarray:
+        """索引中的全部 id：IndexIDMap 保存在 id_map 中，ivf 分散在各倒排列表中"""
+        if self._kind != "ivf":
+            return faiss.vector_to_array(self._index.id_map)
+        invlists = faiss.extract_index_ivf(self._index).invlists
+        parts = [
+            faiss.rev_swig_ptr(invlists.get_ids(i), invlists.list_size(i)).copy()
+            for i in range(invlists.nlist)
+            if invlists.list_size(i)
+        ]
+        return np.concatenate(parts) if parts else np.empty(0, dtype=np.int64)
+
+    def _load(self) -> None:
+        """加载索引快照，再回放快照之后写入的行"""
+        if self.index_path and os.path.exists(self.index_path) and not self._read_snapshot():
+            # 快照损坏（或为旧格式）、索引类型变化：丢弃后从 SQLite 全量重建
+            self._remove_snapshot()
+        replayed = 0
+        for ids, vectors in self._iter_rows(self._last_id):
+            self._add_to_index(vectors, ids)
+            replayed += len(ids)
+        self._dirty += replayed
+        self._maybe_rebuild()
+        if self._dirty and self.snapshot_every and self._dirty >= self.snapshot_every:
+            self.snapshot()
+
+    def _iter_rows(self, after_id: int, batch: int = 4096) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+        """按行号顺序分批读取 (ids, 归一化向量)"""
+        cursor = self._conn.execute("SELECT id, vector FROM semantic_qa WHERE id > ? ORDER BY id", (after_id,))
+        while True:
+            rows = cursor.fetchmany(batch)
+            if not rows:
+                break
+            ids = np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows))
+            vectors = np.vstack([np.frombuffer(row[1], dtype=np.float32) for row in rows])
+            faiss.normalize_L2(vectors)
+            yield ids, vectors
+
+    def _iter_rows_by_id(self, row_ids: List[int], batch: int = 500) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+        """按指定行号分批读取 (ids, 归一化向量)；每批参数数不超过 SQLite 的变量上限"""
+        for start in range(0, len(row_ids), batch):
+            chunk = row_ids[start:start + batch]
+            rows = self._conn.execute(
+                f"SELECT id, vector FROM semantic_qa WHERE id IN ({','.join('?' * len(chunk))}) ORDER BY id", chunk
+            ).fetchall()
+            if not rows:
+                continue
+            ids = np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows))
+            vectors = np.vstack([np.frombuffer(row[1], dtype=np.float32) for row in rows])
+            faiss.normalize_L2(vectors)
+            yield ids, vectors
+
+    # ---- 索引 ----
+    def _new_index(self, dim: int, kind: str):
+        if kind == "hnsw":
+            return faiss.IndexIDMap(faiss.IndexHNSWFlat(dim, self.hnsw_m, faiss.METRIC_INNER_PRODUCT))
+        if kind == "ivf":
+            # 倒排列表自身保存 id，无需 IndexIDMap
+            return faiss.IndexIVFFlat(faiss.IndexFlatIP(dim), dim, self.ivf_nlist, faiss.METRIC_INNER_PRODUCT)
+        return faiss.IndexIDMap(faiss.IndexFlatIP(dim))
+
+    def _apply_search_params(self) -> None:
+        if self._kind == "ivf":
+            faiss.extract_index_ivf(self._index).nprobe = self.ivf_nprobe
+        elif self._kind == "hnsw":
+            faiss.downcast_index(self._index.index).hnsw.efSearch = self.hnsw_ef_search
+        self._update_selector()
+
+    def _update_selector(self) -> None:
+        """hnsw 检索时排除已删除的 id（IndexIDMap 会把外部 id 选择器转换为内部序号）"""
+        if self._kind != "hnsw" or not self._deleted:
+            self._search_params = None
+            return
+        batch = faiss.IDSelectorBatch(np.fromiter(self._deleted, dtype=np.int64))
+        selector = faiss.IDSelectorNot(batch)
+        self._search_params = faiss.SearchParametersHNSW(sel=selector, efSearch=self.hnsw_ef_search)
+        # SearchParameters / IDSelectorNot 不持有内部对象，保留引用防止被回收
+        self._selector_refs = (batch, selector)
+
+    def _add_to_index(self, vectors: np.ndarray, ids: np.ndarray) -> None:
+        if self._index is None:
+            # ivf 需要足够的样本训练聚类中心，在此之前使用 flat
+            self._kind = "flat" if self.index_type == "ivf" else self.index_type
+            self._index = self._new_index(vectors.shape[1], self._kind)
+            self._apply_search_params()
+        self._index.add_with_ids(vectors, ids)
+        self._last_id = int(ids[-1])
+
+    def _remove_from_index(self, ids: List[int]) -> None:
+        """从索引中移除（调用方持锁）；hnsw 只做标记，检索时过滤"""
+        if not ids or self._index is None:
+            return
+        if self._rebuilding:
+            self._removed_during_rebuild.extend(ids)
+        if self._kind == "hnsw":
+            self._deleted.update(ids)
+            self._update_selector()
+        else:
+            self._index.remove_ids(np.array(ids, dtype=np.int64))
+
+    def _maybe_rebuild(self) -> None:
+        """ivf 模式下条数达到训练阈值时训练倒排索引；hnsw 删除比例过高时重建"""
+        with self._lock:
+            if self._index is None or self._rebuilding:
+                return
+            if self.index_type == "ivf" and self._kind == "flat":
+                if self._index.ntotal < self.ivf_nlist * _IVF_MIN_POINTS_PER_CENTROID:
+                    return
+                kind = "ivf"
+            elif self._kind == "hnsw" and len(self._deleted) > self._index.ntotal * _HNSW_REBUILD_RATIO:
+                kind = "hnsw"
+            else:
+                return
+        self._rebuild(kind)
+
+    def _rebuild(self, kind: str) -> None:
+        """锁内复制当前索引中的向量，锁外构建新索引，再在锁内补齐构建期间的新增与删除并替换"""
+        with self._lock:
+            if self._rebuilding or self._index is None:
+                return
+            self._rebuilding = True
+            self._removed_during_rebuild = []
+            source = self._index
+            copied_last = self._last_id
+            vectors = source.index.reconstruct_n(0, source.ntotal)
+            ids = faiss.vector_to_array(source.id_map).copy()
+            if self._deleted:
+                keep = ~np.isin(ids, np.fromiter(self._deleted, dtype=np.int64))
+                vectors, ids = vectors[keep], ids[keep]
+        try:
+            index = self._new_index(source.d, kind)
+            if kind == "ivf":
+                index.train(vectors)
+            index.add_with_ids(vectors, ids)
+            with self._lock:
+                if self._index is not source:
+                    # 构建期间缓存被清空
+                    return
+                source_ids = faiss.vector_to_array(source.id_map)
+                # 新增的向量总在末尾（flat 删除后保持顺序）
+                tail = np.nonzero(source_ids > copied_last)[0]
+                if len(tail):
+                    index.add_with_ids(source.index.reconstruct_n(int(tail[0]), len(tail)), source_ids[tail].copy())
+                removed, self._removed_during_rebuild = self._removed_during_rebuild, []
+                self._index, self._kind = index, kind
+                self._deleted = set()
+                self._apply_search_params()
+                self._remove_from_index(removed)
+                self._dirty += 1
+        finally:
+            self._rebuilding = False
+            self._removed_during_rebuild = []
+
+    # ---- 读写 ----
+    def add(self, question: str, answer: str, vector: Sequence[float], ttl: Optional[float] = None) -> int:
+        """追加一条问答对，返回其 id；ttl 未指定时使用默认过期时间"""
+        return self.add_many([(question, answer, vector)], ttl=ttl)[0]
+
+    def add_many(self, items: Sequence[Tuple[str, str, Sequence[float]]], ttl: Optional[float] = None) -> List[int]:
+        """批量追加问答对（一个事务、一次索引追加），返回各自的 id"""
+        if not items:
+            return []
+        matrix = _as_matrix([vector for _, _, vector in items])
+        now = time.time()
+        ttl = ttl if ttl is not None else self.default_ttl
+        expires_at = now + ttl if ttl else None
+        with self._lock:
+            row_ids: List[int] = []
+            with self._conn:
+                for (question, answer, _), vector in zip(items, matrix):
+                    cursor = self._conn.execute(
+                        "INSERT INTO semantic_qa(question, answer, vector, created_at, expires_at, last_access) "
+                        "VALUES(?, ?, ?, ?, ?, ?)",
+                        (question, answer, vector.tobytes(), now, expires_at, now),
+                    )
+                    row_ids.append(cursor.lastrowid)
+            self._add_to_index(matrix, np.array(row_ids, dtype=np.int64))
+            self._dirty += len(row_ids)
+            due = bool(self.snapshot_every) and self._dirty >= self.snapshot_every
+        self._maybe_rebuild()
+        if due:
+            self.snapshot()
+        return row_ids
+
+    def search(self, vector: Sequence[float], k: int) -> List[Tuple[int, float]]:
+        """返回最近邻 (id, 余弦相似度)，按相似度从高到低"""
+        matrix = _as_matrix([vector])
+        with self._lock:
+            if self._index is None or self._index.ntotal == 0:
+                return []
+            k = min(k, self._index.ntotal)
+            if self._search_params is not None:
+                scores, ids = self._index.search(matrix, k, params=self._search_params)
+            else:
+                scores, ids = self._index.search(matrix, k)
+        return [(int(i), float(s)) for i, s in zip(ids[0], scores[0]) if i >= 0]
+
+    def answer(self, row_id: int) -> Optional[str]:
+        """按 id 取答案；已过期返回 None。命中只在内存中记录，维护时落盘"""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT answer, expires_at FROM semantic_qa WHERE id = ?", (row_id,)).fetchone()
+            if row is None or (row[1] is not None and row[1] <= now):
+                return None
+            touched = self._touched.setdefault(row_id, [now, 0])
+            touched[0] = now
+            touched[1] += 1
+        return row[0]
+
+    # ---- 维护 ----
+    def _capacity(self) -> int:
+        """条数上限与内存预算换算出的条数上限中较小者，0 表示不限制"""
+        limits = [self.max_entries] if self.max_entries > 0 else []
+        if self.max_bytes > 0 and self._index is not None:
+            limits.append(max(1, self.max_bytes // self._bytes_per_vector()))
+        return min(limits) if limits else 0
+
+    def _bytes_per_vector(self) -> int:
+        # 向量 + id；hnsw 另有第 0 层 2*M 条 int32 邻接边
+        size = self._index.d * 4 + 8
+        if self._kind == "hnsw":
+            size += self.hnsw_m * 2 * 4
+        return size
+
+    def memory_bytes(self) -> int:
+        """索引占用内存的估算值"""
+        with self._lock:
+            if self._index is None:
+                return 0
+            size = self._index.ntotal * self._bytes_per_vector()
+            if self._kind == "ivf":
+                size += self.ivf_nlist * self._index.d * 4
+            return size
+
+    def maintain_due(self) -> float:
+        """距下次维护的秒数（不定期维护时为 inf）"""
+        if self.compact_interval <= 0:
+            return float("inf")
+        return max(0.0, self._last_maintain + self.compact_interval - time.time())
+
+    def maybe_maintain(self) -> None:
+        """到达维护间隔时执行维护；由所有者的后台线程调用，不在检索/取答案路径上执行"""
+        if self.maintain_due() <= 0:
+            self.maintain()
+
+    def maintain(self) -> None:
+        """落盘命中记录、删除过期记录、按策略淘汰超出容量的记录，并压缩索引与数据库"""
+        if not self._maintain_lock.acquire(blocking=False):
+            return
+        try:
+            self._last_maintain = time.time()
+            removed = 0
+            with self._lock:
+                touched, self._touched = self._touched, {}
+                with self._conn:
+                    self._conn.executemany(
+                        "UPDATE semantic_qa SET last_access = ?, hits = hits + ? WHERE id = ?",
+                        [(last, hits, row_id) for row_id, (last, hits) in touched.items()],
+                    )
+                expired = [
+                    row[0]
+                    for row in self._conn.execute(
+                        "SELECT id FROM semantic_qa WHERE expires_at IS NOT NULL AND expires_at <= ?", (time.time(),)
+                    )
+                ]
+                self._delete(expired)
+                self.expired += len(expired)
+                removed += len(expired)
+
+                capacity = self._capacity()
+                if capacity:
+                    over = self._conn.execute("SELECT COUNT(*) FROM semantic_qa").fetchone()[0] - capacity
+                    if over > 0:
+                        victims = [
+                            row[0]
+                            for row in self._conn.execute(
+                                f"SELECT id FROM semantic_qa ORDER BY {_EVICTION_ORDER[self.eviction]} LIMIT ?", (over,)
+                            )
+                        ]
+                        self._delete(victims)
+                        self.evicted += len(victims)
+                        removed += len(victims)
+            if removed:
+                self._maybe_rebuild()
+                self._compact_db()
+                self.snapshot()
+        finally:
+            self._maintain_lock.release()
+
+    def _delete(self, ids: List[int]) -> None:
+        """从数据库与索引中删除（调用方持锁）"""
+        if not ids:
+            return
+        with self._conn:
+            self._conn.executemany("DELETE FROM semantic_qa WHERE id = ?", [(row_id,) for row_id in ids])
+        self._remove_from_index(ids)
+        self._dirty += len(ids)
+
+    def _compact_db(self) -> None:
+        with self._lock:
+            try:
+                pages = self._conn.execute("PRAGMA page_count").fetchone()[0]
+                free = self._conn.execute("PRAGMA freelist_count").fetchone()[0]
+                if pages and free / pages > _VACUUM_FREE_RATIO:
+                    self._conn.execute("VACUUM")
+                # 截断 WAL 文件，回收磁盘空间
+                self._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            except sqlite3.Error as e:
+                print(f"语义缓存维护失败: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        """条目数、索引内存、磁盘占用与累计过期/淘汰数"""
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM semantic_qa").fetchone()[0]
+            deleted = len(self._deleted)
+            kind = self._kind or self.index_type
+        disk = 0
+        if self.path:
+            for suffix in (".sqlite3", ".sqlite3-wal", ".faiss"):
+                if os.path.exists(f"{self.path}{suffix}"):
+                    disk += os.path.getsize(f"{self.path}{suffix}")
+        return {
+            "entries": entries,
+            "index": kind,
+            "memory_bytes": self.memory_bytes(),
+            "disk_bytes": disk,
+            "pending_deletes": deleted,
+            "expired": self.expired,
+            "evicted": self.evicted,
+        }
+
+    # ---- 快照 ----
+    def snapshot(self) -> None:
+        """把当前索引写入快照文件（持锁时只做内存序列化，写文件在锁外）"""
+        if not self.index_path:
+            return
+        with self._snapshot_lock:
+            with self._lock:
+                if self._index is None or not self._dirty:
+                    return
+                header = _SNAPSHOT_HEADER.pack(self._kind.encode("ascii"), self._last_id)
+                data = faiss.serialize_index(self._index)
+                self._dirty = 0
+            tmp_path = f"{self.index_path}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(header)
+                f.write(data.tobytes())
+            os.replace(tmp_path, self.index_path)
+
+    def _remove_snapshot(self) -> None:
+        if self.index_path and os.path.exists(self.index_path):
+            os.remove(self.index_path)
+
+    # ---- 管理 ----
+    def clear(self) -> None:
+        # 同时持有快照锁，避免清空后正在写入的旧快照又被放回
+        with self._snapshot_lock, self._lock:
+            self._conn.execute("DELETE FROM semantic_qa")
+            self._conn.commit()
+            self._index = None
+            self._kind = ""
+            self._dirty = 0
+            self._deleted = set()
+            self._search_params = None
+            self._touched = {}
+            self._remove_snapshot()
+
+    def close(self) -> None:
+        self.maintain()
+        self.snapshot()
+        with self._lock:
+            self._conn.close()
+
+    def __len__(self) -> int:
+        with self._lock:
+            if self._index is None:
+                return 0
+            return self._index.ntotal - len(self._deleted)
@@ -0,0 +1,220 @@
+"""
+会话历史存储
+
+- 按 session_id 隔离历史问题，每个会话只保留最近 max_turns 条（环形缓冲）
+- 会话数量超过 max_sessions 时，淘汰最久未活跃的会话（LRU）
+- SessionStore 为进程内实现；SqliteSessionStore 落盘到 SQLite，可被多个 uvicorn worker 共享
+- 异步接口 aget/aappend/aclear：SQLite 实现在存储专用的单线程中执行（复用一个常驻连接），不阻塞事件循环
+
+使用方式：
+store = create_session_store()
+store.append("user-1", "北京天气怎么样？")
+history = store.get("user-1")
+history = await store.aget("user-1")
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Deque, List, Optional
+
+
+class SessionStore:
+    """进程内会话存储：每个会话一个有界队列，空闲会话按 LRU 淘汰"""
+
+    def __init__(self, max_turns: int = 10, max_sessions: int = 10000) -> None:
+        self.max_turns = max_turns
+        self.max_sessions = max_sessions
+        self._sessions: "OrderedDict[str, Deque[str]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, session_id: Optional[str]) -> List[str]:
+        """返回会话最近的历史问题（旧 -> 新）"""
+        if not session_id:
+            return []
+        with self._lock:
+            history = self._sessions.get(session_id)
+            if history is None:
+                return []
+            self._sessions.move_to_end(session_id)
+            return list(history)
+
+    def append(self, session_id: Optional[str], message: str) -> None:
+        if not session_id:
+            return
+        with self._lock:
+            history = self._sessions.get(session_id)
+            if history is None:
+                history = deque(maxlen=self.max_turns)
+                self._sessions[session_id] = history
+            else:
+                self._sessions.move_to_end(session_id)
+            history.append(message)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+
+    def clear(self, session_id: Optional[str] = None) -> None:
+        """清空指定会话；不传 session_id 时清空全部"""
+        with self._lock:
+            if session_id is None:
+                self._sessions.clear()
+            else:
+                self._sessions.pop(session_id, None)
+
+    # ---- 异步接口（内存操作，直接执行） ----
+    async def aget(self, session_id: Optional[str]) -> List[str]:
+        return self.get(session_id)
+
+    async def aappend(self, session_id: Optional[str], message: str) -> None:
+        self.append(session_id, message)
+
+    async def aclear(self, session_id: Optional[str] = None) -> None:
+        self.clear(session_id)
+
+    def close(self) -> None:
+        pass
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+
+class SqliteSessionStore(SessionStore):
+    """SQLite 会话存储：多个进程共享同一份会话历史"""
+
+    # 每写入多少次检查一次会话数上限
+    _EVICT_EVERY = 100
+
+    def __init__(self, db_path: str, max_turns: int = 10, max_sessions: int = 10000) -> None:
+        super().__init__(max_turns=max_turns, max_sessions=max_sessions)
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        self._writes = 0
+        self._executor: Optional[ThreadPoolExecutor] = None
+        # 常驻连接：异步接口都在存储专用线程中使用；同步接口与其共用，由 _lock 串行化
+        self._conn = sqlite3.connect(self.db_path, timeout=10, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._init_db()
+
+    def _init_db(self) -> None:
+        with self._lock:
+            conn = self._conn
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS chat_sessions (
+                  session_id TEXT PRIMARY KEY,
+                  last_active REAL NOT NULL
+                )
+                """
+            )
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS chat_messages (
+                  id INTEGER PRIMARY KEY AUTOINCREMENT,
+                  session_id TEXT NOT NULL,
+                  message TEXT NOT NULL
+                )
+                """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_chat_messages_session ON chat_messages(session_id, id)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_chat_sessions_active ON chat_sessions(last_active)")
+            conn.commit()
+
+    def get(self, session_id: Optional[str]) -> List[str]:
+        if not session_id:
+            return []
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT message FROM chat_messages WHERE session_id = ? ORDER BY id DESC LIMIT ?",
+                (session_id, self.max_turns),
+            ).fetchall()
+        return [row[0] for row in reversed(rows)]
+
+    def append(self, session_id: Optional[str], message: str) -> None:
+        if not session_id:
+            return
+        with self._lock, self._conn as conn:
+            conn.execute(
+                "INSERT INTO chat_sessions(session_id, last_active) VALUES(?, ?) "
+                "ON CONFLICT(session_id) DO UPDATE SET last_active = excluded.last_active",
+                (session_id, time.time()),
+            )
+            conn.execute("INSERT INTO chat_messages(session_id, message) VALUES(?, ?)", (session_id, message))
+            # 环形缓冲：只保留最近 max_turns 条
+            conn.execute(
+                "DELETE FROM chat_messages WHERE session_id = ? AND id NOT IN ("
+                "SELECT id FROM chat_messages WHERE session_id = ? ORDER BY id DESC LIMIT ?)",
+                (session_id, session_id, self.max_turns),
+            )
+            self._writes += 1
+            if self._writes % self._EVICT_EVERY == 0:
+                self._evict(conn)
+
+    def _evict(self, conn: sqlite3.Connection) -> None:
+        """淘汰最久未活跃的会话"""
+        stale = conn.execute(
+            "SELECT session_id FROM chat_sessions ORDER BY last_active DESC LIMIT -1 OFFSET ?",
+            (self.max_sessions,),
+        ).fetchall()
+        if not stale:
+            return
+        conn.executemany("DELETE FROM chat_messages WHERE session_id = ?", stale)
+        conn.executemany("DELETE FROM chat_sessions WHERE session_id = ?", stale)
+
+    def clear(self, session_id: Optional[str] = None) -> None:
+        with self._lock, self._conn as conn:
+            if session_id is None:
+                conn.execute("DELETE FROM chat_messages")
+                conn.execute("DELETE FROM chat_sessions")
+            else:
+                conn.execute("DELETE FROM chat_messages WHERE session_id = ?", (session_id,))
+                conn.execute("DELETE FROM chat_sessions WHERE session_id = ?", (session_id,))
+
+    # ---- 异步接口 ----
+    def run_in_executor(self, fn, *args):
+        """在存储专用的单线程中执行阻塞调用（按提交顺序执行）"""
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(1, thread_name_prefix="session-store")
+        return asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    async def aget(self, session_id: Optional[str]) -> List[str]:
+        if not session_id:
+            return []
+        return await self.run_in_executor(self.get, session_id)
+
+    async def aappend(self, session_id: Optional[str], message: str) -> None:
+        if not session_id:
+            return
+        await self.run_in_executor(self.append, session_id, message)
+
+    async def aclear(self, session_id: Optional[str] = None) -> None:
+        await self.run_in_executor(self.clear, session_id)
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+        with self._lock:
+            self._conn.close()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM chat_sessions").fetchone()[0]
+
+
+def create_session_store(cache_dir: str) -> SessionStore:
+    """根据配置创建会话存储（SESSION_STORE=memory|sqlite）"""
+    from config import config
+
+    if config.SESSION_STORE == "sqlite":
+        return SqliteSessionStore(
+            os.path.join(cache_dir, "sessions.sqlite3"),
+            max_turns=config.SESSION_MAX_TURNS,
+            max_sessions=config.SESSION_MAX_SESSIONS,
+        )
+    return SessionStore(max_turns=config.SESSION_MAX_TURNS, max_sessions=config.SESSION_MAX_SESSIONS)
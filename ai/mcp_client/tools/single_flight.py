@@ -0,0 +1,56 @@
+"""
+请求合并（single-flight）
+
+- 相同 key 的并发请求只执行一次，其余调用方等待同一个结果
+- 执行完成（成功或异常）后立即移除，不做结果缓存（缓存由精确/语义缓存负责）
+
+使用方式：
+flight = SingleFlight()
+result = await flight.do(normalize_key(question), lambda: call_llm(question))
+"""
+
+from __future__ import annotations
+
+import asyncio
+from typing import Awaitable, Callable, Dict, TypeVar
+
+from mcp_client.tools.deadline import DeadlineExceededError, remaining, with_deadline
+
+T = TypeVar("T")
+
+
+def normalize_key(text: str) -> str:
+    """规范化问题文本：去除首尾空白、合并连续空白并转小写"""
+    return " ".join((text or "").split()).lower()
+
+
+class SingleFlight:
+    """按 key 合并并发中的重复调用"""
+
+    def __init__(self) -> None:
+        self._tasks: Dict[str, asyncio.Future] = {}
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[T]]) -> T:
+        """首个调用方发起执行，重复调用方等待同一任务
+
+        任务在发起者的上下文中执行（受其截止时间约束）；每个调用方按自己的截止时间等待，
+        任务因发起者超时而失败、本调用方仍有剩余时间时重新发起
+        """
+        while True:
+            task = self._tasks.get(key)
+            if task is None:
+                task = asyncio.ensure_future(fn())
+                self._tasks[key] = task
+                task.add_done_callback(lambda t, k=key: self._tasks.pop(k, None) if self._tasks.get(k) is t else None)
+            try:
+                # shield：单个调用方被取消或超时时不影响其他等待者
+                return await with_deadline(asyncio.shield(task))
+            except DeadlineExceededError:
+                left = remaining()
+                if task.done() and (left is None or left > 0):
+                    continue
+                raise
+
+    def inflight(self) -> int:
+        """当前正在执行的 key 数量"""
+        return len(self._tasks)
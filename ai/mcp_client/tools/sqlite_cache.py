@@ -1,63 +1,483 @@
 """
 SQLite 精确缓存
 
-- 以问答对形式进行精确匹配缓存（key=问题全文）。
-- 线程安全：使用 sqlite3 内置的串行化，简单用法足够。
+- 以问答对形式进行精确匹配缓存（key=规范化问题的 16 字节哈希，WITHOUT ROWID 表，不再存问题全文）。
+- 较长的答案使用 zlib 压缩存储；旧版 qa_cache 表在首次打开时自动迁移。
+- WAL 日志模式：读写互不阻塞，多个线程可同时读取。
+- 读：每个线程复用一个长连接（threading.local），不再每次调用重新打开数据库。
+- 写：后台写线程合并批量写入，一个事务提交一批（group commit）；
+  尚未落盘的写入保存在内存中，get 能立即读到刚写入的值。
+- 过期与容量：每条记录带过期时间（可按意图配置 TTL），过期即视为未命中；
+  get 只在内存中记录访问时间，由写线程批量更新 last_access；
+  写线程定期清理过期记录，超出条数/字节预算时按 last_access 淘汰最久未访问的记录，并在空闲页过多时 VACUUM。
+- 异步接口 aget/aput/aclear：读取在专用线程池中执行（每个线程一个读连接），不阻塞事件循环。
 """
 
 from __future__ import annotations
 
+import asyncio
+import hashlib
 import os
+import queue
 import sqlite3
 import threading
-from typing import Optional
-from datetime import datetime
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+from datetime import datetime, timezone
+
+from mcp_client.tools.metrics import observe_cache
+from mcp_client.tools.single_flight import normalize_key
+
+# 写队列中的操作
+_OP_PUT = "put"
+_OP_CLEAR = "clear"
+_OP_FLUSH = "flush"
+_OP_STOP = "stop"
+
+# 空闲页占比超过该值时执行 VACUUM
+_VACUUM_FREE_RATIO = 0.25
+
+# 答案编码：首字节标记格式，超过阈值才压缩（短文本压缩后反而更大）
+_FMT_RAW = b"\x00"
+_FMT_ZLIB = b"\x01"
+_COMPRESS_MIN_BYTES = 256
+
+
+def cache_key(question: str) -> bytes:
+    """规范化问题（合并空白、忽略大小写）后的 16 字节哈希"""
+    return hashlib.blake2b(normalize_key(question).encode("utf-8"), digest_size=16).digest()
+
+
+def _encode_answer(answer: str) -> bytes:
+    data = answer.encode("utf-8")
+    if len(data) >= _COMPRESS_MIN_BYTES:
+        compressed = zlib.compress(data, 6)
+        if len(compressed) < len(data):
+            return _FMT_ZLIB + compressed
+    return _FMT_RAW + data
+
+
+def _decode_answer(blob: bytes) -> str:
+    blob = bytes(blob)
+    if blob[:1] == _FMT_ZLIB:
+        return zlib.decompress(blob[1:]).decode("utf-8")
+    return blob[1:].decode("utf-8")
+
+
+def _parse_timestamp(value: Any) -> float:
+    """旧表 created_at 为 UTC ISO 字符串"""
+    try:
+        return datetime.fromisoformat(value).replace(tzinfo=timezone.utc).timestamp()
+    except (TypeError, ValueError):
+        return time.time()
+
+
+def parse_ttl_map(spec: str) -> Dict[str, float]:
+    """解析按意图的 TTL 配置：意图:秒数，多条以逗号分隔（如 weather:1800,location:86400）"""
+    ttls: Dict[str, float] = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        intent, _, seconds = item.partition(":")
+        ttls[intent.strip()] = float(seconds)
+    return ttls
 
 
 class SqliteExactCache:
-    def __init__(self, db_path: str) -> None:
+    def __init__(
+        self,
+        db_path: str,
+        tier: str = "exact",
+        batch_size: int = 256,
+        flush_interval: float = 0.005,
+        mmap_size: int = 64 * 1024 * 1024,
+        default_ttl: Optional[float] = None,
+        ttl_by_intent: Optional[Dict[str, float]] = None,
+        max_entries: int = 0,
+        max_bytes: int = 0,
+        compact_interval: float = 300.0,
+        touch_interval: float = 1.0,
+        executor_workers: int = 4,
+    ) -> None:
         self.db_path = db_path
+        self.tier = tier  # 指标中的缓存层级标签
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval  # 攒批等待时间（秒）
+        self.mmap_size = mmap_size
+        self.default_ttl = default_ttl  # None 或 0 表示永不过期
+        self.ttl_by_intent = ttl_by_intent or {}
+        self.max_entries = max_entries  # 0 表示不限制
+        self.max_bytes = max_bytes  # 0 表示不限制
+        self.compact_interval = compact_interval  # 过期清理/淘汰/VACUUM 间隔（秒）
+        self.touch_interval = touch_interval  # 访问时间批量落盘间隔（秒）
+        self.executor_workers = executor_workers  # 异步读取线程数
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self.expired = 0
+        self.evicted = 0
         os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
-        self._lock = threading.Lock()
+
+        self._local = threading.local()
+        self._readers: List[sqlite3.Connection] = []
+        self._readers_lock = threading.Lock()
+
+        # 已入队未提交的写入：key -> (answer, expires_at)
+        self._pending: Dict[bytes, Tuple[str, Optional[float]]] = {}
+        # 待落盘的访问时间：key -> time.time()
+        self._touched: Dict[bytes, float] = {}
+        self._pending_lock = threading.Lock()
+        self._queue: "queue.Queue[Tuple[Any, ...]]" = queue.Queue()
+        self._writer: Optional[threading.Thread] = None
+        self._writer_lock = threading.Lock()
         self._init_db()
 
     def _init_db(self) -> None:
-        with self._connect() as conn:
+        conn = self._connect()
+        try:
+            # WAL 模式写入数据库文件头，只需设置一次
+            conn.execute("PRAGMA journal_mode=WAL")
+            # 主键即哈希，无需额外的 rowid 与唯一索引
             conn.execute(
                 """
-                CREATE TABLE IF NOT EXISTS qa_cache (
-                  id INTEGER PRIMARY KEY AUTOINCREMENT,
-                  question TEXT UNIQUE,
-                  answer TEXT NOT NULL,
-                  created_at TEXT NOT NULL
-                )
+                CREATE TABLE IF NOT EXISTS qa_cache_v2 (
+                  key BLOB PRIMARY KEY,
+                  answer BLOB NOT NULL,
+                  created_at REAL NOT NULL,
+                  expires_at REAL,
+                  last_access REAL NOT NULL,
+                  size INTEGER NOT NULL
+                ) WITHOUT ROWID
                 """
             )
-            conn.execute("CREATE INDEX IF NOT EXISTS idx_qa_question ON qa_cache(question)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_qa_v2_last_access ON qa_cache_v2(last_access)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_qa_v2_expires ON qa_cache_v2(expires_at)")
             conn.commit()
+            if self._migrate(conn):
+                conn.execute("VACUUM")
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _migrate(conn: sqlite3.Connection, chunk: int = 1000) -> bool:
+        """把旧版 qa_cache 表（问题全文为键、答案未压缩）迁移到 qa_cache_v2 并删除旧表
+
+        多个进程（uvicorn worker）可能同时启动：检查、复制与删除旧表在同一个 BEGIN IMMEDIATE 事务中完成，
+        后获得写锁的进程在事务内重新检查时旧表已不存在，直接跳过
+        """
+        if not conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'qa_cache'").fetchone():
+            return False
+        # 等待其他进程完成迁移（迁移大表可能超过默认的 10 秒忙等待）
+        conn.execute("PRAGMA busy_timeout=300000")
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            migrated = SqliteExactCache._copy_legacy(conn, chunk)
+            if migrated is None:
+                conn.rollback()
+                return False
+            conn.execute("DROP TABLE qa_cache")
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        print(f"SQLite缓存已迁移到新格式: {migrated} 条")
+        return True
+
+    @staticmethod
+    def _copy_legacy(conn: sqlite3.Connection, chunk: int) -> Optional[int]:
+        """在调用方的事务中复制旧表，返回复制条数；旧表已被其他进程迁移时返回 None"""
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(qa_cache)")}
+        if not columns:
+            return None
+        expires = "expires_at" if "expires_at" in columns else "NULL"
+        last_access = "last_access" if "last_access" in columns else "0"
+        cursor = conn.execute(f"SELECT question, answer, created_at, {expires}, {last_access} FROM qa_cache")
+        migrated = 0
+        while True:
+            rows = cursor.fetchmany(chunk)
+            if not rows:
+                break
+            batch = []
+            for question, answer, created_at, expires_at, accessed in rows:
+                if not question or answer is None:
+                    continue
+                key = cache_key(question)
+                blob = _encode_answer(answer)
+                batch.append((key, blob, _parse_timestamp(created_at), expires_at, accessed or 0, len(key) + len(blob)))
+            conn.executemany(
+                "INSERT OR REPLACE INTO qa_cache_v2(key, answer, created_at, expires_at, last_access, size) "
+                "VALUES(?, ?, ?, ?, ?, ?)",
+                batch,
+            )
+            migrated += len(batch)
+        return migrated
+
+    def _connect(self, check_same_thread: bool = True) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=10, check_same_thread=check_same_thread)
+        # WAL 下 NORMAL 仅在断电时可能丢失最后的事务，缓存数据可接受
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA mmap_size={int(self.mmap_size)}")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        return conn
 
-    def _connect(self) -> sqlite3.Connection:
-        return sqlite3.connect(self.db_path, timeout=10, check_same_thread=False)
+    def _reader(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._connect()
+            self._local.conn = conn
+            with self._readers_lock:
+                self._readers.append(conn)
+        return conn
 
     def get(self, question: str) -> Optional[str]:
-        with self._lock, self._connect() as conn:
-            cur = conn.execute("SELECT answer FROM qa_cache WHERE question = ?", (question,))
-            row = cur.fetchone()
-            return row[0] if row else None
+        started = time.perf_counter()
+        now = time.time()
+        key = cache_key(question)
+        with self._pending_lock:
+            pending = self._pending.get(key)
+        if pending is not None:
+            answer, expires_at = pending
+        else:
+            row = self._reader().execute(
+                "SELECT answer, expires_at FROM qa_cache_v2 WHERE key = ?", (key,)
+            ).fetchone()
+            answer, expires_at = (_decode_answer(row[0]), row[1]) if row else (None, None)
+        if expires_at is not None and expires_at <= now:
+            # 过期记录由后台清理，这里直接视为未命中
+            answer = None
+        if answer is not None:
+            with self._pending_lock:
+                self._touched[key] = now
+            self._ensure_writer()
+        observe_cache(self.tier, started, answer is not None)
+        return answer
 
-    def put(self, question: str, answer: str) -> None:
+    def ttl_for(self, intent: Optional[str] = None) -> Optional[float]:
+        ttl = self.ttl_by_intent.get(intent, self.default_ttl) if intent else self.default_ttl
+        return ttl if ttl else None
+
+    def put(self, question: str, answer: str, intent: Optional[str] = None, ttl: Optional[float] = None) -> None:
+        """写入问答对；ttl 未指定时按意图（或默认）TTL 计算过期时间"""
         if not question or not isinstance(answer, str):
             return
-        with self._lock, self._connect() as conn:
-            conn.execute(
-                "INSERT OR REPLACE INTO qa_cache(question, answer, created_at) VALUES(?, ?, ?)",
-                (question, answer, datetime.utcnow().isoformat()),
-            )
-            conn.commit()
+        ttl = ttl if ttl is not None else self.ttl_for(intent)
+        expires_at = time.time() + ttl if ttl else None
+        key = cache_key(question)
+        with self._pending_lock:
+            self._pending[key] = (answer, expires_at)
+        self._ensure_writer()
+        self._queue.put((_OP_PUT, key, answer, expires_at))
 
     def clear(self) -> None:
-        with self._lock, self._connect() as conn:
-            conn.execute("DELETE FROM qa_cache")
+        with self._pending_lock:
+            self._pending.clear()
+            self._touched.clear()
+        self._ensure_writer()
+        done = threading.Event()
+        self._queue.put((_OP_CLEAR, done))
+        done.wait()
+
+    # ---- 异步接口 ----
+    def run_in_executor(self, fn, *args):
+        """在缓存专用线程池中执行阻塞调用"""
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(self.executor_workers, thread_name_prefix=f"{self.tier}-cache")
+        return asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    async def aget(self, question: str) -> Optional[str]:
+        return await self.run_in_executor(self.get, question)
+
+    async def aput(self, question: str, answer: str, intent: Optional[str] = None, ttl: Optional[float] = None) -> None:
+        # put 只入队，不做 IO，可直接在事件循环中调用
+        self.put(question, answer, intent=intent, ttl=ttl)
+
+    async def aclear(self) -> None:
+        await self.run_in_executor(self.clear)
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """等待已入队的写入全部提交"""
+        if self._writer is None:
+            return True
+        done = threading.Event()
+        self._queue.put((_OP_FLUSH, done))
+        return done.wait(timeout)
+
+    def close(self) -> None:
+        """提交剩余写入并关闭所有连接"""
+        with self._writer_lock:
+            writer, self._writer = self._writer, None
+        if writer is not None:
+            self._queue.put((_OP_STOP,))
+            writer.join()
+        with self._readers_lock:
+            readers, self._readers = self._readers, []
+        for conn in readers:
+            try:
+                conn.close()
+            except sqlite3.ProgrammingError:
+                # 其他线程创建的连接无法在此关闭，随线程结束释放
+                pass
+        self._local = threading.local()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    # ---- 后台写线程 ----
+    def _ensure_writer(self) -> None:
+        if self._writer is not None:
+            return
+        with self._writer_lock:
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._write_loop, name="sqlite-cache-writer", daemon=True)
+                self._writer.start()
+
+    def _write_loop(self) -> None:
+        conn = self._connect()
+        next_maintenance = time.monotonic() + self.compact_interval
+        try:
+            while True:
+                # 空闲时也定期醒来，落盘访问时间并执行维护
+                wait = max(0.0, min(self.touch_interval, next_maintenance - time.monotonic()))
+                try:
+                    batch = [self._queue.get(timeout=wait)]
+                except queue.Empty:
+                    batch = []
+                # 攒批：在 flush_interval 内尽量多取，直到 batch_size
+                deadline = time.monotonic() + self.flush_interval
+                while batch and len(batch) < self.batch_size:
+                    timeout = deadline - time.monotonic()
+                    try:
+                        batch.append(self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+                running = self._apply(conn, batch)
+                if running and time.monotonic() >= next_maintenance:
+                    self._maintain(conn)
+                    next_maintenance = time.monotonic() + self.compact_interval
+                if not running:
+                    return
+        finally:
+            conn.close()
+
+    def _apply(self, conn: sqlite3.Connection, batch: List[Tuple[Any, ...]]) -> bool:
+        """在一个事务中执行一批操作；返回 False 表示收到停止信号"""
+        rows: List[Tuple[bytes, bytes, float, Optional[float], float, int]] = []
+        written: List[Tuple[bytes, str]] = []
+        waiters: List[threading.Event] = []
+        running = True
+        now = time.time()
+        with self._pending_lock:
+            touched, self._touched = self._touched, {}
+        try:
+            for op in batch:
+                if op[0] == _OP_PUT:
+                    _, key, answer, expires_at = op
+                    blob = _encode_answer(answer)
+                    rows.append((key, blob, now, expires_at, now, len(key) + len(blob)))
+                    written.append((key, answer))
+                elif op[0] == _OP_CLEAR:
+                    # 清空之前入队的写入不再需要落盘
+                    rows.clear()
+                    written.clear()
+                    conn.execute("DELETE FROM qa_cache_v2")
+                    waiters.append(op[1])
+                elif op[0] == _OP_FLUSH:
+                    waiters.append(op[1])
+                elif op[0] == _OP_STOP:
+                    running = False
+            if rows:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO qa_cache_v2(key, answer, created_at, expires_at, last_access, size) "
+                    "VALUES(?, ?, ?, ?, ?, ?)",
+                    rows,
+                )
+            if touched:
+                conn.executemany(
+                    "UPDATE qa_cache_v2 SET last_access = ? WHERE key = ?",
+                    [(ts, key) for key, ts in touched.items()],
+                )
             conn.commit()
+        except sqlite3.Error as e:
+            conn.rollback()
+            print(f"SQLite缓存写入失败: {e}")
+        finally:
+            with self._pending_lock:
+                for key, answer in written:
+                    # 期间被更新过的键保留最新值，等待下一批
+                    pending = self._pending.get(key)
+                    if pending is not None and pending[0] is answer:
+                        del self._pending[key]
+            for event in waiters:
+                event.set()
+        return running
+
+    def _maintain(self, conn: sqlite3.Connection) -> None:
+        """清理过期记录、按 LRU 淘汰超出预算的记录，空闲页过多时 VACUUM"""
+        try:
+            removed = conn.execute(
+                "DELETE FROM qa_cache_v2 WHERE expires_at IS NOT NULL AND expires_at <= ?", (time.time(),)
+            ).rowcount
+            self.expired += removed
+
+            evicted = 0
+            if self.max_entries > 0:
+                over = conn.execute("SELECT COUNT(*) FROM qa_cache_v2").fetchone()[0] - self.max_entries
+                if over > 0:
+                    evicted += conn.execute(
+                        "DELETE FROM qa_cache_v2 WHERE key IN (SELECT key FROM qa_cache_v2 ORDER BY last_access LIMIT ?)",
+                        (over,),
+                    ).rowcount
+            if self.max_bytes > 0:
+                over = conn.execute("SELECT COALESCE(SUM(size), 0) FROM qa_cache_v2").fetchone()[0] - self.max_bytes
+                if over > 0:
+                    keys = []
+                    for key, size in conn.execute("SELECT key, size FROM qa_cache_v2 ORDER BY last_access"):
+                        if over <= 0:
+                            break
+                        keys.append((key,))
+                        over -= size
+                    evicted += len(keys)
+                    conn.executemany("DELETE FROM qa_cache_v2 WHERE key = ?", keys)
+            self.evicted += evicted
+            conn.commit()
+
+            if removed or evicted:
+                pages = conn.execute("PRAGMA page_count").fetchone()[0]
+                free = conn.execute("PRAGMA freelist_count").fetchone()[0]
+                if pages and free / pages > _VACUUM_FREE_RATIO:
+                    conn.execute("VACUUM")
+                # 截断 WAL 文件，回收磁盘空间
+                conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        except sqlite3.Error as e:
+            conn.rollback()
+            print(f"SQLite缓存维护失败: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        """条目数、占用字节（记录/磁盘文件/内存中未落盘写入）与累计过期/淘汰数"""
+        entries, size = self._reader().execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM qa_cache_v2").fetchone()
+        with self._pending_lock:
+            pending = len(self._pending)
+            pending_bytes = sum(len(answer.encode("utf-8")) + 16 for answer, _ in self._pending.values())
+        disk = sum(os.path.getsize(p) for p in (self.db_path, self.db_path + "-wal") if os.path.exists(p))
+        return {
+            "entries": entries,
+            "bytes": size,
+            "disk_bytes": disk,
+            "memory_bytes": pending_bytes,
+            "pending_writes": pending,
+            "expired": self.expired,
+            "evicted": self.evicted,
+        }
+
 
+def create_exact_cache(db_path: str, tier: str = "exact") -> SqliteExactCache:
+    """根据配置创建精确缓存（TTL、条数/字节预算、维护间隔）"""
+    from config import config
 
+    return SqliteExactCache(
+        db_path,
+        tier=tier,
+        default_ttl=config.EXACT_CACHE_TTL,
+        ttl_by_intent=parse_ttl_map(config.EXACT_CACHE_TTL_BY_INTENT),
+        max_entries=config.EXACT_CACHE_MAX_ENTRIES,
+        max_bytes=config.EXACT_CACHE_MAX_MB * 1024 * 1024,
+        compact_interval=config.EXACT_CACHE_COMPACT_INTERVAL,
+    )
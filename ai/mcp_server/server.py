@@ -14,13 +14,14 @@ from typing import Any, Dict, AsyncGenerator
 from fastmcp import FastMCP
 import uvicorn
 from fastapi import FastAPI, Request
-from fastapi.responses import StreamingResponse
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from sse_starlette.sse import EventSourceResponse
 import threading
 
 # 添加项目根目录到路径
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
 from config import config
+from mcp_client.tools.metrics import registry
 
 # 配置日志系统
 logging.basicConfig(level=logging.INFO)
@@ -258,6 +259,12 @@ class MCPServerApp:
         self.mcp_app = mcp
         self.wrapper = StreamMCPWrapper(self.mcp_app)
 
+        # 队列深度指标
+        registry.gauge("mcp_request_queue_depth", "MCP待处理请求队列深度",
+                       lambda: self.wrapper.request_queue.qsize())
+        registry.gauge("mcp_active_requests", "MCP进行中的请求数",
+                       lambda: len(self.wrapper.response_queues))
+
         # 设置路由
         self._setup_routes()
         # 注意：工作线程将在服务器启动时启动
@@ -296,6 +303,11 @@ class MCPServerApp:
                 "active_requests": len(self.wrapper.response_queues)
             }
 
+        @self.app.get("/metrics")
+        async def metrics():
+            """Prometheus 指标接口 - 队列深度与活跃请求数"""
+            return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
         @self.app.post("/api/call")
         async def call_tool(request: Request):
             """
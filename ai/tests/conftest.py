@@ -0,0 +1,5 @@
+import os
+import sys
+
+# 测试从 ai/ 目录导入 api、mcp_client 等包
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
@@ -0,0 +1,37 @@
+"""请求截止时间到期时 /business/chat 返回 504 与 Retry-After"""
+
+import asyncio
+
+import pytest
+
+# 依赖完整的 Web 与 LangChain 环境
+pytest.importorskip("fastapi")
+pytest.importorskip("langchain_core")
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+import main  # noqa: E402
+from api import business  # noqa: E402
+from mcp_client.tools.deadline import with_deadline  # noqa: E402
+
+
+class SlowAgent:
+    """模拟一次超过截止时间的模型调用"""
+
+    async def chat(self, message, session_id=None):
+        await with_deadline(asyncio.sleep(5))
+        return {"success": True, "response": "不应返回", "error": None}
+
+
+def test_chat_deadline_returns_504(monkeypatch):
+    async def get_agent():
+        return SlowAgent()
+
+    monkeypatch.setattr(business, "get_agent", get_agent)
+    # 不进入 lifespan，避免启动预热
+    client = TestClient(main.app)
+    resp = client.post("/business/chat", json={"question": "你好"}, headers={"X-Request-Timeout": "0.05"})
+
+    assert resp.status_code == 504
+    assert resp.headers["Retry-After"] == "1"
+    assert resp.json()["code"] == "504"
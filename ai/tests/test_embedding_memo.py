@@ -0,0 +1,59 @@
+"""嵌入模型标识与查询向量记忆化"""
+
+from mcp_client.tools.embedding_memo import EmbeddingMemo, MemoizedEmbeddings, model_id_of
+from mcp_client.tools.embedding_provider import LocalEmbeddings
+
+
+class FakeModel:
+    """模拟 HuggingFaceEmbedding：model_name 为字符串，计数编码调用"""
+
+    def __init__(self, model_name="BAAI/bge-small-zh-v1.5"):
+        self.model_name = model_name
+        self.calls = 0
+
+    def get_query_embedding(self, text):
+        self.calls += 1
+        return [float(len(text)), 1.0]
+
+    def get_text_embedding_batch(self, texts):
+        return [self.get_query_embedding(t) for t in texts]
+
+
+def test_model_id_stable_across_instances():
+    a = LocalEmbeddings(FakeModel())
+    b = LocalEmbeddings(FakeModel())
+    assert model_id_of(a) == model_id_of(b) == "LocalEmbeddings:BAAI/bge-small-zh-v1.5"
+
+
+def test_model_id_ignores_non_string_attributes():
+    class Wrapper:
+        def __init__(self):
+            self.model = object()  # 模型对象，repr 含内存地址
+            self.model_name = "m"
+
+    assert model_id_of(Wrapper()) == "Wrapper:m"
+    assert model_id_of(object()) == "object"
+
+
+def test_memoized_query_computed_once():
+    model = FakeModel()
+    memo = EmbeddingMemo(16)
+    first = MemoizedEmbeddings(LocalEmbeddings(model), memo)
+    second = MemoizedEmbeddings(LocalEmbeddings(model), memo)
+    assert first.embed_query("北京天气") == second.embed_query("北京天气")
+    assert model.calls == 1
+
+
+def test_rag_and_semantic_cache_share_memo(monkeypatch):
+    from mcp_client.tools import embedding_memo, embedding_provider
+
+    model = FakeModel()
+    monkeypatch.setattr(embedding_provider, "_local_model", model)
+    monkeypatch.setattr(embedding_provider, "_local_embeddings", None)
+    monkeypatch.setattr(embedding_memo, "embedding_memo", EmbeddingMemo(16))
+
+    # 语义缓存路径：create_embeddings("local") 经 MemoizedEmbeddings 包装
+    cached = MemoizedEmbeddings(embedding_provider.create_embeddings("local")).embed_query("北京天气")
+    # RAG 检索路径：同一问题应命中记忆化条目
+    assert embedding_provider.embed_local_query("北京天气") == cached
+    assert model.calls == 1
@@ -0,0 +1,27 @@
+"""意图路由：关键词阶段只对明确的天气/地点问题命中"""
+
+import os
+
+import pytest
+
+from mcp_client.tools.intent_router import IntentRouter
+
+INTENTS = os.path.join(os.path.dirname(__file__), "..", "mcp_client", "tools", "intents.json")
+
+
+@pytest.fixture(scope="module")
+def router():
+    return IntentRouter.from_file(INTENTS)
+
+
+def test_weather_keyword_with_city(router):
+    match = router.route("上海明天天气怎么样")
+    assert match.intent == "weather" and match.slots == {"city": "上海"}
+
+
+@pytest.mark.parametrize(
+    "message",
+    ["楼市降温后房价走势如何", "如何改善城市空气质量的政策建议", "问题出在哪里", "公司附近的商业地产市场", "如何修改邮箱地址", "下一步股价怎么走"],
+)
+def test_ambiguous_phrases_not_routed(router, message):
+    assert router.route(message) is None
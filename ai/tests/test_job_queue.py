@@ -0,0 +1,55 @@
+"""任务存储：多进程共用数据库时只回收心跳超时的任务"""
+
+import sqlite3
+
+from mcp_client.tools.job_queue import JOB_FAILED, JOB_QUEUED, JOB_RUNNING, SqliteJobStore
+
+
+def test_live_jobs_of_other_process_kept(tmp_path):
+    path = str(tmp_path / "jobs.sqlite3")
+    first = SqliteJobStore(path)
+    first.create("job-1", "新能源汽车")
+    first.update("job-1", status=JOB_RUNNING)
+
+    # 另一个 worker 进程启动：job-1 仍有心跳，不能被标记为失败
+    SqliteJobStore(path)
+    assert first.get("job-1")["status"] == JOB_RUNNING
+
+
+def test_stale_jobs_failed(tmp_path):
+    path = str(tmp_path / "jobs.sqlite3")
+    first = SqliteJobStore(path)
+    first.create("job-1", "新能源汽车")
+
+    second = SqliteJobStore(path, heartbeat_timeout=60)
+    with sqlite3.connect(path) as conn:
+        conn.execute("UPDATE analysis_jobs SET heartbeat_at = heartbeat_at - 120")
+    # 本进程自己的任务不受影响
+    second.create("job-2", "光伏")
+    with sqlite3.connect(path) as conn:
+        conn.execute("UPDATE analysis_jobs SET heartbeat_at = heartbeat_at - 120 WHERE id = 'job-2'")
+    assert second.fail_stale() == 1
+    assert second.get("job-1")["status"] == JOB_FAILED
+    assert second.get("job-2")["status"] == JOB_QUEUED
+
+
+def test_heartbeat_refreshes_own_jobs(tmp_path):
+    path = str(tmp_path / "jobs.sqlite3")
+    store = SqliteJobStore(path)
+    store.create("job-1", "新能源汽车")
+    with sqlite3.connect(path) as conn:
+        conn.execute("UPDATE analysis_jobs SET heartbeat_at = heartbeat_at - 120")
+    store.heartbeat()
+    assert SqliteJobStore(path).get("job-1")["status"] == JOB_QUEUED
+
+
+def test_legacy_table_migrated(tmp_path):
+    path = str(tmp_path / "jobs.sqlite3")
+    with sqlite3.connect(path) as conn:
+        conn.execute(
+            "CREATE TABLE analysis_jobs (id TEXT PRIMARY KEY, query TEXT NOT NULL, status TEXT NOT NULL, "
+            "progress TEXT, result TEXT, error TEXT, created_at TEXT NOT NULL, updated_at TEXT NOT NULL)"
+        )
+        conn.execute("INSERT INTO analysis_jobs VALUES('old', 'q', 'running', NULL, NULL, NULL, '', '')")
+    # 旧任务没有心跳记录，视为已中断
+    assert SqliteJobStore(path).get("old")["status"] == JOB_FAILED
@@ -0,0 +1,50 @@
+"""分层 LLM 缓存：L3 只对显式标注原始问题的调用开启"""
+
+import pytest
+
+pytest.importorskip("langchain_core")
+
+from langchain_core.load import dumps  # noqa: E402
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage  # noqa: E402
+from langchain_core.outputs import Generation  # noqa: E402
+
+from mcp_client.tools.llm_cache import TieredLLMCache, _semantic_prompt_text, semantic_message  # noqa: E402
+from mcp_client.tools.sqlite_cache import SqliteExactCache  # noqa: E402
+
+
+class RecordingL3:
+    """记录写入 L3 的匹配文本"""
+
+    enabled = True
+
+    def __init__(self):
+        self.texts = []
+
+    def get(self, text):
+        return None
+
+    def put(self, text, payload):
+        self.texts.append(text)
+
+    def close(self):
+        pass
+
+
+def test_only_marked_question_is_semantic_text():
+    rendered = "基于以下上下文回答问题。\n\n上下文：……\n\n问题：北京天气怎么样？"
+    marked = dumps([SystemMessage(content="系统提示"), semantic_message(rendered, "北京天气怎么样？")])
+    assert _semantic_prompt_text(marked) == "北京天气怎么样？"
+    # 未标注的模板 prompt、带历史的对话、非 LangChain prompt 不参与 L3
+    assert _semantic_prompt_text(dumps([HumanMessage(content=rendered)])) is None
+    history = [semantic_message(rendered, "q1"), AIMessage(content="a1"), semantic_message(rendered, "q2")]
+    assert _semantic_prompt_text(dumps(history)) is None
+    assert _semantic_prompt_text("北京天气怎么样？") is None
+
+
+def test_update_writes_l3_only_for_opted_in_calls(tmp_path):
+    l3 = RecordingL3()
+    cache = TieredLLMCache(SqliteExactCache(str(tmp_path / "llm.sqlite3")), l3=l3)
+    cache.update(dumps([HumanMessage(content="模板渲染后的 prompt")]), "llm", [Generation(text="a")])
+    cache.update(dumps([semantic_message("模板渲染后的 prompt", "原始问题")]), "llm", [Generation(text="b")])
+    assert l3.texts == ["原始问题"]
+    cache.close()
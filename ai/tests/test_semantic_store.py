@@ -0,0 +1,72 @@
+"""语义缓存存储：快照重开与多进程写入后的对齐"""
+
+import sqlite3
+
+import pytest
+
+pytest.importorskip("faiss")
+
+from mcp_client.tools.semantic_store import SemanticIndexStore  # noqa: E402
+
+
+def _vector(i):
+    return [1.0, float(i), float(i * i % 7)]
+
+
+@pytest.mark.parametrize("index_type", ["flat", "hnsw"])
+def test_reopen_from_snapshot(tmp_path, index_type):
+    path = str(tmp_path / "cache")
+    store = SemanticIndexStore(path, model_id="m", index_type=index_type, snapshot_every=0)
+    ids = [store.add(f"q{i}", f"a{i}", _vector(i)) for i in range(5)]
+    store.close()
+
+    store = SemanticIndexStore(path, model_id="m", index_type=index_type)
+    assert len(store) == 5
+    row_id, score = store.search(_vector(3), k=1)[0]
+    assert row_id == ids[3] and score == pytest.approx(1.0, abs=1e-5)
+    assert store.answer(row_id) == "a3"
+    store.close()
+
+
+def test_reopen_after_two_writers(tmp_path):
+    # 两个进程交替写入同一缓存：各自的索引只含自己写入的行，最后关闭者的快照覆盖前者
+    path = str(tmp_path / "cache")
+    first = SemanticIndexStore(path, model_id="m", snapshot_every=0)
+    second = SemanticIndexStore(path, model_id="m", snapshot_every=0)
+    for i in range(10):
+        (first if i % 2 == 0 else second).add(f"q{i}", f"a{i}", _vector(i))
+    first.close()
+    second.close()
+
+    store = SemanticIndexStore(path, model_id="m")
+    assert len(store) == 10
+    for i in range(10):
+        row_id, _ = store.search(_vector(i), k=1)[0]
+        assert store.answer(row_id) == f"a{i}"
+    store.close()
+
+
+def test_reopen_drops_rows_deleted_after_snapshot(tmp_path):
+    path = str(tmp_path / "cache")
+    store = SemanticIndexStore(path, model_id="m", snapshot_every=0)
+    ids = [store.add(f"q{i}", f"a{i}", _vector(i)) for i in range(4)]
+    store.close()
+    # 快照之后另一进程的维护删除了一行
+    with sqlite3.connect(f"{path}.sqlite3") as conn:
+        conn.execute("DELETE FROM semantic_qa WHERE id = ?", (ids[0],))
+
+    store = SemanticIndexStore(path, model_id="m")
+    assert len(store) == 3
+    assert all(row_id != ids[0] for row_id, _ in store.search(_vector(0), k=3))
+    store.close()
+
+
+def test_model_change_clears_cache(tmp_path):
+    path = str(tmp_path / "cache")
+    store = SemanticIndexStore(path, model_id="a")
+    store.add("q", "a", _vector(1))
+    store.close()
+
+    store = SemanticIndexStore(path, model_id="b")
+    assert len(store) == 0
+    store.close()
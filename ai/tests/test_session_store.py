@@ -0,0 +1,43 @@
+"""SQLite 会话存储的异步接口"""
+
+import asyncio
+import threading
+
+from mcp_client.tools.session_store import SqliteSessionStore
+
+
+def test_async_interface_runs_off_loop_thread(tmp_path):
+    store = SqliteSessionStore(str(tmp_path / "sessions.sqlite3"), max_turns=2)
+    loop_thread = threading.get_ident()
+    threads = set()
+    get = store.get
+
+    def tracked_get(session_id):
+        threads.add(threading.get_ident())
+        return get(session_id)
+
+    store.get = tracked_get
+
+    async def run():
+        for message in ("一", "二", "三"):
+            await store.aappend("s1", message)
+        history = await store.aget("s1")
+        await store.aclear("s1")
+        return history, await store.aget("s1")
+
+    history, cleared = asyncio.run(run())
+    assert history == ["二", "三"]  # 只保留最近 max_turns 条
+    assert cleared == []
+    assert threads and loop_thread not in threads
+    store.close()
+
+
+def test_sessions_shared_between_instances(tmp_path):
+    path = str(tmp_path / "sessions.sqlite3")
+    first = SqliteSessionStore(path)
+    second = SqliteSessionStore(path)
+    first.append("s1", "北京天气怎么样？")
+    assert second.get("s1") == ["北京天气怎么样？"]
+    assert len(second) == 1
+    first.close()
+    second.close()
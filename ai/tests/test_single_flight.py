@@ -0,0 +1,83 @@
+"""请求合并：并发重复调用只执行一次，调用方按各自的截止时间等待"""
+
+import asyncio
+
+import pytest
+
+from mcp_client.tools.deadline import DeadlineExceededError, reset_deadline, set_deadline, with_deadline
+from mcp_client.tools.single_flight import SingleFlight, normalize_key
+
+
+def test_normalize_key():
+    assert normalize_key("  北京  天气\nHello ") == "北京 天气 hello"
+
+
+def test_concurrent_calls_coalesced():
+    flight = SingleFlight()
+    calls = 0
+
+    async def work():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return "答案"
+
+    async def run():
+        results = await asyncio.gather(*(flight.do("k", work) for _ in range(5)))
+        return results, flight.inflight()
+
+    results, inflight = asyncio.run(run())
+    assert results == ["答案"] * 5
+    assert calls == 1
+    assert inflight == 0
+
+
+def test_error_shared_and_key_released():
+    flight = SingleFlight()
+    calls = 0
+
+    async def fail():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        raise ValueError("失败")
+
+    async def run():
+        results = await asyncio.gather(*(flight.do("k", fail) for _ in range(3)), return_exceptions=True)
+        # 失败后不缓存结果，下一次调用重新执行
+        with pytest.raises(ValueError):
+            await flight.do("k", fail)
+        return results
+
+    results = asyncio.run(run())
+    assert all(isinstance(r, ValueError) for r in results)
+    assert calls == 2
+
+
+def test_waiter_with_time_left_retries_after_initiator_deadline():
+    flight = SingleFlight()
+    calls = 0
+
+    async def slow():
+        nonlocal calls
+        calls += 1
+        await with_deadline(asyncio.sleep(0.1))
+        return "答案"
+
+    async def initiator():
+        token = set_deadline(0.02)
+        try:
+            return await flight.do("k", slow)
+        finally:
+            reset_deadline(token)
+
+    async def run():
+        first = asyncio.ensure_future(initiator())
+        await asyncio.sleep(0)
+        second = await flight.do("k", slow)  # 不设截止时间
+        with pytest.raises(DeadlineExceededError):
+            await first
+        return second
+
+    assert asyncio.run(run()) == "答案"
+    assert calls == 2
@@ -0,0 +1,49 @@
+"""SQLite 精确缓存：写入可见性、持久化、过期与旧表迁移"""
+
+import sqlite3
+import time
+
+from mcp_client.tools.sqlite_cache import SqliteExactCache
+
+
+def test_put_visible_before_and_after_flush(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    cache = SqliteExactCache(path)
+    cache.put("北京天气怎么样？", "晴")
+    # 尚未落盘的写入也能立即读到；问题按规范化后的文本匹配
+    assert cache.get("  北京天气怎么样？ ") == "晴"
+    assert cache.flush(timeout=5)
+    long_answer = "长答案" * 200  # 超过压缩阈值
+    cache.put("长问题", long_answer)
+    cache.close()
+
+    cache = SqliteExactCache(path)
+    assert cache.get("北京天气怎么样？") == "晴"
+    assert cache.get("长问题") == long_answer
+    assert cache.get("上海天气怎么样？") is None
+    cache.clear()
+    assert cache.get("北京天气怎么样？") is None
+    cache.close()
+
+
+def test_expired_entry_is_miss(tmp_path):
+    cache = SqliteExactCache(str(tmp_path / "cache.sqlite3"), ttl_by_intent={"weather": 0.01})
+    cache.put("北京天气", "晴", intent="weather")
+    cache.put("长期问题", "答案", ttl=3600)
+    time.sleep(0.02)
+    assert cache.get("北京天气") is None
+    assert cache.get("长期问题") == "答案"
+    cache.close()
+
+
+def test_legacy_table_migrated(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    with sqlite3.connect(path) as conn:
+        conn.execute("CREATE TABLE qa_cache (question TEXT PRIMARY KEY, answer TEXT, created_at TEXT)")
+        conn.execute("INSERT INTO qa_cache VALUES('北京天气', '晴', '2024-01-01T00:00:00')")
+
+    cache = SqliteExactCache(path)
+    assert cache.get("北京天气") == "晴"
+    cache.close()
+    with sqlite3.connect(path) as conn:
+        assert conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'qa_cache'").fetchone() is None